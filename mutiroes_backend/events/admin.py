@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     EventCategory, Event, EventParticipant, EventResource, 
-    EventPhoto, EventComment, EventReport
+    EventPhoto, EventPhotoUpload, EventComment, EventReport,
+    ArchivedEvent, ArchivedEventParticipant
 )
 
 
@@ -71,6 +72,15 @@ class EventPhotoAdmin(admin.ModelAdmin):
     raw_id_fields = ['event', 'user']
 
 
+@admin.register(EventPhotoUpload)
+class EventPhotoUploadAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'event', 'user', 'status', 'received_size', 'total_size', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['filename', 'event__title', 'user__username']
+    raw_id_fields = ['event', 'user', 'photo']
+    readonly_fields = ['created_at', 'updated_at']
+
+
 @admin.register(EventComment)
 class EventCommentAdmin(admin.ModelAdmin):
     list_display = ['event', 'user', 'content_preview', 'created_at']
@@ -87,11 +97,11 @@ class EventCommentAdmin(admin.ModelAdmin):
 @admin.register(EventReport)
 class EventReportAdmin(admin.ModelAdmin):
     list_display = ['event', 'created_by', 'total_participants', 'trash_collected_kg', 
-                   'trees_planted', 'area_cleaned_m2', 'created_at']
+                   'trees_planted', 'area_cleaned_m2', 'carbon_offset_kg', 'waste_diverted_kg', 'created_at']
     list_filter = ['created_at']
     search_fields = ['event__title', 'created_by__username', 'summary']
     raw_id_fields = ['event', 'created_by']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['carbon_offset_kg', 'waste_diverted_kg', 'impact_computed_at', 'created_at', 'updated_at']
     
     fieldsets = (
         ('Informações Básicas', {
@@ -103,6 +113,9 @@ class EventReportAdmin(admin.ModelAdmin):
         ('Impacto Ambiental', {
             'fields': ('trash_collected_kg', 'trees_planted', 'area_cleaned_m2', 'recyclable_material_kg')
         }),
+        ('Impacto Calculado', {
+            'fields': ('carbon_offset_kg', 'waste_diverted_kg', 'impact_computed_at')
+        }),
         ('Descrições', {
             'fields': ('summary', 'challenges', 'achievements')
         }),
@@ -110,4 +123,20 @@ class EventReportAdmin(admin.ModelAdmin):
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(ArchivedEvent)
+class ArchivedEventAdmin(admin.ModelAdmin):
+    list_display = ['title', 'organizer', 'category', 'start_date', 'participants_count', 'archived_at']
+    list_filter = ['category', 'state', 'start_date', 'archived_at']
+    search_fields = ['title', 'description', 'city']
+    raw_id_fields = ['organizer']
+    readonly_fields = ['archived_at']
+
+
+@admin.register(ArchivedEventParticipant)
+class ArchivedEventParticipantAdmin(admin.ModelAdmin):
+    list_display = ['user', 'event', 'status', 'checked_in', 'registered_at']
+    list_filter = ['status', 'checked_in']
+    search_fields = ['user__username', 'event__title']
+    raw_id_fields = ['user', 'event']
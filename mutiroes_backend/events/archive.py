@@ -0,0 +1,144 @@
+"""
+Arquivamento de eventos antigos
+
+Eventos concluídos há mais de EVENT_ARCHIVE_AFTER_DAYS dias saem das tabelas
+quentes (Event, EventParticipant, EventComment, EventPhoto, ...) para
+ArchivedEvent/ArchivedEventParticipant, em lotes. As participações continuam
+em uma tabela própria (histórico do perfil); o resto vira JSON no evento
+arquivado. Os arquivos de capa e fotos ficam no storage, referenciados pelo
+arquivo.
+"""
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from mutiroes_backend.db_connections import iterate_in_batches
+from .models import (
+    ArchivedEvent, ArchivedEventParticipant, Event, EventComment, EventParticipant, EventPhoto, EventResource
+)
+
+RESOURCE_FIELDS = ['id', 'name', 'description', 'resource_type', 'quantity_needed', 'quantity_provided', 'unit']
+PHOTO_FIELDS = ['id', 'user_id', 'photo', 'width', 'height', 'renditions', 'caption', 'is_before', 'is_after',
+                'created_at']
+COMMENT_FIELDS = ['id', 'user_id', 'parent_id', 'content', 'created_at']
+REPORT_FIELDS = ['id', 'created_by_id', 'total_participants', 'total_hours', 'trash_collected_kg', 'trees_planted',
+                 'area_cleaned_m2', 'recyclable_material_kg', 'carbon_offset_kg', 'waste_diverted_kg',
+                 'impact_computed_at', 'summary', 'challenges', 'achievements', 'created_at', 'updated_at']
+PARTICIPANT_FIELDS = ['event_id', 'user_id', 'status', 'experience_level', 'checked_in', 'check_in_time',
+                      'registered_at']
+
+
+def archivable_events(now=None):
+    """Eventos concluídos cujo término é anterior ao limite de arquivamento"""
+    cutoff = (now or timezone.now()) - timedelta(days=settings.EVENT_ARCHIVE_AFTER_DAYS)
+    return Event.objects.filter(status='completed', end_date__lt=cutoff)
+
+
+def group_by_event(queryset, fields):
+    grouped = {}
+    for row in queryset.values('event_id', *fields):
+        grouped.setdefault(row.pop('event_id'), []).append(row)
+    return grouped
+
+
+def archive_events(event_ids):
+    """
+    Copia os eventos (e dependentes) para o arquivo e os remove das tabelas
+    quentes. Deve rodar dentro de uma transação; retorna quantos foram
+    arquivados.
+    """
+    events = list(
+        Event.objects.filter(id__in=event_ids)
+        .with_participants_count()
+        .select_related('report')
+        .order_by('id')
+    )
+    if not events:
+        return 0
+    ids = [event.id for event in events]
+
+    resources = group_by_event(EventResource.objects.filter(event_id__in=ids), RESOURCE_FIELDS)
+    photos = group_by_event(EventPhoto.objects.filter(event_id__in=ids), PHOTO_FIELDS)
+    comments = group_by_event(EventComment.objects.filter(event_id__in=ids), COMMENT_FIELDS)
+    checked_in = dict(
+        EventParticipant.objects.filter(event_id__in=ids, checked_in=True)
+        .values('event_id').annotate(total=Count('id')).values_list('event_id', 'total')
+    )
+
+    ArchivedEvent.objects.bulk_create([
+        ArchivedEvent(
+            id=event.id,
+            title=event.title,
+            description=event.description,
+            category_id=event.category_id,
+            organizer_id=event.organizer_id,
+            address=event.address,
+            latitude=event.latitude,
+            longitude=event.longitude,
+            city=event.city,
+            state=event.state,
+            start_date=event.start_date,
+            end_date=event.end_date,
+            max_participants=event.max_participants,
+            participants_count=event.participants_count,
+            checked_in_count=checked_in.get(event.id, 0),
+            status=event.status,
+            is_public=event.is_public,
+            cover_image=event.cover_image.name or None,
+            cover_image_renditions=event.cover_image_renditions,
+            resources=resources.get(event.id, []),
+            photos=photos.get(event.id, []),
+            comments=comments.get(event.id, []),
+            report=report_snapshot(event),
+            created_at=event.created_at,
+        )
+        for event in events
+    ])
+
+    # Em blocos: eventos grandes podem ter dezenas de milhares de inscrições
+    participants = iterate_in_batches(
+        EventParticipant.objects.filter(event_id__in=ids).values('pk', *PARTICIPANT_FIELDS)
+    )
+    while chunk := list(islice(participants, 2000)):
+        ArchivedEventParticipant.objects.bulk_create([
+            ArchivedEventParticipant(**{field: row[field] for field in PARTICIPANT_FIELDS}) for row in chunk
+        ])
+
+    # A remoção em cascata leva participantes, fotos, comentários, recursos e relatório
+    Event.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def report_snapshot(event):
+    try:
+        report = event.report
+    except Event.report.RelatedObjectDoesNotExist:
+        return None
+    return {field: getattr(report, field) for field in REPORT_FIELDS}
+
+
+def archive_old_events(batch_size=None, max_batches=None, now=None):
+    """
+    Arquiva em lotes ordenados por id, cada um em sua própria transação.
+    Eventos travados por outra transação são pulados e ficam para a próxima
+    execução.
+    """
+    batch_size = batch_size or settings.EVENT_ARCHIVE_BATCH_SIZE
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            ids = list(
+                archivable_events(now)
+                .select_for_update(skip_locked=True, of=('self',))
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            total += archive_events(ids)
+        batches += 1
+    return total
@@ -0,0 +1,203 @@
+"""
+Versões assíncronas dos endpoints de leitura mais acessados
+
+Usadas no modo ASGI (settings.ASYNC_VIEWS, workers uvicorn): enquanto uma
+consulta ou um cliente lento aguardam, o worker continua atendendo outras
+requisições. A queryset, os filtros e os serializers são os mesmos das views
+DRF, então as respostas são idênticas; o que não for GET (criação, edição,
+OPTIONS...) segue para a view síncrona.
+"""
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework import exceptions, status
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from mutiroes_backend import reference_data
+from mutiroes_backend.db_router import read_intent
+from . import realtime
+from .models import Event
+from .serializers import EventDetailSerializer, EventListSerializer, attach_comment_replies
+from .views import EventCategoryListView, EventViewSet
+
+# Views síncronas (as mesmas do router) para os demais métodos
+event_list_sync = EventViewSet.as_view({'get': 'list', 'post': 'create'}, basename='events', detail=False)
+event_detail_sync = EventViewSet.as_view(
+    {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'},
+    basename='events', detail=True,
+)
+event_categories_sync = EventCategoryListView.as_view()
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder,
+                        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')})
+
+
+def error_response(exc, view=None, request=None):
+    """
+    Mesmo corpo, status e cabeçalhos que o exception handler do DRF
+    devolveria; `view` (instância da view síncrona) fornece o WWW-Authenticate
+    dos 401, como em APIView.handle_exception
+    """
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        auth_header = view.get_authenticate_header(request) if view is not None else None
+        if auth_header:
+            exc.auth_header = auth_header
+        else:
+            exc.status_code = status.HTTP_403_FORBIDDEN
+
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = json_response(data, status=exc.status_code)
+    if getattr(exc, 'auth_header', None):
+        response['WWW-Authenticate'] = exc.auth_header
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = '%d' % exc.wait
+    return response
+
+
+async def api_request(request, authenticators):
+    """Request DRF com o usuário já autenticado (a autenticação JWT consulta o banco)"""
+    drf_request = Request(request, authenticators=authenticators)
+    if request.headers.get('Authorization'):
+        await sync_to_async(getattr)(drf_request, 'user')
+    return drf_request
+
+
+def event_viewset(drf_request, action, **kwargs):
+    """EventViewSet configurado como o router faria, para reaproveitar queryset e filtros"""
+    view = EventViewSet(action=action, basename='events', detail=action != 'list',
+                        args=(), kwargs=kwargs, format_kwarg=None)
+    view.request = drf_request
+    return view
+
+
+async def load_categories(events):
+    """
+    Categorias dos eventos no cache em memória antes de serializar: dentro do
+    event loop o serializer não pode consultar o banco
+    """
+    await sync_to_async(reference_data.categories.ensure)({event.category_id for event in events})
+
+
+async def paginate(request, queryset, serializer_class, prepare=None):
+    """
+    Equivalente assíncrono do PageNumberPagination (mesmo formato de resposta);
+    `prepare` recebe os itens da página antes da serialização
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_param = PageNumberPagination.page_query_param
+    count = await queryset.acount()
+    num_pages = max(1, math.ceil(count / page_size))
+
+    page = request.query_params.get(page_param, 1)
+    if page in PageNumberPagination.last_page_strings:
+        page = num_pages
+    try:
+        page = int(page)
+    except (TypeError, ValueError):
+        raise exceptions.NotFound(PageNumberPagination.invalid_page_message)
+    if not 1 <= page <= num_pages:
+        raise exceptions.NotFound(PageNumberPagination.invalid_page_message)
+
+    offset = (page - 1) * page_size
+    items = [item async for item in queryset[offset:offset + page_size]]
+    if prepare is not None:
+        await prepare(items)
+    url = request.build_absolute_uri()
+    previous = None
+    if page > 1:
+        previous = remove_query_param(url, page_param) if page == 2 else replace_query_param(url, page_param, page - 1)
+    return {
+        'count': count,
+        'next': replace_query_param(url, page_param, page + 1) if page < num_pages else None,
+        'previous': previous,
+        'results': serializer_class(items, many=True, context={'request': request}).data,
+    }
+
+
+async def event_list(request):
+    """Lista de eventos: mesmos filtros, busca, ordenação e paginação do EventViewSet"""
+    if request.method != 'GET':
+        return await sync_to_async(event_list_sync)(request)
+    sync_view = EventViewSet()
+    try:
+        drf_request = await api_request(request, sync_view.get_authenticators())
+        view = event_viewset(drf_request, 'list')
+        async with read_intent(drf_request.user):
+            # Os filtros validam parâmetros no banco (ex.: categoria existente)
+            queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+            data = await paginate(drf_request, queryset, EventListSerializer, prepare=load_categories)
+    except exceptions.APIException as exc:
+        return error_response(exc, sync_view, request)
+    return json_response(data)
+
+
+async def event_detail(request, pk):
+    """Detalhe do evento com recursos, fotos, comentários e participantes"""
+    if request.method != 'GET':
+        return await sync_to_async(event_detail_sync)(request, pk=pk)
+    sync_view = EventViewSet()
+    try:
+        drf_request = await api_request(request, sync_view.get_authenticators())
+        view = event_viewset(drf_request, 'retrieve', pk=pk)
+        async with read_intent(drf_request.user):
+            queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+            try:
+                event = await queryset.aget(pk=pk)
+            except Event.DoesNotExist:
+                raise exceptions.NotFound()
+    except exceptions.APIException as exc:
+        return error_response(exc, sync_view, request)
+
+    await load_categories([event])
+    # Comentários e participantes já vieram no prefetch: nada abaixo consulta o banco
+    comments = event.comments.all()
+    attach_comment_replies(comments, comments)
+    return json_response(EventDetailSerializer(event, context={'request': drf_request}).data)
+
+
+async def event_categories(request):
+    """Lista de categorias de eventos"""
+    if request.method != 'GET':
+        return await sync_to_async(event_categories_sync)(request)
+    sync_view = EventCategoryListView()
+    try:
+        drf_request = await api_request(request, sync_view.get_authenticators())
+        # Mesma entrada de cache (stale-while-revalidate) da view síncrona
+        view = EventCategoryListView(request=drf_request, args=(), kwargs={}, format_kwarg=None)
+        data = await sync_to_async(view.cached_list_data)(drf_request)
+    except exceptions.APIException as exc:
+        return error_response(exc, sync_view, request)
+    return json_response(data)
+
+
+async def event_stream(request, pk):
+    """
+    Atualizações do evento em tempo real (Server-Sent Events): substitui o
+    polling do detalhe para acompanhar vagas, check-ins, comentários, fotos
+    e status. Público como o detalhe; exige o modo ASGI, onde cada conexão
+    aberta custa uma corrotina e não um worker.
+    """
+    if not settings.ASYNC_VIEWS:
+        return json_response(
+            {'detail': 'Atualizações em tempo real exigem o modo ASGI (SERVER_MODE=asgi).'}, status=501
+        )
+    snapshot = await sync_to_async(realtime.event_snapshot)(pk)
+    if snapshot is None:
+        return error_response(exceptions.NotFound())
+    response = StreamingHttpResponse(realtime.event_stream(pk, snapshot), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Como as views do DRF: a autenticação é por JWT, não por sessão/cookie
+for _view in (event_list, event_detail, event_categories, event_stream):
+    _view.csrf_exempt = True
@@ -0,0 +1,282 @@
+"""
+Benchmark da API: cenários de carga, execução concorrente e relatório
+
+Cada cliente virtual (uma thread com sua própria sessão HTTP) faz login com
+um usuário sintético (ver seeding.py) e executa cenários sorteados por peso
+até o fim da duração. As latências após o aquecimento viram p50/p95/p99 e throughput por
+cenário, gravados em JSON junto com o commit para comparação entre versões.
+
+Clientes lentos (--slow-clients) simulam redes ruins: mantêm conexões abertas
+enviando a requisição e lendo a resposta aos poucos. Com workers síncronos
+cada um prende um worker inteiro; com workers ASGI, só uma corrotina. Medir
+o mesmo cenário com SERVER_MODE=wsgi e =asgi mostra a diferença.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+from urllib.parse import urlsplit
+import uuid
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .models import Event
+from .seeding import SEED_EMAIL, SEED_EVENT_PREFIX, SEED_PASSWORD, SEED_USERNAME, SEED_USERNAME_PREFIX
+
+
+class BenchmarkClient:
+    """Sessão HTTP autenticada de um cliente virtual"""
+
+    def __init__(self, base_url, index, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.index = index
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.email = SEED_EMAIL.format(index)
+
+    def request(self, method, path, **kwargs):
+        return self.session.request(method, f'{self.base_url}{path}', timeout=self.timeout, **kwargs)
+
+    def login(self):
+        response = self.request('post', '/api/token/', json={'email': self.email, 'password': SEED_PASSWORD})
+        if response.status_code == 200:
+            self.session.headers['Authorization'] = f"Bearer {response.json()['access']}"
+        return response
+
+
+class Scenario:
+    """Uma requisição da carga: peso no sorteio e status considerados sucesso"""
+
+    def __init__(self, name, weight, run, ok_statuses=(200,)):
+        self.name = name
+        self.weight = weight
+        self.run = run
+        self.ok_statuses = ok_statuses
+
+
+def _list_events(client, ctx):
+    return client.request('get', '/api/events/', params={'page': ctx.rnd.randint(1, ctx.pages)})
+
+
+def _event_detail(client, ctx):
+    return client.request('get', f'/api/events/{ctx.rnd.choice(ctx.event_ids)}/')
+
+
+def _join(client, ctx):
+    return client.request(
+        'post', f'/api/events/{ctx.rnd.choice(ctx.event_ids)}/join/',
+        headers={'Idempotency-Key': str(uuid.uuid4())},
+    )
+
+
+def _check_in(client, ctx):
+    return client.request('post', f'/api/events/{ctx.rnd.choice(ctx.event_ids)}/check_in/')
+
+
+def _categories(client, ctx):
+    return client.request('get', '/api/events/categories/')
+
+
+def _search(client, ctx):
+    query = SEED_USERNAME.format(ctx.rnd.randrange(ctx.users))
+    return client.request('get', '/api/users/search/', params={'query': query})
+
+
+def _login(client, ctx):
+    return client.login()
+
+
+# Inscrição repetida e check-in sem inscrição/repetido (400/404) percorrem o
+# mesmo caminho de validação, então também contam como resposta esperada
+SCENARIOS = {
+    scenario.name: scenario for scenario in [
+        Scenario('list', 40, _list_events),
+        Scenario('detail', 30, _event_detail),
+        Scenario('join', 10, _join, ok_statuses=(201, 400)),
+        Scenario('check_in', 5, _check_in, ok_statuses=(200, 400, 404)),
+        Scenario('categories', 5, _categories),
+        Scenario('search', 10, _search),
+        Scenario('login', 5, _login),
+    ]
+}
+
+
+class ClientContext:
+    def __init__(self, seed, event_ids, pages, users):
+        self.rnd = random.Random(seed)
+        self.event_ids = event_ids
+        self.pages = pages
+        self.users = users
+
+
+def slow_client(base_url, stop, delay, chunk=16):
+    """
+    Cliente lento: envia a requisição e lê a resposta em pedaços de `chunk`
+    bytes com `delay` segundos entre eles, reconectando até o fim da medição
+    """
+    url = urlsplit(base_url)
+    request = f'GET /api/events/ HTTP/1.1\r\nHost: {url.netloc}\r\nConnection: close\r\n\r\n'.encode()
+    while not stop.is_set():
+        try:
+            with socket.create_connection((url.hostname, url.port or 80), timeout=30) as sock:
+                for start in range(0, len(request), chunk):
+                    sock.sendall(request[start:start + chunk])
+                    if stop.wait(delay):
+                        return
+                while sock.recv(chunk) and not stop.wait(delay):
+                    pass
+        except OSError:
+            stop.wait(delay)
+
+
+def percentile(sorted_values, pct):
+    """Percentil pelo método nearest-rank (valores já ordenados)"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct * len(sorted_values) / 100))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': round(count / elapsed, 2) if elapsed else 0,
+        'mean_ms': round(sum(latencies) / count * 1000, 2) if count else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if count else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if count else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if count else None,
+        'max_ms': round(latencies[-1] * 1000, 2) if count else None,
+    }
+
+
+def run_benchmark(base_url, scenarios, concurrency=20, duration=30, warmup=5, seed=42, event_ids=None,
+                  slow_clients=0, slow_client_delay=0.5, log=print):
+    """Executa a carga e devolve o resultado (dict serializável em JSON)"""
+    event_ids = event_ids or list(
+        Event.objects.filter(status='published', title__startswith=SEED_EVENT_PREFIX).values_list('id', flat=True)
+    )
+    users = User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).count()
+    if not event_ids or users < concurrency:
+        raise RuntimeError('Dados sintéticos insuficientes; rode com --seed (ou manage.py seed_data) primeiro')
+    pages = max(1, Event.objects.filter(status='published').count() // settings.REST_FRAMEWORK['PAGE_SIZE'])
+
+    selected = [SCENARIOS[name] for name in scenarios]
+    weights = [scenario.weight for scenario in selected]
+    lock = threading.Lock()
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    statuses = defaultdict(lambda: defaultdict(int))
+
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    def worker(index):
+        client = BenchmarkClient(base_url, index)
+        ctx = ClientContext(seed + index, event_ids, pages, users)
+        response = client.login()
+        if response.status_code != 200:
+            raise RuntimeError(f'Login do cliente {index} falhou: HTTP {response.status_code}')
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            scenario = ctx.rnd.choices(selected, weights)[0]
+            request_start = time.perf_counter()
+            try:
+                status_code = scenario.run(client, ctx).status_code
+            except requests.RequestException:
+                status_code = 'connection_error'
+            latency = time.perf_counter() - request_start
+            if request_start < measure_from:
+                continue
+            with lock:
+                latencies[scenario.name].append(latency)
+                statuses[scenario.name][str(status_code)] += 1
+                if status_code not in scenario.ok_statuses:
+                    errors[scenario.name] += 1
+
+    log(f'{concurrency} clientes, {warmup}s de aquecimento + {duration}s medidos contra {base_url}')
+    stop_slow_clients = threading.Event()
+    if slow_clients:
+        log(f'{slow_clients} clientes lentos ({slow_client_delay}s entre pedaços)')
+    slow_threads = [
+        threading.Thread(target=slow_client, args=(base_url, stop_slow_clients, slow_client_delay), daemon=True)
+        for _ in range(slow_clients)
+    ]
+    for thread in slow_threads:
+        thread.start()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for future in [pool.submit(worker, index) for index in range(concurrency)]:
+                future.result()
+    finally:
+        stop_slow_clients.set()
+    elapsed = min(time.perf_counter(), deadline) - measure_from
+
+    all_latencies = [latency for values in latencies.values() for latency in values]
+    return {
+        'git_sha': git_sha(),
+        'timestamp': timezone.now().isoformat(),
+        'base_url': base_url,
+        'concurrency': concurrency,
+        'duration_s': duration,
+        'warmup_s': warmup,
+        'seed': seed,
+        'slow_clients': slow_clients,
+        'slow_client_delay_s': slow_client_delay,
+        'total': summarize(all_latencies, sum(errors.values()), elapsed),
+        'scenarios': {
+            name: {**summarize(latencies[name], errors[name], elapsed), 'statuses': dict(statuses[name])}
+            for name in scenarios
+        },
+    }
+
+
+def git_sha():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def save_result(result, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = timezone.now().strftime('%Y%m%dT%H%M%S')
+    path = os.path.join(output_dir, f"{stamp}_{result['git_sha']}.json")
+    with open(path, 'w') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def load_result(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare_results(baseline, current):
+    """Linhas (cenário, métrica, antes, depois, variação %) para as métricas principais"""
+    rows = []
+    for name, metrics in [('total', current['total']), *current['scenarios'].items()]:
+        before = baseline['total'] if name == 'total' else baseline['scenarios'].get(name)
+        if not before:
+            continue
+        for metric in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            old, new = before.get(metric), metrics.get(metric)
+            change = round((new - old) / old * 100, 1) if old and new is not None else None
+            rows.append((name, metric, old, new, change))
+    return rows
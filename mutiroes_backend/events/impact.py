@@ -0,0 +1,52 @@
+"""
+Métricas de impacto derivadas dos relatórios pós-evento
+
+Calculadas no banco, em um único UPDATE por lote, e gravadas no próprio
+EventReport: o serializer e o relatório mensal leem os valores prontos. Campos
+não informados no relatório (NULL) contam como zero.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, ExpressionWrapper, F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import EventReport
+
+CO2_KG_PER_TREE = Decimal('22')  # kg de CO₂ absorvidos por árvore por ano
+BATCH_SIZE = 500
+
+ZERO = Value(Decimal('0'))
+
+
+def impact_values():
+    """Expressões das métricas derivadas, para QuerySet.update()"""
+    return {
+        'carbon_offset_kg': ExpressionWrapper(
+            Coalesce(F('trees_planted'), 0) * Value(CO2_KG_PER_TREE),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        'waste_diverted_kg': ExpressionWrapper(
+            Coalesce(F('trash_collected_kg'), ZERO) + Coalesce(F('recyclable_material_kg'), ZERO),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+        'impact_computed_at': Value(timezone.now()),
+    }
+
+
+def update_report_impact(queryset):
+    """Recalcula as métricas dos relatórios do queryset; retorna quantos foram atualizados"""
+    return queryset.update(**impact_values())
+
+
+def update_all_report_impact(batch_size=BATCH_SIZE):
+    """Recalcula todos os relatórios em lotes por id (keyset), um UPDATE curto por lote"""
+    total, last_pk = 0, 0
+    while True:
+        ids = list(
+            EventReport.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return total
+        total += update_report_impact(EventReport.objects.filter(pk__in=ids))
+        last_pk = ids[-1]
@@ -0,0 +1,99 @@
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from events.benchmark import SCENARIOS, compare_results, load_result, run_benchmark, save_result
+
+
+class Command(BaseCommand):
+    help = 'Executa o benchmark de carga da API (p50/p95/p99 e throughput por cenário)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000',
+                            help='Servidor alvo (backend direto ou o nginx)')
+        parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), dest='scenarios',
+                            help='Cenário a executar (repetível); padrão: todos')
+        parser.add_argument('--concurrency', type=int, default=20, help='Clientes simultâneos')
+        parser.add_argument('--duration', type=int, default=30, help='Segundos medidos')
+        parser.add_argument('--warmup', type=int, default=5, help='Segundos de aquecimento descartados')
+        parser.add_argument('--slow-clients', type=int, default=0,
+                            help='Conexões lentas abertas em paralelo durante a medição')
+        parser.add_argument('--slow-client-delay', type=float, default=0.5,
+                            help='Segundos entre os pedaços enviados/lidos por cliente lento')
+        parser.add_argument('--random-seed', type=int, default=42, help='Semente dos sorteios (reprodutível)')
+        parser.add_argument('--seed', action='store_true',
+                            help='Recriar os dados sintéticos (seed_data --clear) antes de medir')
+        parser.add_argument('--users', type=int, default=1000, help='Usuários sintéticos (com --seed)')
+        parser.add_argument('--events', type=int, default=200, help='Eventos sintéticos (com --seed)')
+        parser.add_argument('--participants-per-event', type=int, default=50,
+                            help='Média de inscrições por evento (com --seed)')
+        parser.add_argument('--output-dir', default=os.path.join(settings.BASE_DIR, 'benchmarks', 'results'),
+                            help='Diretório onde o resultado JSON é gravado')
+        parser.add_argument('--compare', metavar='ARQUIVO', help='Resultado anterior para comparar')
+        parser.add_argument('--no-save', action='store_true', help='Não gravar o resultado')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            if options['concurrency'] > options['users']:
+                raise CommandError('--concurrency não pode exceder --users (cada cliente usa um usuário)')
+            call_command(
+                'seed_data',
+                clear=True,
+                users=options['users'],
+                events=options['events'],
+                participants_per_event=options['participants_per_event'],
+                seed=options['random_seed'],
+                stdout=self.stdout,
+            )
+
+        try:
+            result = run_benchmark(
+                options['base_url'],
+                options['scenarios'] or list(SCENARIOS),
+                concurrency=options['concurrency'],
+                duration=options['duration'],
+                warmup=options['warmup'],
+                seed=options['random_seed'],
+                slow_clients=options['slow_clients'],
+                slow_client_delay=options['slow_client_delay'],
+                log=self.stdout.write,
+            )
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.print_result(result)
+
+        if not options['no_save']:
+            path = save_result(result, options['output_dir'])
+            self.stdout.write(self.style.SUCCESS(f'Resultado gravado em {path}'))
+
+        if options['compare']:
+            self.print_comparison(load_result(options['compare']), result)
+
+    def print_result(self, result):
+        self.stdout.write(self.style.SUCCESS(f"\n=== Benchmark {result['git_sha']} ==="))
+        header = f"{'cenário':<10} {'reqs':>7} {'erros':>6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+        self.stdout.write(header)
+        for name, metrics in [*result['scenarios'].items(), ('total', result['total'])]:
+            self.stdout.write(
+                f"{name:<10} {metrics['requests']:>7} {metrics['errors']:>6} {metrics['throughput_rps']:>8} "
+                f"{self.ms(metrics['p50_ms'])} {self.ms(metrics['p95_ms'])} {self.ms(metrics['p99_ms'])}"
+            )
+
+    def print_comparison(self, baseline, result):
+        self.stdout.write(self.style.SUCCESS(f"\n=== {baseline['git_sha']} -> {result['git_sha']} ==="))
+        for name, metric, old, new, change in compare_results(baseline, result):
+            line = f'{name:<10} {metric:<15} {old!s:>10} -> {new!s:>10}'
+            if change is None:
+                self.stdout.write(line)
+                continue
+            # Throughput maior é melhor; latência maior é pior
+            worse = change < 0 if metric == 'throughput_rps' else change > 0
+            style = self.style.WARNING if worse and abs(change) >= 5 else self.style.SUCCESS
+            self.stdout.write(style(f'{line} ({change:+.1f}%)'))
+
+    @staticmethod
+    def ms(value):
+        return f'{value:>6}ms' if value is not None else f"{'-':>8}"
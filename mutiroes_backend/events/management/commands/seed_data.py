@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from events.seeding import Seeder, clear_seed_data
+
+
+class Command(BaseCommand):
+    help = 'Gera dados sintéticos em massa (usuários, eventos, participantes, comentários e relatórios)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--events', type=int, default=200)
+        parser.add_argument('--participants-per-event', type=int, default=50,
+                            help='Média de inscrições por evento (ex.: 20000 eventos x 50 = 1M)')
+        parser.add_argument('--comments-per-event', type=int, default=5)
+        parser.add_argument('--past-ratio', type=float, default=0.3, help='Fração de eventos já concluídos')
+        parser.add_argument('--report-ratio', type=float, default=0.5,
+                            help='Fração dos eventos concluídos com relatório')
+        parser.add_argument('--seed', type=int, default=42, help='Semente dos sorteios (mesma semente, mesmos dados)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true', help='Remover os dados sintéticos existentes antes')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_seed_data(log=self.stdout.write)
+
+        seeder = Seeder(
+            users=options['users'],
+            events=options['events'],
+            participants_per_event=options['participants_per_event'],
+            comments_per_event=options['comments_per_event'],
+            past_ratio=options['past_ratio'],
+            report_ratio=options['report_ratio'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        try:
+            seeder.run()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS('Dados sintéticos gerados'))
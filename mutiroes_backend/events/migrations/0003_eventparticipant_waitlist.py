@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0002_eventreport'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eventparticipant',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pendente'), ('confirmed', 'Confirmado'), ('waitlisted', 'Lista de Espera'), ('cancelled', 'Cancelado'), ('rejected', 'Rejeitado')], default='pending', max_length=20, verbose_name='Status'),
+        ),
+        migrations.AddIndex(
+            model_name='eventparticipant',
+            index=models.Index(fields=['event', 'status', 'registered_at'], name='participant_waitlist_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_eventparticipant_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='cover_image_height',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Altura da Capa'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='cover_image_renditions',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Versões da Capa'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='cover_image_width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Largura da Capa'),
+        ),
+        migrations.AddField(
+            model_name='eventphoto',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Altura'),
+        ),
+        migrations.AddField(
+            model_name='eventphoto',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Versões Redimensionadas'),
+        ),
+        migrations.AddField(
+            model_name='eventphoto',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Largura'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('events', '0004_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventPhotoUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='Nome do Arquivo')),
+                ('total_size', models.PositiveBigIntegerField(verbose_name='Tamanho Total (bytes)')),
+                ('received_size', models.PositiveBigIntegerField(default=0, verbose_name='Recebido (bytes)')),
+                ('caption', models.CharField(blank=True, max_length=200, verbose_name='Legenda')),
+                ('is_before', models.BooleanField(default=False, verbose_name='Foto Antes')),
+                ('is_after', models.BooleanField(default=False, verbose_name='Foto Depois')),
+                ('status', models.CharField(choices=[('uploading', 'Enviando'), ('processing', 'Processando'), ('completed', 'Concluído'), ('failed', 'Falhou')], default='uploading', max_length=20, verbose_name='Status')),
+                ('error', models.CharField(blank=True, max_length=255, verbose_name='Erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='photo_uploads', to='events.event', verbose_name='Evento')),
+                ('photo', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload', to='events.eventphoto', verbose_name='Foto')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Upload de Foto',
+                'verbose_name_plural': 'Uploads de Fotos',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:36
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('events', '0005_eventphotoupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedEvent',
+            fields=[
+                ('id', models.PositiveBigIntegerField(primary_key=True, serialize=False, verbose_name='ID Original')),
+                ('title', models.CharField(max_length=200, verbose_name='Título')),
+                ('description', models.TextField(verbose_name='Descrição')),
+                ('address', models.CharField(max_length=300, verbose_name='Endereço')),
+                ('latitude', models.DecimalField(decimal_places=6, max_digits=9, verbose_name='Latitude')),
+                ('longitude', models.DecimalField(decimal_places=6, max_digits=9, verbose_name='Longitude')),
+                ('city', models.CharField(max_length=100, verbose_name='Cidade')),
+                ('state', models.CharField(max_length=2, verbose_name='Estado')),
+                ('start_date', models.DateTimeField(verbose_name='Data de Início')),
+                ('end_date', models.DateTimeField(verbose_name='Data de Término')),
+                ('max_participants', models.PositiveIntegerField(verbose_name='Máximo de Participantes')),
+                ('participants_count', models.PositiveIntegerField(default=0, verbose_name='Participantes Confirmados')),
+                ('checked_in_count', models.PositiveIntegerField(default=0, verbose_name='Check-ins Realizados')),
+                ('status', models.CharField(choices=[('draft', 'Rascunho'), ('published', 'Publicado'), ('cancelled', 'Cancelado'), ('completed', 'Concluído')], max_length=20, verbose_name='Status')),
+                ('is_public', models.BooleanField(default=True, verbose_name='Público')),
+                ('cover_image', models.ImageField(blank=True, null=True, upload_to='events/covers/', verbose_name='Imagem de Capa')),
+                ('cover_image_renditions', models.JSONField(blank=True, default=dict, verbose_name='Versões da Capa')),
+                ('resources', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Recursos')),
+                ('photos', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Fotos')),
+                ('comments', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Comentários')),
+                ('report', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Relatório')),
+                ('created_at', models.DateTimeField(verbose_name='Criado em')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Arquivado em')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='events.eventcategory', verbose_name='Categoria')),
+                ('organizer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_organized_events', to=settings.AUTH_USER_MODEL, verbose_name='Organizador')),
+            ],
+            options={
+                'verbose_name': 'Evento Arquivado',
+                'verbose_name_plural': 'Eventos Arquivados',
+                'ordering': ['-start_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedEventParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('confirmed', 'Confirmado'), ('waitlisted', 'Lista de Espera'), ('cancelled', 'Cancelado'), ('rejected', 'Rejeitado')], max_length=20, verbose_name='Status')),
+                ('experience_level', models.CharField(blank=True, max_length=20, verbose_name='Nível de Experiência')),
+                ('checked_in', models.BooleanField(default=False, verbose_name='Check-in Realizado')),
+                ('check_in_time', models.DateTimeField(blank=True, null=True, verbose_name='Horário do Check-in')),
+                ('registered_at', models.DateTimeField(verbose_name='Inscrito em')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='events.archivedevent', verbose_name='Evento')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_participations', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Participante de Evento Arquivado',
+                'verbose_name_plural': 'Participantes de Eventos Arquivados',
+                'ordering': ['-registered_at'],
+                'indexes': [models.Index(fields=['user', 'status'], name='archived_participant_user_idx')],
+                'unique_together': {('event', 'user')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedevent',
+            index=models.Index(fields=['organizer', 'start_date'], name='archived_event_organizer_idx'),
+        ),
+    ]
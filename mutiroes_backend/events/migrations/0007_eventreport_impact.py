@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:18
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def compute_impact(apps, schema_editor):
+    # Mesmo cálculo de events/impact.py, sobre o modelo histórico
+    EventReport = apps.get_model('events', 'EventReport')
+    zero = Value(Decimal('0'))
+    EventReport.objects.update(
+        carbon_offset_kg=models.ExpressionWrapper(
+            Coalesce(F('trees_planted'), 0) * Value(Decimal('22')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+        waste_diverted_kg=models.ExpressionWrapper(
+            Coalesce(F('trash_collected_kg'), zero) + Coalesce(F('recyclable_material_kg'), zero),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        ),
+        impact_computed_at=Value(timezone.now()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_archived_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventreport',
+            name='carbon_offset_kg',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Carbono Compensado (kg CO₂/ano)'),
+        ),
+        migrations.AddField(
+            model_name='eventreport',
+            name='impact_computed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Impacto Calculado em'),
+        ),
+        migrations.AddField(
+            model_name='eventreport',
+            name='waste_diverted_kg',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Resíduos Desviados (kg)'),
+        ),
+        migrations.RunPython(compute_impact, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:50
+
+from django.db import migrations, models
+
+
+def mark_completed_as_credited(apps, schema_editor):
+    # Eventos já concluídos tiveram os participantes creditados pela limpeza periódica
+    Event = apps.get_model('events', 'Event')
+    Event.objects.filter(status='completed').update(participation_credited=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_eventreport_impact'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='participation_credited',
+            field=models.BooleanField(default=False, verbose_name='Participações Contabilizadas'),
+        ),
+        migrations.RunPython(mark_completed_as_credited, migrations.RunPython.noop),
+    ]
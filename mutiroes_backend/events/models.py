@@ -1,5 +1,10 @@
+import os
+import uuid
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
@@ -20,6 +25,14 @@ class EventCategory(models.Model):
         return self.name
 
 
+class EventQuerySet(models.QuerySet):
+    def with_participants_count(self):
+        """Anota a contagem de confirmados (evita uma query por evento em participants_count)"""
+        return self.annotate(
+            confirmed_participants_count=models.Count('participants', filter=models.Q(participants__status='confirmed'))
+        )
+
+
 class Event(models.Model):
     """Modelo principal para eventos/mutirões"""
     STATUS_CHOICES = [
@@ -55,6 +68,8 @@ class Event(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft', verbose_name="Status")
     is_public = models.BooleanField(default=True, verbose_name="Público")
     requires_approval = models.BooleanField(default=False, verbose_name="Requer Aprovação")
+    # Horas e participação já somadas aos perfis (ver finalize_participation_counters)
+    participation_credited = models.BooleanField(default=False, verbose_name="Participações Contabilizadas")
     
     # Recursos necessários
     required_tools = models.TextField(blank=True, verbose_name="Ferramentas Necessárias")
@@ -63,11 +78,16 @@ class Event(models.Model):
     
     # Imagens
     cover_image = models.ImageField(upload_to='events/covers/', null=True, blank=True, verbose_name="Imagem de Capa")
+    cover_image_width = models.PositiveIntegerField(null=True, blank=True, verbose_name="Largura da Capa")
+    cover_image_height = models.PositiveIntegerField(null=True, blank=True, verbose_name="Altura da Capa")
+    cover_image_renditions = models.JSONField(default=dict, blank=True, verbose_name="Versões da Capa")
     
     # Metadados
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
     
+    objects = EventQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "Evento"
         verbose_name_plural = "Eventos"
@@ -86,11 +106,18 @@ class Event(models.Model):
     
     @property
     def participants_count(self):
+        if hasattr(self, 'confirmed_participants_count'):
+            return self.confirmed_participants_count
         return self.participants.filter(status='confirmed').count()
     
     @property
     def available_spots(self):
         return max(0, self.max_participants - self.participants_count)
+    
+    @property
+    def occupying_statuses(self):
+        """Status de inscrição que ocupam vaga: com aprovação, os pendentes também"""
+        return ['confirmed', 'pending'] if self.requires_approval else ['confirmed']
 
 
 class EventParticipant(models.Model):
@@ -98,6 +125,7 @@ class EventParticipant(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pendente'),
         ('confirmed', 'Confirmado'),
+        ('waitlisted', 'Lista de Espera'),
         ('cancelled', 'Cancelado'),
         ('rejected', 'Rejeitado'),
     ]
@@ -129,9 +157,26 @@ class EventParticipant(models.Model):
         verbose_name_plural = "Participantes dos Eventos"
         unique_together = ['event', 'user']
         ordering = ['-registered_at']
+        indexes = [
+            # Fila de espera FIFO: participantes em espera por ordem de inscrição
+            models.Index(fields=['event', 'status', 'registered_at'], name='participant_waitlist_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.event.title}"
+    
+    @property
+    def waitlist_position(self):
+        """Posição (1-based) na fila de espera, ou None se não estiver em espera"""
+        if self.status != 'waitlisted':
+            return None
+        return EventParticipant.objects.filter(
+            event_id=self.event_id,
+            status='waitlisted',
+        ).filter(
+            models.Q(registered_at__lt=self.registered_at) |
+            models.Q(registered_at=self.registered_at, id__lte=self.id)
+        ).count()
 
 
 class EventResource(models.Model):
@@ -169,6 +214,9 @@ class EventPhoto(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='photos', verbose_name="Evento")
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Usuário")
     photo = models.ImageField(upload_to='events/photos/', verbose_name="Foto")
+    width = models.PositiveIntegerField(null=True, blank=True, verbose_name="Largura")
+    height = models.PositiveIntegerField(null=True, blank=True, verbose_name="Altura")
+    renditions = models.JSONField(default=dict, blank=True, verbose_name="Versões Redimensionadas")
     caption = models.CharField(max_length=200, blank=True, verbose_name="Legenda")
     is_before = models.BooleanField(default=False, verbose_name="Foto Antes")
     is_after = models.BooleanField(default=False, verbose_name="Foto Depois")
@@ -184,6 +232,51 @@ class EventPhoto(models.Model):
         return f"Foto - {self.event.title}"
 
 
+class EventPhotoUpload(models.Model):
+    """Upload de foto em partes, retomável após falhas de conexão"""
+    STATUS_CHOICES = [
+        ('uploading', 'Enviando'),
+        ('processing', 'Processando'),
+        ('completed', 'Concluído'),
+        ('failed', 'Falhou'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='photo_uploads', verbose_name="Evento")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Usuário")
+    filename = models.CharField(max_length=255, verbose_name="Nome do Arquivo")
+    total_size = models.PositiveBigIntegerField(verbose_name="Tamanho Total (bytes)")
+    received_size = models.PositiveBigIntegerField(default=0, verbose_name="Recebido (bytes)")
+    
+    # Dados da foto criada ao final
+    caption = models.CharField(max_length=200, blank=True, verbose_name="Legenda")
+    is_before = models.BooleanField(default=False, verbose_name="Foto Antes")
+    is_after = models.BooleanField(default=False, verbose_name="Foto Depois")
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading', verbose_name="Status")
+    photo = models.OneToOneField(EventPhoto, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload', verbose_name="Foto")
+    error = models.CharField(max_length=255, blank=True, verbose_name="Erro")
+    
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+    
+    class Meta:
+        verbose_name = "Upload de Foto"
+        verbose_name_plural = "Uploads de Fotos"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Upload {self.filename} - {self.event.title}"
+    
+    @property
+    def temp_path(self):
+        return os.path.join(settings.PHOTO_UPLOAD_TEMP_DIR, f'{self.id}.part')
+    
+    @property
+    def is_complete(self):
+        return self.received_size >= self.total_size
+
+
 class EventComment(models.Model):
     """Comentários nos eventos"""
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='comments', verbose_name="Evento")
@@ -218,6 +311,11 @@ class EventReport(models.Model):
     area_cleaned_m2 = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Área Limpa (m²)")
     recyclable_material_kg = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True, verbose_name="Material Reciclável (kg)")
     
+    # Impacto calculado (events/impact.py), recalculado a cada alteração do relatório
+    carbon_offset_kg = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="Carbono Compensado (kg CO₂/ano)")
+    waste_diverted_kg = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Resíduos Desviados (kg)")
+    impact_computed_at = models.DateTimeField(null=True, blank=True, verbose_name="Impacto Calculado em")
+    
     # Observações
     summary = models.TextField(verbose_name="Resumo do Evento")
     challenges = models.TextField(blank=True, verbose_name="Desafios Encontrados")
@@ -232,4 +330,80 @@ class EventReport(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"Relatório - {self.event.title}"
\ No newline at end of file
+        return f"Relatório - {self.event.title}"
+
+
+class ArchivedEvent(models.Model):
+    """
+    Evento concluído há mais de EVENT_ARCHIVE_AFTER_DAYS dias, movido das
+    tabelas quentes (ver events/archive.py). Mantém o id original; recursos,
+    fotos, comentários e relatório ficam congelados em JSON.
+    """
+    # Mesma faixa do BigAutoField de Event
+    id = models.PositiveBigIntegerField(primary_key=True, verbose_name="ID Original")
+    title = models.CharField(max_length=200, verbose_name="Título")
+    description = models.TextField(verbose_name="Descrição")
+    category = models.ForeignKey(EventCategory, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Categoria")
+    organizer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_organized_events', verbose_name="Organizador")
+    
+    # Localização
+    address = models.CharField(max_length=300, verbose_name="Endereço")
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, verbose_name="Latitude")
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, verbose_name="Longitude")
+    city = models.CharField(max_length=100, verbose_name="Cidade")
+    state = models.CharField(max_length=2, verbose_name="Estado")
+    
+    # Data e participação
+    start_date = models.DateTimeField(verbose_name="Data de Início")
+    end_date = models.DateTimeField(verbose_name="Data de Término")
+    max_participants = models.PositiveIntegerField(verbose_name="Máximo de Participantes")
+    participants_count = models.PositiveIntegerField(default=0, verbose_name="Participantes Confirmados")
+    checked_in_count = models.PositiveIntegerField(default=0, verbose_name="Check-ins Realizados")
+    status = models.CharField(max_length=20, choices=Event.STATUS_CHOICES, verbose_name="Status")
+    is_public = models.BooleanField(default=True, verbose_name="Público")
+    
+    cover_image = models.ImageField(upload_to='events/covers/', null=True, blank=True, verbose_name="Imagem de Capa")
+    cover_image_renditions = models.JSONField(default=dict, blank=True, verbose_name="Versões da Capa")
+    
+    # Dependentes congelados
+    resources = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder, verbose_name="Recursos")
+    photos = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder, verbose_name="Fotos")
+    comments = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder, verbose_name="Comentários")
+    report = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Relatório")
+    
+    created_at = models.DateTimeField(verbose_name="Criado em")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Arquivado em")
+    
+    class Meta:
+        verbose_name = "Evento Arquivado"
+        verbose_name_plural = "Eventos Arquivados"
+        ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['organizer', 'start_date'], name='archived_event_organizer_idx'),
+        ]
+    
+    def __str__(self):
+        return self.title
+
+
+class ArchivedEventParticipant(models.Model):
+    """Participação em evento arquivado (sem contatos de emergência)"""
+    event = models.ForeignKey(ArchivedEvent, on_delete=models.CASCADE, related_name='participants', verbose_name="Evento")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_participations', verbose_name="Usuário")
+    status = models.CharField(max_length=20, choices=EventParticipant.STATUS_CHOICES, verbose_name="Status")
+    experience_level = models.CharField(max_length=20, blank=True, verbose_name="Nível de Experiência")
+    checked_in = models.BooleanField(default=False, verbose_name="Check-in Realizado")
+    check_in_time = models.DateTimeField(null=True, blank=True, verbose_name="Horário do Check-in")
+    registered_at = models.DateTimeField(verbose_name="Inscrito em")
+    
+    class Meta:
+        verbose_name = "Participante de Evento Arquivado"
+        verbose_name_plural = "Participantes de Eventos Arquivados"
+        unique_together = ['event', 'user']
+        ordering = ['-registered_at']
+        indexes = [
+            models.Index(fields=['user', 'status'], name='archived_participant_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.event.title}"
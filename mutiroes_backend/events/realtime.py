@@ -0,0 +1,231 @@
+"""
+Atualizações dos eventos em tempo real (Server-Sent Events)
+
+Views e tasks publicam no Redis, depois do commit, o que os clientes antes
+buscavam fazendo polling do detalhe: contagem de participantes/vagas/
+check-ins, novos comentários e fotos e mudanças de status. Cada mensagem vai
+para o canal do evento (events:<id>:updates).
+
+Cada worker ASGI mantém uma única assinatura Redis (padrão events:*:updates)
+e repassa as mensagens às conexões SSE abertas naquele processo, então o
+número de conexões com o Redis não cresce com o número de clientes. Pub/sub
+não guarda histórico: ao (re)conectar, o cliente recebe um 'snapshot' com o
+estado atual.
+
+As mesmas mudanças invalidam o cache das estatísticas do evento (tag
+EVENT_CACHE_TAG, ver resilience.swr_cache).
+"""
+from collections import defaultdict
+import asyncio
+import json
+import logging
+import weakref
+
+import redis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, transaction
+from django.db.models import Count, Q
+
+from mutiroes_backend.redis_client import get_async_pubsub_client, get_redis_client
+from mutiroes_backend.resilience import invalidate_tags
+from .models import Event
+from .serializers import EventCommentSerializer, EventPhotoSerializer
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'events:{}:updates'
+CHANNEL_PATTERN = 'events:*:updates'
+EVENT_CACHE_TAG = 'event:{}'
+
+# Mensagens pendentes por conexão; um cliente que não acompanha perde as excedentes
+QUEUE_SIZE = 100
+
+
+def publish(messages):
+    """Publica [(event_id, tipo, dados)] em um único round-trip"""
+    try:
+        pipeline = get_redis_client().pipeline(transaction=False)
+        for event_id, kind, data in messages:
+            pipeline.publish(CHANNEL.format(event_id), json.dumps({'type': kind, 'data': data}, cls=DjangoJSONEncoder))
+        pipeline.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not publish event updates: {str(e)}")
+
+
+def notify(event_id, kind, build):
+    """
+    Publica depois do commit da transação atual; `build` monta os dados só
+    então, com o estado já gravado
+    """
+    def send():
+        invalidate_tags(EVENT_CACHE_TAG.format(event_id))
+        try:
+            data = build()
+        except DatabaseError as e:
+            logger.warning(f"Could not build '{kind}' update for event {event_id}: {str(e)}")
+            return
+        publish([(event_id, kind, data)])
+    transaction.on_commit(send)
+
+
+def _counts(row):
+    return {
+        'participants_count': row['confirmed'],
+        'available_spots': max(0, row['max_participants'] - row['confirmed']),
+        'waitlisted_count': row['waitlisted'],
+        'checked_in_count': row['checked_in'],
+    }
+
+
+def _counts_row(event_id):
+    return (
+        Event.objects.filter(id=event_id)
+        .annotate(
+            confirmed=Count('participants', filter=Q(participants__status='confirmed')),
+            waitlisted=Count('participants', filter=Q(participants__status='waitlisted')),
+            checked_in=Count('participants', filter=Q(participants__checked_in=True)),
+        )
+        .values('status', 'max_participants', 'confirmed', 'waitlisted', 'checked_in')
+        .first()
+    )
+
+
+def participant_counts(event_id):
+    """Contagens exibidas no detalhe, em uma única query (None se o evento não existe)"""
+    row = _counts_row(event_id)
+    return _counts(row) if row is not None else None
+
+
+def event_snapshot(event_id):
+    """Estado inicial enviado a cada conexão (None se o evento não existe)"""
+    row = _counts_row(event_id)
+    return {'status': row['status'], **_counts(row)} if row is not None else None
+
+
+def notify_participants_changed(event_id):
+    notify(event_id, 'participants', lambda: participant_counts(event_id))
+
+
+def notify_status_changed(event_ids, status):
+    def send():
+        invalidate_tags(*(EVENT_CACHE_TAG.format(event_id) for event_id in event_ids))
+        publish([(event_id, 'status', {'status': status}) for event_id in event_ids])
+    transaction.on_commit(send)
+
+
+def notify_comment(comment):
+    # Comentário novo ainda não tem respostas: evita a query do serializer
+    comment.prefetched_replies = []
+    data = {**EventCommentSerializer(comment).data, 'parent_id': comment.parent_id}
+    notify(comment.event_id, 'comment', lambda: data)
+
+
+def notify_photos(photos):
+    """Fotos prontas (já processadas), agrupadas por evento"""
+    by_event = defaultdict(list)
+    for photo in photos:
+        by_event[photo.event_id].append(photo)
+
+    def send():
+        invalidate_tags(*(EVENT_CACHE_TAG.format(event_id) for event_id in by_event))
+        publish([
+            (event_id, 'photos', EventPhotoSerializer(event_photos, many=True).data)
+            for event_id, event_photos in by_event.items()
+        ])
+    transaction.on_commit(send)
+
+
+class UpdateHub:
+    """Assinatura Redis do processo, repassada às filas das conexões SSE locais"""
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.listener = None
+
+    def subscribe(self, event_id):
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.subscribers[event_id].add(queue)
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.create_task(self.listen())
+        return queue
+
+    def unsubscribe(self, event_id, queue):
+        queues = self.subscribers.get(event_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[event_id]
+        if not self.subscribers and self.listener is not None:
+            self.listener.cancel()
+            self.listener = None
+
+    def dispatch(self, channel, payload):
+        try:
+            event_id = int(channel.split(':')[1])
+            message = json.loads(payload)
+        except (IndexError, ValueError):
+            return
+        for queue in self.subscribers.get(event_id, ()):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                pass
+
+    async def listen(self):
+        while True:
+            pubsub = get_async_pubsub_client().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.psubscribe(CHANNEL_PATTERN)
+                async for message in pubsub.listen():
+                    if message['type'] == 'pmessage':
+                        self.dispatch(message['channel'].decode(), message['data'])
+            except redis.RedisError as e:
+                logger.warning(f"Event updates subscription lost, retrying: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except redis.RedisError:
+                    pass
+
+
+# Um hub por event loop (conexões redis.asyncio pertencem ao loop que as criou)
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    loop = asyncio.get_running_loop()
+    if loop not in _hubs:
+        _hubs[loop] = UpdateHub()
+    return _hubs[loop]
+
+
+def sse(kind, data):
+    return f'event: {kind}\ndata: {json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)}\n\n'
+
+
+async def event_stream(event_id, snapshot):
+    """
+    Corpo text/event-stream de uma conexão: snapshot, atualizações e
+    comentários de keepalive. Termina após EVENT_STREAM_MAX_SECONDS; o
+    EventSource do navegador reconecta sozinho (e recebe novo snapshot).
+    """
+    hub = get_hub()
+    queue = hub.subscribe(event_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.EVENT_STREAM_MAX_SECONDS
+    try:
+        yield f'retry: {settings.EVENT_STREAM_RETRY_MS}\n\n'
+        yield sse('snapshot', snapshot)
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                message = await asyncio.wait_for(
+                    queue.get(), timeout=min(settings.EVENT_STREAM_KEEPALIVE_SECONDS, remaining)
+                )
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            yield sse(message['type'], message['data'])
+    finally:
+        hub.unsubscribe(event_id, queue)
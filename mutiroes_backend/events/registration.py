@@ -0,0 +1,102 @@
+"""
+Inscrição em eventos com decisões de capacidade serializadas por evento
+"""
+from contextlib import contextmanager
+import logging
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+from mutiroes_backend.redis_client import get_redis_client
+from .models import Event, EventParticipant
+from .realtime import notify_participants_changed
+from .tasks import promote_waitlisted_participants
+
+logger = logging.getLogger(__name__)
+
+REGISTRATION_LOCK_TIMEOUT = 5  # segundos; libera a vaga na fila se o processo morrer
+
+
+class RegistrationBusy(Exception):
+    """A fila de inscrição do evento não liberou a vez dentro do tempo de espera"""
+
+
+def schedule_waitlist_promotion(event_id):
+    """Agenda a promoção da fila de espera após o commit da transação atual"""
+    transaction.on_commit(lambda: promote_waitlisted_participants.delay(event_id))
+
+
+@contextmanager
+def registration_queue(event_id):
+    """
+    Fila curta por evento (lock no Redis) à frente do lock da linha do evento.
+
+    Só um processo por vez disputa o SELECT ... FOR UPDATE do evento, então
+    picos de inscrições esperam no Redis em vez de empilhar locks no PostgreSQL.
+    Se o Redis estiver indisponível, o lock da linha continua garantindo a
+    capacidade.
+    """
+    lock = get_redis_client().lock(
+        f'events:{event_id}:registration',
+        timeout=REGISTRATION_LOCK_TIMEOUT,
+        sleep=0.05,
+        blocking_timeout=settings.REGISTRATION_QUEUE_WAIT,
+    )
+    try:
+        acquired = lock.acquire()
+    except redis.RedisError as e:
+        logger.warning(f"Registration queue unavailable for event {event_id}: {str(e)}")
+        lock, acquired = None, True
+
+    if not acquired:
+        raise RegistrationBusy()
+
+    try:
+        yield
+    finally:
+        if lock is not None:
+            try:
+                lock.release()
+            except redis.RedisError:
+                # O lock expirou; o lock da linha já protegeu a decisão
+                pass
+
+
+def register_participant(event, user, **fields):
+    """
+    Inscreve o usuário no evento (confirmado, pendente ou em espera).
+
+    Retorna (participante, criado). Repetições da mesma inscrição devolvem a
+    participação existente em vez de violar o unique_together.
+    """
+    existing = EventParticipant.objects.filter(event=event, user=user).first()
+    if existing:
+        return existing, False
+
+    with registration_queue(event.id):
+        with transaction.atomic():
+            Event.objects.select_for_update().only('id').get(id=event.id)
+
+            # Sem vagas (ou com fila já formada): entrar na lista de espera.
+            # Contagem feita aqui, sob o lock, e não a anotada pela listagem;
+            # mesma regra de ocupação da promoção (Event.occupying_statuses)
+            has_waitlist = event.participants.filter(status='waitlisted').exists()
+            occupied = event.participants.filter(status__in=event.occupying_statuses).count()
+            if has_waitlist or occupied >= event.max_participants:
+                fields['status'] = 'waitlisted'
+            else:
+                fields['status'] = 'confirmed' if not event.requires_approval else 'pending'
+
+            participant, created = EventParticipant.objects.get_or_create(
+                event=event,
+                user=user,
+                defaults=fields,
+            )
+
+            if created:
+                notify_participants_changed(event.id)
+            if created and has_waitlist:
+                schedule_waitlist_promotion(event.id)
+
+    return participant, created
@@ -0,0 +1,254 @@
+"""
+Geração em massa de dados sintéticos (testes de carga e benchmark)
+
+Tudo é inserido com bulk_create em lotes, com um único hash de senha
+compartilhado por todos os usuários e sorteios determinísticos (mesma
+semente, mesmo conjunto de dados). Usuários e eventos gerados usam prefixos
+fixos, o que permite localizá-los ou removê-los depois.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from itertools import islice
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from users.models import UserProfile
+from .impact import update_report_impact
+from .models import Event, EventCategory, EventComment, EventParticipant, EventReport
+
+SEED_USERNAME = 'seed_user_{}'
+SEED_EMAIL = 'seed_user_{}@seed.local'
+SEED_USERNAME_PREFIX = 'seed_user_'
+SEED_EVENT_PREFIX = 'Mutirão sintético'
+SEED_PASSWORD = 'seed-senha-123'
+
+CATEGORIES = [
+    ('Limpeza de Praias', 'Mutirões de limpeza de praias e orlas marítimas', '🏖️', '#0EA5E9'),
+    ('Limpeza de Rios', 'Limpeza e preservação de rios e córregos', '🌊', '#06B6D4'),
+    ('Plantio de Árvores', 'Reflorestamento e plantio de mudas', '🌳', '#10B981'),
+    ('Limpeza de Parques', 'Manutenção e limpeza de parques e áreas verdes urbanas', '🏞️', '#22C55E'),
+    ('Reciclagem', 'Coleta seletiva e projetos de reciclagem', '♻️', '#84CC16'),
+    ('Educação Ambiental', 'Palestras, workshops e atividades educativas', '📚', '#F59E0B'),
+    ('Limpeza Urbana', 'Limpeza de ruas, calçadas e espaços públicos', '🏙️', '#EF4444'),
+    ('Proteção Animal', 'Cuidado e proteção da fauna local', '🦜', '#8B5CF6'),
+    ('Hortas Comunitárias', 'Criação e manutenção de hortas comunitárias', '🌱', '#14B8A6'),
+    ('Preservação de Mangues', 'Conservação e recuperação de manguezais', '🌿', '#059669'),
+]
+CITIES = [
+    ('São Paulo', 'SP', Decimal('-23.550520'), Decimal('-46.633308')),
+    ('Rio de Janeiro', 'RJ', Decimal('-22.906847'), Decimal('-43.172897')),
+    ('Belo Horizonte', 'MG', Decimal('-19.916681'), Decimal('-43.934493')),
+    ('Curitiba', 'PR', Decimal('-25.428954'), Decimal('-49.267137')),
+    ('Salvador', 'BA', Decimal('-12.977749'), Decimal('-38.501630')),
+    ('Recife', 'PE', Decimal('-8.047562'), Decimal('-34.876964')),
+    ('Porto Alegre', 'RS', Decimal('-30.034647'), Decimal('-51.217658')),
+    ('Florianópolis', 'SC', Decimal('-27.595378'), Decimal('-48.548050')),
+]
+FIRST_NAMES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elisa', 'Felipe', 'Gabriela', 'Hugo', 'Isabela', 'João',
+               'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Tiago', 'Vitória']
+LAST_NAMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa', 'Rodrigues', 'Almeida',
+              'Nascimento', 'Carvalho', 'Ribeiro', 'Gomes', 'Martins']
+COMMENTS = ['Vou levar luvas e sacos!', 'Alguém tem carona saindo do centro?', 'Ótima iniciativa!',
+            'Posso levar minha família?', 'Confirmado, até lá!', 'Precisa levar ferramentas?']
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Seeder:
+    """
+    Gera o conjunto de dados; cada etapa insere em lotes e devolve os ids
+    criados para a etapa seguinte.
+    """
+
+    def __init__(self, users=1000, events=200, participants_per_event=50, comments_per_event=5,
+                 past_ratio=0.3, report_ratio=0.5, seed=42, batch_size=5000, password=SEED_PASSWORD, log=print):
+        self.users = users
+        self.events = events
+        self.participants_per_event = participants_per_event
+        self.comments_per_event = comments_per_event
+        self.past_ratio = past_ratio
+        self.report_ratio = report_ratio
+        self.rnd = random.Random(seed)
+        self.batch_size = batch_size
+        self.password = password
+        self.log = log
+        self.now = timezone.now()
+
+    def run(self):
+        if User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).exists():
+            raise ValueError('Já existem dados sintéticos; use --clear para recriá-los')
+
+        categories = self.seed_categories()
+        user_ids = self.seed_users(categories)
+        events = self.seed_events(categories, user_ids)
+        self.seed_participants(events, user_ids)
+        self.seed_comments(events, user_ids)
+        self.seed_reports(events)
+
+    def stage(self, name, model, objects, return_ids=False):
+        """Insere os objetos em lotes, registrando o ritmo da etapa"""
+        start = time.perf_counter()
+        created, ids = 0, []
+        for batch in batched(objects, self.batch_size):
+            batch = model.objects.bulk_create(batch, batch_size=self.batch_size)
+            created += len(batch)
+            if return_ids:
+                ids.extend(obj.pk for obj in batch)
+        elapsed = time.perf_counter() - start
+        self.log(f'{name}: {created} em {elapsed:.1f}s ({created / elapsed if elapsed else 0:.0f}/s)')
+        return ids
+
+    def seed_categories(self):
+        categories = []
+        for name, description, icon, color in CATEGORIES:
+            category, _ = EventCategory.objects.get_or_create(
+                name=name, defaults={'description': description, 'icon': icon, 'color': color}
+            )
+            categories.append(category)
+        return categories
+
+    def seed_users(self, categories):
+        # Um único hash para todos: make_password por usuário custaria horas
+        password = make_password(self.password)
+        rnd = self.rnd
+        user_ids = self.stage('Usuários', User, (
+            User(
+                username=SEED_USERNAME.format(i),
+                email=SEED_EMAIL.format(i),
+                first_name=rnd.choice(FIRST_NAMES),
+                last_name=rnd.choice(LAST_NAMES),
+                password=password,
+            )
+            for i in range(self.users)
+        ), return_ids=True)
+
+        def build_profiles():
+            for user_id in user_ids:
+                city, state, _, _ = rnd.choice(CITIES)
+                yield UserProfile(
+                    user_id=user_id,
+                    city=city,
+                    state=state,
+                    total_events_participated=rnd.randint(0, 30),
+                    total_hours_volunteered=rnd.randint(0, 120),
+                )
+
+        profile_ids = self.stage('Perfis', UserProfile, build_profiles(), return_ids=True)
+
+        Interest = UserProfile.interests.through
+        self.stage('Interesses', Interest, (
+            Interest(userprofile_id=profile_id, eventcategory_id=category.id)
+            for profile_id in profile_ids
+            for category in rnd.sample(categories, rnd.randint(1, 3))
+        ))
+        return user_ids
+
+    def seed_events(self, categories, user_ids):
+        """Retorna [(id, is_past)] dos eventos criados"""
+        rnd = self.rnd
+        organizers = user_ids[:max(1, len(user_ids) // 20)]
+        schedule = []
+
+        def build():
+            for i in range(self.events):
+                is_past = rnd.random() < self.past_ratio
+                days = -rnd.randint(1, 365) if is_past else rnd.randint(2, 120)
+                start = self.now + timedelta(days=days, hours=rnd.randint(6, 16))
+                city, state, lat, lng = rnd.choice(CITIES)
+                category = rnd.choice(categories)
+                schedule.append(is_past)
+                yield Event(
+                    title=f'{SEED_EVENT_PREFIX} {i} - {category.name}',
+                    description=f'{category.description}. Evento gerado para testes de carga.',
+                    category=category,
+                    organizer_id=rnd.choice(organizers),
+                    address=f'Rua {rnd.choice(LAST_NAMES)}, {rnd.randint(1, 2000)}',
+                    latitude=lat,
+                    longitude=lng,
+                    city=city,
+                    state=state,
+                    start_date=start,
+                    end_date=start + timedelta(hours=rnd.choice([3, 4, 6])),
+                    registration_deadline=start - timedelta(days=1),
+                    max_participants=max(self.participants_per_event * 3, 20),
+                    status='completed' if is_past else 'published',
+                )
+
+        event_ids = self.stage('Eventos', Event, build(), return_ids=True)
+        return list(zip(event_ids, schedule))
+
+    def seed_participants(self, events, user_ids):
+        rnd = self.rnd
+        mean = self.participants_per_event
+
+        def build():
+            for event_id, is_past in events:
+                count = min(len(user_ids), rnd.randint(mean // 2, mean + mean // 2)) if mean else 0
+                for user_id in rnd.sample(user_ids, count):
+                    yield EventParticipant(
+                        event_id=event_id,
+                        user_id=user_id,
+                        status='confirmed' if rnd.random() < 0.9 else 'pending',
+                        checked_in=is_past and rnd.random() < 0.8,
+                        experience_level=rnd.choice(['beginner', 'intermediate', 'advanced']),
+                    )
+
+        self.stage('Participantes', EventParticipant, build())
+
+    def seed_comments(self, events, user_ids):
+        rnd = self.rnd
+        mean = self.comments_per_event
+        top_level = []
+
+        def build_top_level():
+            for event_id, _ in events:
+                for _ in range(rnd.randint(0, mean * 2) if mean else 0):
+                    top_level.append(event_id)
+                    yield EventComment(event_id=event_id, user_id=rnd.choice(user_ids), content=rnd.choice(COMMENTS))
+
+        comment_ids = self.stage('Comentários', EventComment, build_top_level(), return_ids=True)
+
+        # Cerca de um terço dos comentários recebe uma resposta
+        self.stage('Respostas', EventComment, (
+            EventComment(event_id=event_id, user_id=rnd.choice(user_ids), content=rnd.choice(COMMENTS), parent_id=parent_id)
+            for parent_id, event_id in zip(comment_ids, top_level)
+            if rnd.random() < 0.33
+        ))
+
+    def seed_reports(self, events):
+        rnd = self.rnd
+        past = [event_id for event_id, is_past in events if is_past]
+        organizers = dict(Event.objects.filter(id__in=past).values_list('id', 'organizer_id'))
+
+        self.stage('Relatórios', EventReport, (
+            EventReport(
+                event_id=event_id,
+                created_by_id=organizers[event_id],
+                total_participants=rnd.randint(5, 80),
+                total_hours=Decimal(rnd.randint(10, 400)),
+                trash_collected_kg=Decimal(rnd.randint(0, 500)) if rnd.random() < 0.8 else None,
+                trees_planted=rnd.randint(0, 200) if rnd.random() < 0.4 else None,
+                area_cleaned_m2=Decimal(rnd.randint(100, 20000)) if rnd.random() < 0.6 else None,
+                recyclable_material_kg=Decimal(rnd.randint(0, 200)) if rnd.random() < 0.5 else None,
+                summary='Relatório gerado para testes de carga.',
+            )
+            for event_id in past
+            if rnd.random() < self.report_ratio
+        ))
+        # bulk_create não dispara o recálculo (signal): calcula aqui, em um UPDATE
+        update_report_impact(EventReport.objects.filter(impact_computed_at=None))
+
+
+def clear_seed_data(log=print):
+    """Remove eventos e usuários sintéticos (e, em cascata, o que depende deles)"""
+    events, _ = Event.objects.filter(title__startswith=SEED_EVENT_PREFIX).delete()
+    users, _ = User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).delete()
+    log(f'Removidos {events + users} registros sintéticos')
@@ -1,33 +1,71 @@
+from collections import defaultdict
+import os
+
 from rest_framework import serializers
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.contrib.auth.models import User
+from mutiroes_backend import reference_data
+from mutiroes_backend.images import image_url, rendition_urls
+from mutiroes_backend.instrumentation import InstrumentedModelSerializer, InstrumentedSerializer
 from .models import (
     EventCategory, Event, EventParticipant, EventResource, 
-    EventPhoto, EventComment, EventReport
+    EventPhoto, EventPhotoUpload, EventComment, EventReport, ArchivedEvent
 )
 
 
-class EventCategorySerializer(serializers.ModelSerializer):
+class EventCategorySerializer(InstrumentedModelSerializer):
     class Meta:
         model = EventCategory
         fields = ['id', 'name', 'description', 'icon', 'color']
 
 
-class EventPhotoSerializer(serializers.ModelSerializer):
+def category_data(category_id):
+    """Categoria serializada a partir do cache em memória, sem join com EventCategory"""
+    category = reference_data.categories.get(category_id)
+    return EventCategorySerializer(category).data if category is not None else None
+
+
+def attach_comment_replies(comments, candidates):
+    """
+    Associa a cada comentário suas respostas, em qualquer profundidade, a
+    partir de uma única query (candidates) com todos os comentários do evento.
+    """
+    children = defaultdict(list)
+    for comment in candidates:
+        if comment.parent_id:
+            children[comment.parent_id].append(comment)
+    for comment in [*comments, *candidates]:
+        comment.prefetched_replies = children.get(comment.id, [])
+
+
+def user_avatar_url(user, size='thumb'):
+    """URL do avatar do usuário (versão redimensionada quando disponível) ou None"""
+    profile = getattr(user, 'profile', None) if user else None
+    if profile is None:
+        return None
+    return image_url(profile.avatar, profile.avatar_renditions, size)
+
+
+class EventPhotoSerializer(InstrumentedModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
+    renditions = serializers.SerializerMethodField()
+    
+    def get_renditions(self, obj):
+        return rendition_urls(obj.renditions)
     
     class Meta:
         model = EventPhoto
-        fields = ['id', 'photo', 'caption', 'is_before', 'is_after', 'user_name', 'created_at']
+        fields = ['id', 'photo', 'width', 'height', 'renditions', 'caption', 'is_before', 'is_after',
+                 'user_name', 'created_at']
 
 
-class EventCommentSerializer(serializers.ModelSerializer):
+class EventCommentSerializer(InstrumentedModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     user_avatar = serializers.SerializerMethodField()
     
     def get_user_avatar(self, obj):
-        if obj.user.profile and obj.user.profile.avatar and hasattr(obj.user.profile.avatar, 'url'):
-            return obj.user.profile.avatar.url
-        return None
+        return user_avatar_url(obj.user)
     replies = serializers.SerializerMethodField()
     
     class Meta:
@@ -35,11 +73,14 @@ class EventCommentSerializer(serializers.ModelSerializer):
         fields = ['id', 'content', 'user_name', 'user_avatar', 'replies', 'created_at', 'updated_at']
     
     def get_replies(self, obj):
-        replies = obj.replies.all()
-        return EventCommentSerializer(replies, many=True).data
+        # Respostas pré-carregadas (attach_comment_replies) evitam uma query por comentário
+        replies = getattr(obj, 'prefetched_replies', None)
+        if replies is None:
+            replies = obj.replies.select_related('user__profile')
+        return EventCommentSerializer(replies, many=True, context=self.context).data
 
 
-class EventResourceSerializer(serializers.ModelSerializer):
+class EventResourceSerializer(InstrumentedModelSerializer):
     is_fully_provided = serializers.BooleanField(read_only=True)
     
     class Meta:
@@ -48,14 +89,12 @@ class EventResourceSerializer(serializers.ModelSerializer):
                  'quantity_provided', 'unit', 'is_fully_provided']
 
 
-class EventParticipantSerializer(serializers.ModelSerializer):
+class EventParticipantSerializer(InstrumentedModelSerializer):
     user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     user_avatar = serializers.SerializerMethodField()
     
     def get_user_avatar(self, obj):
-        if obj.user.profile and obj.user.profile.avatar and hasattr(obj.user.profile.avatar, 'url'):
-            return obj.user.profile.avatar.url
-        return None
+        return user_avatar_url(obj.user)
     
     class Meta:
         model = EventParticipant
@@ -64,19 +103,24 @@ class EventParticipantSerializer(serializers.ModelSerializer):
                  'checked_in', 'check_in_time', 'registered_at']
 
 
-class EventListSerializer(serializers.ModelSerializer):
-    category = EventCategorySerializer(read_only=True)
+class EventListSerializer(InstrumentedModelSerializer):
+    category = serializers.SerializerMethodField()
     organizer_name = serializers.CharField(source='organizer.get_full_name', read_only=True)
     participants_count = serializers.IntegerField(read_only=True)
     available_spots = serializers.IntegerField(read_only=True)
     is_active = serializers.BooleanField(read_only=True)
     is_registration_open = serializers.BooleanField(read_only=True)
     cover_image_url = serializers.SerializerMethodField()
+    cover_image_renditions = serializers.SerializerMethodField()
+    
+    def get_category(self, obj):
+        return category_data(obj.category_id)
     
     def get_cover_image_url(self, obj):
-        if obj.cover_image and hasattr(obj.cover_image, 'url'):
-            return obj.cover_image.url
-        return None
+        return image_url(obj.cover_image, obj.cover_image_renditions, 'medium')
+    
+    def get_cover_image_renditions(self, obj):
+        return rendition_urls(obj.cover_image_renditions)
     
     class Meta:
         model = Event
@@ -84,11 +128,11 @@ class EventListSerializer(serializers.ModelSerializer):
                  'address', 'city', 'state', 'start_date', 'end_date', 
                  'max_participants', 'participants_count', 'available_spots',
                  'status', 'is_active', 'is_registration_open', 'cover_image_url',
-                 'created_at']
+                 'cover_image_renditions', 'created_at']
 
 
-class EventDetailSerializer(serializers.ModelSerializer):
-    category = EventCategorySerializer(read_only=True)
+class EventDetailSerializer(InstrumentedModelSerializer):
+    category = serializers.SerializerMethodField()
     organizer_name = serializers.CharField(source='organizer.get_full_name', read_only=True)
     organizer_avatar = serializers.SerializerMethodField()
     participants_count = serializers.IntegerField(read_only=True)
@@ -96,19 +140,21 @@ class EventDetailSerializer(serializers.ModelSerializer):
     is_active = serializers.BooleanField(read_only=True)
     is_registration_open = serializers.BooleanField(read_only=True)
     cover_image_url = serializers.SerializerMethodField()
+    cover_image_renditions = serializers.SerializerMethodField()
+    
+    def get_category(self, obj):
+        return category_data(obj.category_id)
     
     def get_organizer_avatar(self, obj):
         """Retorna URL do avatar do organizador ou None"""
-        if obj.organizer and hasattr(obj.organizer, 'profile') and obj.organizer.profile:
-            if obj.organizer.profile.avatar and hasattr(obj.organizer.profile.avatar, 'url'):
-                return obj.organizer.profile.avatar.url
-        return None
+        return user_avatar_url(obj.organizer)
     
     def get_cover_image_url(self, obj):
-        """Retorna URL da imagem de capa ou None"""
-        if obj.cover_image and hasattr(obj.cover_image, 'url'):
-            return obj.cover_image.url
-        return None
+        """Retorna URL da imagem de capa (versão grande quando disponível) ou None"""
+        return image_url(obj.cover_image, obj.cover_image_renditions, 'large')
+    
+    def get_cover_image_renditions(self, obj):
+        return rendition_urls(obj.cover_image_renditions)
     
     # Relacionamentos
     resources = EventResourceSerializer(many=True, read_only=True)
@@ -124,11 +170,11 @@ class EventDetailSerializer(serializers.ModelSerializer):
                  'max_participants', 'min_age', 'max_age', 'participants_count', 'available_spots',
                  'status', 'is_public', 'requires_approval', 'is_active', 'is_registration_open',
                  'required_tools', 'provided_tools', 'what_to_bring', 'cover_image_url',
-                 'resources', 'photos', 'comments', 'participants',
+                 'cover_image_renditions', 'resources', 'photos', 'comments', 'participants',
                  'created_at', 'updated_at']
 
 
-class EventCreateUpdateSerializer(serializers.ModelSerializer):
+class EventCreateUpdateSerializer(InstrumentedModelSerializer):
     class Meta:
         model = Event
         fields = ['title', 'description', 'category', 'address', 'latitude', 'longitude',
@@ -138,19 +184,23 @@ class EventCreateUpdateSerializer(serializers.ModelSerializer):
                  'cover_image']
     
     def validate(self, data):
-        if data['start_date'] >= data['end_date']:
+        # Atualização parcial: campos ausentes mantêm o valor atual do evento
+        def value(field):
+            return data.get(field, getattr(self.instance, field, None))
+        
+        if value('start_date') >= value('end_date'):
             raise serializers.ValidationError("A data de início deve ser anterior à data de término.")
         
-        if data['registration_deadline'] >= data['start_date']:
+        if value('registration_deadline') >= value('start_date'):
             raise serializers.ValidationError("O prazo de inscrição deve ser anterior à data de início.")
         
-        if data.get('min_age') and data.get('max_age') and data['min_age'] >= data['max_age']:
+        if value('min_age') and value('max_age') and value('min_age') >= value('max_age'):
             raise serializers.ValidationError("A idade mínima deve ser menor que a idade máxima.")
         
         return data
 
 
-class EventParticipantCreateSerializer(serializers.ModelSerializer):
+class EventParticipantCreateSerializer(InstrumentedModelSerializer):
     class Meta:
         model = EventParticipant
         fields = ['emergency_contact', 'emergency_phone', 'special_needs', 'experience_level']
@@ -163,10 +213,6 @@ class EventParticipantCreateSerializer(serializers.ModelSerializer):
         if EventParticipant.objects.filter(event=event, user=user).exists():
             raise serializers.ValidationError("Você já está inscrito neste evento.")
         
-        # Verificar se há vagas disponíveis
-        if event.participants_count >= event.max_participants:
-            raise serializers.ValidationError("Não há vagas disponíveis para este evento.")
-        
         # Verificar se as inscrições ainda estão abertas
         if not event.is_registration_open:
             raise serializers.ValidationError("As inscrições para este evento estão encerradas.")
@@ -174,31 +220,95 @@ class EventParticipantCreateSerializer(serializers.ModelSerializer):
         return data
 
 
-class EventParticipantUpdateSerializer(serializers.ModelSerializer):
+class EventParticipantUpdateSerializer(InstrumentedModelSerializer):
     class Meta:
         model = EventParticipant
         fields = ['status', 'emergency_contact', 'emergency_phone', 'special_needs', 'experience_level']
 
 
-class EventPhotoCreateSerializer(serializers.ModelSerializer):
+class EventPhotoCreateSerializer(InstrumentedModelSerializer):
     class Meta:
         model = EventPhoto
         fields = ['photo', 'caption', 'is_before', 'is_after']
 
 
-class EventCommentCreateSerializer(serializers.ModelSerializer):
+class EventPhotoBatchCreateSerializer(InstrumentedSerializer):
+    photos = serializers.ListField(
+        child=serializers.ImageField(),
+        allow_empty=False,
+        max_length=settings.PHOTO_BATCH_MAX_FILES,
+    )
+    captions = serializers.ListField(
+        child=serializers.CharField(max_length=200, allow_blank=True),
+        required=False,
+        default=list,
+    )
+    is_before = serializers.BooleanField(default=False)
+    is_after = serializers.BooleanField(default=False)
+    
+    def validate_photos(self, value):
+        for photo in value:
+            if photo.size > settings.PHOTO_UPLOAD_MAX_SIZE:
+                raise serializers.ValidationError(
+                    f"{photo.name} excede o limite de {settings.PHOTO_UPLOAD_MAX_SIZE // (1024 * 1024)} MB."
+                )
+        return value
+    
+    def validate(self, data):
+        if len(data['captions']) > len(data['photos']):
+            raise serializers.ValidationError("Há mais legendas do que fotos.")
+        return data
+
+
+class EventPhotoUploadSerializer(InstrumentedModelSerializer):
+    chunk_size = serializers.SerializerMethodField()
+    
+    def get_chunk_size(self, obj):
+        return settings.PHOTO_UPLOAD_CHUNK_SIZE
+    
+    class Meta:
+        model = EventPhotoUpload
+        fields = ['id', 'filename', 'total_size', 'received_size', 'chunk_size', 'caption',
+                 'is_before', 'is_after', 'status', 'photo', 'error', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+
+class EventPhotoUploadCreateSerializer(InstrumentedModelSerializer):
+    ALLOWED_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.webp']
+    
+    class Meta:
+        model = EventPhotoUpload
+        fields = ['filename', 'total_size', 'caption', 'is_before', 'is_after']
+    
+    def validate_filename(self, value):
+        value = os.path.basename(value)
+        if os.path.splitext(value)[1].lower() not in self.ALLOWED_EXTENSIONS:
+            raise serializers.ValidationError("Formato de imagem não suportado.")
+        return value
+    
+    def validate_total_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("O arquivo está vazio.")
+        if value > settings.PHOTO_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"O arquivo excede o limite de {settings.PHOTO_UPLOAD_MAX_SIZE // (1024 * 1024)} MB."
+            )
+        return value
+
+
+class EventCommentCreateSerializer(InstrumentedModelSerializer):
     class Meta:
         model = EventComment
         fields = ['content', 'parent']
 
 
-class EventResourceCreateUpdateSerializer(serializers.ModelSerializer):
+class EventResourceCreateUpdateSerializer(InstrumentedModelSerializer):
     class Meta:
         model = EventResource
         fields = ['name', 'description', 'resource_type', 'quantity_needed', 'quantity_provided', 'unit']
 
 
-class EventReportSerializer(serializers.ModelSerializer):
+class EventReportSerializer(InstrumentedModelSerializer):
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     event_title = serializers.CharField(source='event.title', read_only=True)
     
@@ -207,11 +317,14 @@ class EventReportSerializer(serializers.ModelSerializer):
         fields = ['id', 'event', 'event_title', 'created_by', 'created_by_name',
                  'total_participants', 'total_hours', 'trash_collected_kg', 
                  'trees_planted', 'area_cleaned_m2', 'recyclable_material_kg',
+                 'carbon_offset_kg', 'waste_diverted_kg', 'impact_computed_at',
                  'summary', 'challenges', 'achievements', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_by', 'created_at', 'updated_at']
+        # Impacto calculado pela task process_event_report_statistics (nulo até o primeiro cálculo)
+        read_only_fields = ['id', 'created_by', 'carbon_offset_kg', 'waste_diverted_kg', 'impact_computed_at',
+                            'created_at', 'updated_at']
 
 
-class EventReportCreateUpdateSerializer(serializers.ModelSerializer):
+class EventReportCreateUpdateSerializer(InstrumentedModelSerializer):
     class Meta:
         model = EventReport
         fields = ['total_participants', 'total_hours', 'trash_collected_kg', 
@@ -247,3 +360,93 @@ class EventReportCreateUpdateSerializer(serializers.ModelSerializer):
         if value is not None and value < 0:
             raise serializers.ValidationError("A quantidade de material reciclável não pode ser negativa.")
         return value
+
+
+class ArchivedEventListSerializer(InstrumentedModelSerializer):
+    category = serializers.SerializerMethodField()
+    organizer_name = serializers.CharField(source='organizer.get_full_name', read_only=True)
+    cover_image_url = serializers.SerializerMethodField()
+    has_report = serializers.SerializerMethodField()
+    
+    def get_category(self, obj):
+        return category_data(obj.category_id)
+    
+    def get_cover_image_url(self, obj):
+        return image_url(obj.cover_image, obj.cover_image_renditions, 'medium')
+    
+    def get_has_report(self, obj):
+        return obj.report is not None
+    
+    class Meta:
+        model = ArchivedEvent
+        fields = ['id', 'title', 'category', 'organizer_name', 'city', 'state', 'start_date', 'end_date',
+                 'participants_count', 'checked_in_count', 'status', 'cover_image_url', 'has_report',
+                 'archived_at']
+
+
+class ArchivedEventSerializer(ArchivedEventListSerializer):
+    """
+    Evento arquivado completo. Fotos e comentários vêm do JSON congelado; os
+    nomes dos autores vêm de context['user_names'] ({id: nome}).
+    """
+    photos = serializers.SerializerMethodField()
+    comments = serializers.SerializerMethodField()
+    
+    def user_name(self, user_id):
+        return self.context.get('user_names', {}).get(user_id)
+    
+    def get_photos(self, obj):
+        return [
+            {
+                'id': photo['id'],
+                'photo': default_storage.url(photo['photo']) if photo['photo'] else None,
+                'width': photo['width'],
+                'height': photo['height'],
+                'renditions': rendition_urls(photo['renditions']),
+                'caption': photo['caption'],
+                'is_before': photo['is_before'],
+                'is_after': photo['is_after'],
+                'user_name': self.user_name(photo['user_id']),
+                'created_at': photo['created_at'],
+            }
+            for photo in obj.photos
+        ]
+    
+    def get_comments(self, obj):
+        # Mesma árvore de EventCommentSerializer, montada a partir da lista plana
+        nodes = {
+            comment['id']: {
+                'id': comment['id'],
+                'content': comment['content'],
+                'user_name': self.user_name(comment['user_id']),
+                'replies': [],
+                'created_at': comment['created_at'],
+            }
+            for comment in obj.comments
+        }
+        roots = []
+        for comment in obj.comments:
+            parent = nodes.get(comment['parent_id'])
+            (parent['replies'] if parent else roots).append(nodes[comment['id']])
+        return roots
+    
+    class Meta(ArchivedEventListSerializer.Meta):
+        fields = ArchivedEventListSerializer.Meta.fields + [
+            'description', 'address', 'latitude', 'longitude', 'max_participants', 'is_public',
+            'resources', 'photos', 'comments', 'report', 'created_at',
+        ]
+
+
+def archived_report_data(archived_event, created_by_name=None):
+    """Relatório de um evento arquivado no mesmo formato de EventReportSerializer"""
+    report = archived_event.report
+    return {
+        'id': report.get('id'),
+        'event': archived_event.id,
+        'event_title': archived_event.title,
+        'created_by': report['created_by_id'],
+        'created_by_name': created_by_name,
+        # Arquivados antes do impacto calculado não têm esses campos
+        'carbon_offset_kg': None, 'waste_diverted_kg': None, 'impact_computed_at': None,
+        **{key: value for key, value in report.items() if key not in ('id', 'created_by_id')},
+    }
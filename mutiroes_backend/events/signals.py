@@ -0,0 +1,30 @@
+"""
+Invalidação do cache de dados de referência (resilience.swr_cache e o cache
+em memória de mutiroes_backend.reference_data) e recálculo do impacto dos
+relatórios
+
+Só para modelos editados raramente (admin, seed). Mudanças nos dados de um
+evento invalidam o cache explicitamente (realtime.notify_*): receivers de
+post_delete em participantes/fotos/comentários impediriam o Django de apagar
+esses registros em lote ao excluir eventos (ver archive.py).
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from mutiroes_backend import reference_data
+from mutiroes_backend.resilience import invalidate_tags_on_commit
+from .models import EventCategory, EventReport
+
+
+@receiver([post_save, post_delete], sender=EventCategory)
+def invalidate_categories(sender, **kwargs):
+    invalidate_tags_on_commit('event-categories')
+    reference_data.categories.invalidate_on_commit()
+
+
+@receiver(post_save, sender=EventReport)
+def recompute_report_impact(sender, instance, **kwargs):
+    # Só post_save: o recálculo grava com update(), sem disparar este receiver de novo
+    from .tasks import process_event_report_statistics
+    transaction.on_commit(lambda: process_event_report_statistics.delay(instance.event_id))
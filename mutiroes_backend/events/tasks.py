@@ -1,34 +1,43 @@
 """
 Celery tasks for asynchronous processing
 """
+import os
+
 from celery import shared_task
-from django.core.mail import send_mail
+from django.core.files import File
+from django.core.mail import send_mail, send_mass_mail
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Event, EventParticipant
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from datetime import timedelta
+from mutiroes_backend.coalescing import CoalescingTask
+from mutiroes_backend.db_router import read_intent
+from mutiroes_backend.images import finish_processing, process_image
+from .models import Event, EventParticipant, EventPhoto, EventPhotoUpload
+from .realtime import notify_participants_changed, notify_photos, notify_status_changed
+from PIL import Image
 import logging
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
 
-@shared_task(bind=True, max_retries=3)
-def send_event_notification_email(self, event_id, user_id, notification_type):
+def build_event_email(event, user, notification_type):
     """
-    Send event-related notification emails
+    Build (subject, message) for an event notification
     """
-    try:
-        event = Event.objects.get(id=event_id)
-        user = User.objects.get(id=user_id)
-        
-        subject_map = {
-            'registration': f'Confirmação de inscrição - {event.title}',
-            'reminder': f'Lembrete: {event.title} acontece em breve!',
-            'update': f'Atualização do evento - {event.title}',
-            'cancellation': f'Cancelamento do evento - {event.title}',
-        }
-        
-        message = f"""
+    subject_map = {
+        'registration': f'Confirmação de inscrição - {event.title}',
+        'reminder': f'Lembrete: {event.title} acontece em breve!',
+        'update': f'Atualização do evento - {event.title}',
+        'cancellation': f'Cancelamento do evento - {event.title}',
+        'waitlist_promotion': f'Vaga confirmada - {event.title}',
+        'report_reminder': f'Envie o relatório do evento - {event.title}',
+    }
+    
+    message = f"""
         Olá {user.first_name},
         
         Este é um email sobre o evento: {event.title}
@@ -38,9 +47,23 @@ def send_event_notification_email(self, event_id, user_id, notification_type):
         Atenciosamente,
         Equipe Mutirões
         """
+    
+    return subject_map.get(notification_type, 'Notificação de evento'), message
+
+
+@shared_task(bind=True, max_retries=3)
+def send_event_notification_email(self, event_id, user_id, notification_type):
+    """
+    Send event-related notification emails
+    """
+    try:
+        event = Event.objects.get(id=event_id)
+        user = User.objects.get(id=user_id)
+        
+        subject, message = build_event_email(event, user, notification_type)
         
         send_mail(
-            subject=subject_map.get(notification_type, 'Notificação de evento'),
+            subject=subject,
             message=message,
             from_email=settings.DEFAULT_FROM_EMAIL,
             recipient_list=[user.email],
@@ -84,34 +107,249 @@ def send_bulk_event_reminders(event_id):
         return f"Event {event_id} not found"
 
 
-@shared_task
-def process_event_report_statistics(event_id):
+@shared_task(bind=True, max_retries=3)
+def send_batch_event_notification_emails(self, event_id, user_ids, notification_type):
     """
-    Process and calculate event report statistics
+    Send the same event notification to many users over a single SMTP connection
     """
     try:
-        from .models import EventReport
-        
         event = Event.objects.get(id=event_id)
-        report = EventReport.objects.filter(event=event).first()
+        users = User.objects.filter(id__in=user_ids).exclude(email='')
         
-        if not report:
-            logger.warning(f"No report found for event {event_id}")
-            return "No report found"
+        messages = []
+        for user in users:
+            subject, message = build_event_email(event, user, notification_type)
+            messages.append((subject, message, settings.DEFAULT_FROM_EMAIL, [user.email]))
         
-        # Calculate environmental impact metrics
-        impact_data = {
-            'carbon_offset': report.trees_planted * 22,  # kg CO2 per tree/year
-            'waste_diverted': report.trash_collected_kg + report.recyclable_material_kg,
-            'area_impact': report.area_cleaned_m2,
-        }
-        
-        logger.info(f"Processed statistics for event {event_id}: {impact_data}")
-        return impact_data
+        sent_count = send_mass_mail(messages, fail_silently=False)
+        logger.info(f"Sent {sent_count} '{notification_type}' emails for event {event_id}")
+        return sent_count
         
     except Event.DoesNotExist:
         logger.error(f"Event {event_id} not found")
+        return 0
+    except Exception as exc:
+        logger.error(f"Error sending batch emails: {str(exc)}")
+        raise self.retry(exc=exc, countdown=60)
+
+
+@shared_task
+def promote_waitlisted_participants(event_id):
+    """
+    Promote waitlisted participants (FIFO) into spots freed by cancellations.
+    
+    The event row is locked for the whole decision so concurrent promotions
+    and registrations cannot hand out the same spot twice.
+    """
+    with transaction.atomic():
+        try:
+            event = Event.objects.select_for_update().get(id=event_id)
+        except Event.DoesNotExist:
+            logger.error(f"Event {event_id} not found")
+            return 0
+        
+        if not event.is_active:
+            return 0
+        
+        # With approval required, promoted participants stay pending and still hold a spot
+        free_spots = event.max_participants - event.participants.filter(status__in=event.occupying_statuses).count()
+        if free_spots <= 0:
+            return 0
+        
+        promoted = list(
+            event.participants.select_for_update()
+            .filter(status='waitlisted')
+            .order_by('registered_at', 'id')
+            .values_list('id', 'user_id')[:free_spots]
+        )
+        if not promoted:
+            return 0
+        
+        promoted_ids = [participant_id for participant_id, _ in promoted]
+        user_ids = [user_id for _, user_id in promoted]
+        
+        EventParticipant.objects.filter(id__in=promoted_ids).update(
+            status='pending' if event.requires_approval else 'confirmed',
+            updated_at=timezone.now(),
+        )
+        notify_participants_changed(event_id)
+        
+        transaction.on_commit(lambda: send_batch_event_notification_emails.delay(
+            event_id=event_id,
+            user_ids=user_ids,
+            notification_type='waitlist_promotion',
+        ))
+    
+    logger.info(f"Promoted {len(promoted_ids)} waitlisted participants for event {event_id}")
+    return len(promoted_ids)
+
+
+@shared_task
+def process_event_photos(photo_ids):
+    """
+    Strip EXIF, record dimensions and generate renditions for event photos
+    """
+    processed_ids = []
+    for photo in EventPhoto.objects.filter(id__in=photo_ids).only('id', 'photo'):
+        name = photo.photo.name
+        try:
+            result = process_image(name, 'photo')
+        except Exception as exc:
+            logger.error(f"Error processing photo {photo.id}: {str(exc)}")
+            continue
+        
+        updated = EventPhoto.objects.filter(id=photo.id, photo=name).update(
+            photo=result['name'],
+            width=result['width'],
+            height=result['height'],
+            renditions=result['renditions'],
+        )
+        finish_processing(name, result, updated)
+        if updated:
+            processed_ids.append(photo.id)
+    
+    # Fotos só aparecem para quem acompanha o evento depois de processadas
+    if processed_ids:
+        notify_photos(EventPhoto.objects.filter(id__in=processed_ids).select_related('user'))
+    
+    logger.info(f"Processed {len(processed_ids)}/{len(photo_ids)} event photos")
+    return len(processed_ids)
+
+
+@shared_task
+def process_event_cover_image(event_id):
+    """
+    Strip EXIF, record dimensions and generate renditions for an event cover
+    """
+    event = Event.objects.filter(id=event_id).only('id', 'cover_image').first()
+    if not event or not event.cover_image:
+        return None
+    
+    name = event.cover_image.name
+    result = process_image(name, 'cover')
+    
+    # Only store the result if the cover was not replaced meanwhile
+    updated = Event.objects.filter(id=event_id, cover_image=name).update(
+        cover_image=result['name'],
+        cover_image_width=result['width'],
+        cover_image_height=result['height'],
+        cover_image_renditions=result['renditions'],
+    )
+    finish_processing(name, result, updated)
+    logger.info(f"Processed cover image for event {event_id}")
+    return bool(updated)
+
+
+class AssembledUploadFile(File):
+    """
+    File already on local disk: lets FileSystemStorage move it into place
+    instead of copying it again
+    """
+    def temporary_file_path(self):
+        return self.file.name
+
+
+@shared_task
+def assemble_photo_upload(upload_id):
+    """
+    Turn a fully received chunked upload into an EventPhoto
+    """
+    try:
+        upload = EventPhotoUpload.objects.get(id=upload_id, status='processing')
+    except EventPhotoUpload.DoesNotExist:
+        logger.warning(f"Photo upload {upload_id} not found or not ready")
+        return None
+    
+    path = upload.temp_path
+    try:
+        if os.path.getsize(path) != upload.total_size:
+            raise ValueError("Tamanho do arquivo recebido não confere")
+        with Image.open(path) as image:
+            image.verify()
+        
+        with open(path, 'rb') as f:
+            photo = EventPhoto(
+                event_id=upload.event_id,
+                user_id=upload.user_id,
+                caption=upload.caption,
+                is_before=upload.is_before,
+                is_after=upload.is_after,
+            )
+            photo.photo.save(upload.filename, AssembledUploadFile(f), save=False)
+            photo.save()
+    except Exception as exc:
+        logger.error(f"Error assembling photo upload {upload_id}: {str(exc)}")
+        EventPhotoUpload.objects.filter(id=upload_id).update(
+            status='failed', error=str(exc)[:255], updated_at=timezone.now()
+        )
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    
+    EventPhotoUpload.objects.filter(id=upload_id).update(
+        status='completed', photo=photo, updated_at=timezone.now()
+    )
+    if os.path.exists(path):
+        os.remove(path)
+    
+    process_event_photos.delay([photo.id])
+    logger.info(f"Assembled photo upload {upload_id} into photo {photo.id}")
+    return photo.id
+
+
+@shared_task
+def cleanup_stale_photo_uploads():
+    """
+    Remove chunked uploads abandoned before completion, including those whose
+    assembly task was lost (still 'processing' long after the last chunk)
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.PHOTO_UPLOAD_EXPIRATION)
+    stale = EventPhotoUpload.objects.filter(
+        status__in=['uploading', 'processing', 'failed'],
+        updated_at__lt=cutoff,
+    )
+    
+    count = 0
+    for upload in stale:
+        if os.path.exists(upload.temp_path):
+            os.remove(upload.temp_path)
+        upload.delete()
+        count += 1
+    
+    logger.info(f"Removed {count} stale photo uploads")
+    return count
+
+
+@shared_task(base=CoalescingTask)
+def process_event_report_statistics(event_id):
+    """
+    Recalculate and store the impact metrics of an event report (one run per
+    burst of changes)
+    """
+    from .impact import update_report_impact
+    from .models import EventReport
+    
+    reports = EventReport.objects.filter(event_id=event_id)
+    if not update_report_impact(reports):
+        logger.warning(f"No report found for event {event_id}")
         return None
+    
+    impact_data = reports.values('carbon_offset_kg', 'waste_diverted_kg', 'area_cleaned_m2').first()
+    logger.info(f"Processed statistics for event {event_id}: {impact_data}")
+    return impact_data
+
+
+@shared_task
+def recompute_all_report_statistics():
+    """
+    Recalculate the stored impact metrics of every report, in id batches
+    (after a change in the formulas of events/impact.py)
+    """
+    from .impact import update_all_report_impact
+    
+    count = update_all_report_impact()
+    logger.info(f"Recomputed impact metrics of {count} reports")
+    return count
 
 
 @shared_task
@@ -119,23 +357,26 @@ def generate_monthly_impact_report():
     """
     Generate monthly environmental impact report across all events
     """
-    from datetime import datetime, timedelta
     from .models import EventReport
     
     try:
-        last_month = datetime.now() - timedelta(days=30)
-        reports = EventReport.objects.filter(
-            created_at__gte=last_month
-        )
-        
-        total_impact = {
-            'total_participants': sum(r.total_participants for r in reports),
-            'total_hours': sum(r.total_hours for r in reports),
-            'total_trash': sum(r.trash_collected_kg for r in reports),
-            'total_trees': sum(r.trees_planted for r in reports),
-            'total_area': sum(r.area_cleaned_m2 for r in reports),
-            'total_recyclable': sum(r.recyclable_material_kg for r in reports),
+        last_month = timezone.now() - timedelta(days=30)
+        totals = {
+            'total_participants': 'total_participants',
+            'total_hours': 'total_hours',
+            'total_trash': 'trash_collected_kg',
+            'total_trees': 'trees_planted',
+            'total_area': 'area_cleaned_m2',
+            'total_recyclable': 'recyclable_material_kg',
+            'total_carbon_offset': 'carbon_offset_kg',
+            'total_waste_diverted': 'waste_diverted_kg',
         }
+        with read_intent():
+            sums = EventReport.objects.filter(created_at__gte=last_month).aggregate(
+                reports=Count('id'), **{name: Sum(field) for name, field in totals.items()}
+            )
+        # Sum() of no rows (or only NULLs) is None
+        total_impact = {name: value or 0 for name, value in sums.items()}
         
         logger.info(f"Monthly impact report generated: {total_impact}")
         return total_impact
@@ -145,24 +386,129 @@ def generate_monthly_impact_report():
         return None
 
 
+def finalize_participation_counters(event_ids):
+    """
+    Credit checked-in participants of just-completed events on their profile
+    counters (events attended and hours volunteered).
+    
+    Must run inside a transaction: each event is credited once, whoever
+    completes it (this cleanup or the organizer), as its row is locked and
+    flagged as credited here. Users are grouped by their (events, hours)
+    increment so the whole batch is a handful of UPDATE ... SET col = col + n
+    statements.
+    """
+    from users.models import UserProfile
+    
+    event_ids = list(
+        Event.objects.select_for_update()
+        .filter(id__in=event_ids, participation_credited=False)
+        .values_list('id', flat=True)
+    )
+    if not event_ids:
+        return 0
+    Event.objects.filter(id__in=event_ids).update(participation_credited=True)
+    
+    durations = {
+        event_id: max(0, round((end_date - start_date).total_seconds() / 3600))
+        for event_id, start_date, end_date in Event.objects.filter(id__in=event_ids).values_list(
+            'id', 'start_date', 'end_date'
+        )
+    }
+    credits = {}
+    attended = EventParticipant.objects.filter(
+        event_id__in=event_ids, status='confirmed', checked_in=True
+    ).values_list('user_id', 'event_id')
+    for user_id, event_id in attended:
+        events, hours = credits.get(user_id, (0, 0))
+        credits[user_id] = (events + 1, hours + durations[event_id])
+    
+    users_by_increment = {}
+    for user_id, increment in credits.items():
+        users_by_increment.setdefault(increment, []).append(user_id)
+    for (events, hours), user_ids in users_by_increment.items():
+        UserProfile.objects.filter(user_id__in=user_ids).update(
+            total_events_participated=F('total_events_participated') + events,
+            total_hours_volunteered=F('total_hours_volunteered') + hours,
+        )
+    return len(credits)
+
+
+@shared_task(bind=True, max_retries=3)
+def send_report_reminders(self, event_ids):
+    """
+    Ask organizers of just-completed events to submit the post-event report
+    """
+    from .models import EventReport
+    
+    events = Event.objects.filter(id__in=event_ids).exclude(
+        id__in=EventReport.objects.filter(event_id__in=event_ids).values('event_id')
+    ).exclude(
+        organizer__email=''
+    ).exclude(
+        organizer__notification_settings__email_event_reminders=False
+    ).select_related('organizer')
+    
+    messages = []
+    for event in events:
+        subject, message = build_event_email(event, event.organizer, 'report_reminder')
+        messages.append((subject, message, settings.DEFAULT_FROM_EMAIL, [event.organizer.email]))
+    
+    try:
+        sent_count = send_mass_mail(messages, fail_silently=False) if messages else 0
+    except Exception as exc:
+        logger.error(f"Error sending report reminders: {str(exc)}")
+        raise self.retry(exc=exc, countdown=60)
+    
+    logger.info(f"Sent {sent_count} report reminders")
+    return sent_count
+
+
 @shared_task
 def cleanup_expired_events():
     """
-    Mark events as inactive if they have passed
+    Mark published events that already ended as completed.
+    
+    Runs every few minutes and works through expired events in small
+    id-ordered batches, one short transaction each, skipping rows locked by
+    concurrent requests (they are picked up on the next run). Each batch
+    finalizes profile counters in the same transaction and schedules report
+    reminders once it commits.
     """
-    from datetime import datetime
+    batch_size = settings.EVENT_CLEANUP_BATCH_SIZE
+    total = batches = 0
     
-    try:
-        now = datetime.now()
-        expired_events = Event.objects.filter(
-            end_date__lt=now,
-            status='published'
-        )
-        
-        count = expired_events.update(status='completed')
-        logger.info(f"Marked {count} events as completed")
-        return f"Marked {count} events as completed"
+    while batches < settings.EVENT_CLEANUP_MAX_BATCHES:
+        with transaction.atomic():
+            event_ids = list(
+                Event.objects.select_for_update(skip_locked=True)
+                .filter(status='published', end_date__lt=timezone.now())
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not event_ids:
+                break
+            
+            Event.objects.filter(id__in=event_ids).update(status='completed', updated_at=timezone.now())
+            credited = finalize_participation_counters(event_ids)
+            notify_status_changed(event_ids, 'completed')
+            transaction.on_commit(lambda ids=event_ids: send_report_reminders.delay(ids))
         
-    except Exception as exc:
-        logger.error(f"Error cleaning up events: {str(exc)}")
-        return None
+        total += len(event_ids)
+        batches += 1
+        logger.info(f"Completed batch of {len(event_ids)} events ({credited} participants credited)")
+    
+    logger.info(f"Marked {total} events as completed")
+    return total
+
+
+@shared_task
+def archive_completed_events():
+    """
+    Move events completed more than EVENT_ARCHIVE_AFTER_DAYS ago (with their
+    participations, photos, comments, resources and report) out of the hot tables
+    """
+    from .archive import archive_old_events
+    
+    count = archive_old_events(max_batches=settings.EVENT_ARCHIVE_MAX_BATCHES)
+    logger.info(f"Archived {count} completed events")
+    return count
@@ -1,3 +1,1739 @@
-from django.test import TestCase
+from contextlib import ExitStack
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import AnonymousUser, User
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from prometheus_client import CONTENT_TYPE_LATEST
+from prometheus_client.parser import text_string_to_metric_families
+import pybreaker
+import redis
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from mutiroes_backend import health, reference_data
+from mutiroes_backend.celery import app as celery_app
+from mutiroes_backend.coalescing import RUNNING_KEY, CoalescingTask
+from mutiroes_backend.db_connections import iterate_in_batches
+from mutiroes_backend.db_router import PrimaryReplicaRouter, ReplicaPinMiddleware, read_intent
+from mutiroes_backend.images import image_url, process_image
+from mutiroes_backend.instrumentation import RequestStats, fingerprint, record_queries
+from mutiroes_backend.metrics import celery_queue_lengths
+from mutiroes_backend.resilience import (
+    BREAKERS, SharedBreakerStorage, cached_call, call_with_breaker, deadline, get_circuit_breaker_status,
+    get_from_cache, invalidate_tags, is_rejection, set_to_cache, with_retry
+)
+from users.models import (
+    UserProfile, UserBadge, UserBadgeEarned, UserSkill, UserSkillLevel, UserAvailability
+)
+from . import async_views, realtime
+from .archive import archive_old_events
+from .benchmark import compare_results, percentile, summarize
+from .impact import update_all_report_impact
+from .registration import RegistrationBusy, register_participant
+from .seeding import SEED_EVENT_PREFIX, SEED_PASSWORD, SEED_USERNAME_PREFIX, clear_seed_data
+from .serializers import EventListSerializer, EventPhotoSerializer
+from .views import EventPhotoUploadDetailView
+from .tasks import (
+    assemble_photo_upload, cleanup_expired_events, cleanup_stale_photo_uploads, generate_monthly_impact_report,
+    process_event_photos, process_event_report_statistics,
+    promote_waitlisted_participants, send_batch_event_notification_emails, send_report_reminders
+)
+from .models import (
+    EventCategory, Event, EventParticipant, EventResource, EventPhoto, EventPhotoUpload, EventComment, EventReport,
+    ArchivedEvent, ArchivedEventParticipant
+)
+
+TEST_FILES = tempfile.mkdtemp()
+MEDIA_ROOT = os.path.join(TEST_FILES, 'media')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, PHOTO_UPLOAD_TEMP_DIR=os.path.join(TEST_FILES, 'uploads', 'tmp'))
+class EventTestCase(TestCase):
+    """
+    Base dos testes de eventos. Cada classe cria em setUpTestData só as
+    linhas de que precisa; o volume realista fica em QueryBudgetTestCase.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEST_FILES, ignore_errors=True)
+
+    def setUp(self):
+        # Como nos workers (gunicorn post_worker_init): dados de referência já em memória
+        for table in reference_data.TABLES.values():
+            table.load()
+
+    @staticmethod
+    def create_users(count, prefix='voluntario'):
+        # Um único hash para todos (make_password é lento de propósito)
+        password = make_password('senha-de-teste-123')
+        return User.objects.bulk_create([
+            User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com',
+                 first_name='Voluntário', last_name=str(i), password=password)
+            for i in range(count)
+        ])
+
+    @staticmethod
+    def build_event(organizer, category, days=10, **fields):
+        """Evento publicado (não salvo) que começa daqui a `days` dias; negativo: já aconteceu"""
+        start = timezone.now() + timedelta(days=days)
+        return Event(**{
+            'title': 'Mutirão', 'description': 'Limpeza', 'category': category, 'organizer': organizer,
+            'address': 'Rua A, 1', 'latitude': Decimal('-23.5'), 'longitude': Decimal('-46.6'),
+            'city': 'São Paulo', 'state': 'SP', 'start_date': start, 'end_date': start + timedelta(hours=4),
+            'registration_deadline': start - timedelta(days=1), 'max_participants': 50, 'status': 'published',
+            **fields,
+        })
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return client
+
+    def assertMaxQueries(self, max_queries, method, url, data=None, expected_status=200, client=None, **extra):
+        client = client or self.client
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(client, method)(url, data, **extra)
+        self.assertEqual(response.status_code, expected_status, getattr(response, 'data', response))
+        self.assertLessEqual(
+            len(queries), max_queries,
+            f'{method.upper()} {url} executou {len(queries)} queries (orçamento: {max_queries}):\n'
+            + '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+        return response
+
+
+class QueryBudgetTestCase(EventTestCase):
+    """
+    Base para testes de orçamento de queries.
+
+    Popula o banco com volume realista (centenas de eventos, milhares de
+    participantes, comentários aninhados) via bulk_create. Cada endpoint deve
+    executar no máximo um número fixo de queries, independente da quantidade
+    de linhas: um N+1 estoura o orçamento em vez de chegar ao load balancer.
+    """
+    USERS = 400
+    EVENTS = 300
+    BIG_EVENT_PARTICIPANTS = 1000
+    PARTICIPANTS_PER_EVENT = 10
+    TOP_LEVEL_COMMENTS = 40
+
+    @classmethod
+    def setUpTestData(cls):
+        rnd = random.Random(42)
+
+        cls.categories = EventCategory.objects.bulk_create([
+            EventCategory(name=f'Categoria {i}', icon='leaf') for i in range(8)
+        ])
+        cls.badges = UserBadge.objects.bulk_create([
+            UserBadge(name=f'Badge {i}', description='Badge', icon='star', badge_type='participation')
+            for i in range(10)
+        ])
+        cls.skills = UserSkill.objects.bulk_create([
+            UserSkill(name=f'Habilidade {i}', category='environmental') for i in range(15)
+        ])
+
+        users = cls.create_users(cls.USERS)
+        cls.user, cls.other_user = users[0], users[1]
+        profiles = UserProfile.objects.bulk_create([
+            UserProfile(user=user, city='São Paulo', state='SP', avatar=f'users/avatars/{user.id}.jpg')
+            for user in users
+        ])
+        UserProfile.interests.through.objects.bulk_create([
+            UserProfile.interests.through(userprofile_id=profile.id, eventcategory_id=category.id)
+            for profile in profiles
+            for category in rnd.sample(cls.categories, 3)
+        ])
+        UserBadgeEarned.objects.bulk_create([
+            UserBadgeEarned(user=user, badge=badge)
+            for user in users
+            for badge in rnd.sample(cls.badges, 4)
+        ])
+        UserSkillLevel.objects.bulk_create([
+            UserSkillLevel(user=user, skill=skill, level='intermediate')
+            for user in users
+            for skill in rnd.sample(cls.skills, 5)
+        ])
+        UserAvailability.objects.bulk_create([
+            UserAvailability(user=cls.user, day_of_week=day, start_time='08:00', end_time='12:00')
+            for day in ['monday', 'wednesday', 'saturday']
+        ])
+
+        def event(index, days):
+            return cls.build_event(
+                users[index % 50], cls.categories[index % 8], days, title=f'Mutirão {index}',
+                max_participants=2000, cover_image=f'events/covers/{index}.jpg',
+            )
+
+        # Metade dos eventos já aconteceu (timeline e relatórios), metade é futura
+        events = Event.objects.bulk_create([
+            event(i, days=(i - cls.EVENTS // 2) or 1) for i in range(cls.EVENTS)
+        ])
+        cls.big_event = events[-1]
+        cls.small_event = events[-2]
+        cls.past_event = events[0]
+
+        participants = [
+            EventParticipant(event=cls.big_event, user=user, status='confirmed')
+            for user in users[2:cls.BIG_EVENT_PARTICIPANTS + 2]
+        ]
+        for event in events[:-2]:
+            for user in rnd.sample(users[2:], cls.PARTICIPANTS_PER_EVENT):
+                participants.append(EventParticipant(event=event, user=user, status='confirmed'))
+        # O usuário principal participa de vários eventos passados e futuros
+        for event in events[:-2:5]:
+            participants.append(EventParticipant(event=event, user=cls.user, status='confirmed'))
+        EventParticipant.objects.bulk_create(participants, batch_size=1000)
+        cls.participant = EventParticipant.objects.filter(event=cls.big_event).first()
+
+        for event in (cls.big_event, cls.past_event):
+            comments = EventComment.objects.bulk_create([
+                EventComment(event=event, user=users[i % cls.USERS], content='Comentário')
+                for i in range(cls.TOP_LEVEL_COMMENTS)
+            ])
+            replies = EventComment.objects.bulk_create([
+                EventComment(event=event, user=users[(i + 7) % cls.USERS], content='Resposta', parent=parent)
+                for parent in comments for i in range(3)
+            ])
+            EventComment.objects.bulk_create([
+                EventComment(event=event, user=users[3], content='Resposta da resposta', parent=parent)
+                for parent in replies
+            ])
+            EventPhoto.objects.bulk_create([
+                EventPhoto(event=event, user=users[i % cls.USERS], photo=f'events/photos/{event.id}_{i}.jpg')
+                for i in range(30)
+            ])
+            EventResource.objects.bulk_create([
+                EventResource(event=event, name=f'Recurso {i}', resource_type='tool', quantity_needed=10)
+                for i in range(10)
+            ])
+        cls.resource = EventResource.objects.filter(event=cls.big_event).first()
+
+        EventReport.objects.create(
+            event=cls.past_event, created_by=cls.past_event.organizer, total_participants=10,
+            total_hours=Decimal('40.00'), trash_collected_kg=Decimal('120.50'), summary='Resumo'
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.user)
+
+
+def image_upload(name='foto.png'):
+    buffer = BytesIO()
+    Image.new('RGB', (32, 32), (0, 128, 0)).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class EventQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_categories(self):
+        self.assertMaxQueries(3, 'get', reverse('event-categories'))
+
+    def test_event_list(self):
+        response = self.assertMaxQueries(4, 'get', reverse('events-list'))
+        # response.json(): com SERVER_MODE=asgi a view assíncrona não devolve response.data
+        self.assertEqual(len(response.json()['results']), 20)
+
+    def test_event_list_filtered_and_ordered(self):
+        url = reverse('events-list')
+        self.assertMaxQueries(4, 'get', url, {'category': self.categories[0].id, 'search': 'Mutirão'})
+        self.assertMaxQueries(4, 'get', url, {'ordering': '-participants_count'})
+
+    def test_event_detail_does_not_grow_with_rows(self):
+        for event in (self.small_event, self.big_event, self.past_event):
+            self.assertMaxQueries(6, 'get', reverse('events-detail', args=[event.id]))
+
+    def test_event_stats(self):
+        self.assertMaxQueries(12, 'get', reverse('events-stats', args=[self.big_event.id]))
+
+    def test_my_events(self):
+        self.assertMaxQueries(4, 'get', reverse('events-my-events'))
+
+    def test_nearby(self):
+        self.assertMaxQueries(3, 'get', reverse('events-nearby'), {'latitude': '-23.5', 'longitude': '-46.6'})
+
+    def test_join_and_leave(self):
+        client = self.client_for(User.objects.create_user('novato', 'novato@example.com', 'senha'))
+        self.assertMaxQueries(13, 'post', reverse('events-join', args=[self.big_event.id]), expected_status=201, client=client)
+        self.assertMaxQueries(5, 'post', reverse('events-leave', args=[self.big_event.id]), client=client)
+
+    def test_check_in(self):
+        event = Event.objects.filter(participants__user=self.user, start_date__gt=timezone.now()).first()
+        self.assertMaxQueries(7, 'post', reverse('events-check-in', args=[event.id]))
+
+    def test_create_event(self):
+        start = timezone.now() + timedelta(days=10)
+        data = {
+            'title': 'Novo mutirão', 'description': 'Plantio', 'category': self.categories[0].id,
+            'address': 'Rua B, 2', 'latitude': '-23.5', 'longitude': '-46.6', 'city': 'São Paulo',
+            'state': 'SP', 'start_date': start.isoformat(), 'end_date': (start + timedelta(hours=3)).isoformat(),
+            'registration_deadline': (start - timedelta(days=1)).isoformat(), 'max_participants': 30,
+        }
+        self.assertMaxQueries(5, 'post', reverse('events-list'), data, expected_status=201, format='json')
+
+    def test_participants(self):
+        url = reverse('event-participants', args=[self.big_event.id])
+        response = self.assertMaxQueries(4, 'get', url)
+        self.assertEqual(len(response.data['results']), 20)
+
+        client = self.client_for(User.objects.create_user('novata', 'novata@example.com', 'senha'))
+        self.assertMaxQueries(13, 'post', url, {'experience_level': 'beginner'}, expected_status=201, client=client)
+
+    def test_participant_detail(self):
+        url = reverse('event-participant-detail', args=[self.big_event.id, self.participant.id])
+        self.assertMaxQueries(3, 'get', url)
+        self.assertMaxQueries(4, 'patch', url, {'special_needs': 'Nenhuma'})
+
+    def test_photos(self):
+        response = self.assertMaxQueries(4, 'get', reverse('event-photos', args=[self.big_event.id]))
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_photo_batch(self):
+        url = reverse('event-photos-batch', args=[self.big_event.id])
+        data = {'photos': [image_upload('a.png'), image_upload('b.png'), image_upload('c.png')]}
+        self.assertMaxQueries(5, 'post', url, data, expected_status=201, format='multipart')
+
+    def test_photo_upload_session(self):
+        url = reverse('event-photo-uploads', args=[self.big_event.id])
+        response = self.assertMaxQueries(
+            4, 'post', url, {'filename': 'foto.jpg', 'total_size': 1024}, expected_status=201, format='json'
+        )
+        detail = reverse('event-photo-upload-detail', args=[self.big_event.id, response.data['id']])
+        self.assertMaxQueries(3, 'get', detail)
+
+    def test_comments_do_not_grow_with_nesting(self):
+        for event in (self.small_event, self.big_event):
+            self.assertMaxQueries(5, 'get', reverse('event-comments', args=[event.id]))
+
+    def test_create_comment(self):
+        url = reverse('event-comments', args=[self.big_event.id])
+        self.assertMaxQueries(4, 'post', url, {'content': 'Vou levar luvas'}, expected_status=201)
+
+    def test_resources(self):
+        self.assertMaxQueries(3, 'get', reverse('event-resources', args=[self.big_event.id]))
+        self.assertMaxQueries(3, 'get', reverse('event-resource-detail', args=[self.big_event.id, self.resource.id]))
+
+    def test_report(self):
+        self.assertMaxQueries(3, 'get', reverse('event-report', args=[self.past_event.id]))
+
+
+def exif_jpeg(name='foto.jpg', size=(40, 20)):
+    """JPEG com EXIF de câmera e orientação 6 (girar 90° para exibir)"""
+    image = Image.new('RGB', size, (200, 30, 30))
+    exif = image.getexif()
+    exif[0x0110] = 'Camera de Teste'
+    exif[0x0112] = 6
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImageProcessingTests(EventTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, organizer = cls.create_users(2)
+        cls.event = cls.build_event(organizer, EventCategory.objects.create(name='Praias'))
+        cls.event.save()
+
+    def setUp(self):
+        super().setUp()
+        self.photo = EventPhoto.objects.create(event=self.event, user=self.user, photo=exif_jpeg())
+        self.original_name = self.photo.photo.name
+        patcher = patch('events.tasks.notify_photos')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_strips_exif_and_replaces_the_original(self):
+        process_event_photos([self.photo.id])
+        self.photo.refresh_from_db()
+
+        self.assertNotEqual(self.photo.photo.name, self.original_name)
+        self.assertFalse(default_storage.exists(self.original_name))
+        with default_storage.open(self.photo.photo.name) as f:
+            image = Image.open(f)
+            self.assertEqual(dict(image.getexif()), {})
+            # Orientação aplicada antes de descartar o EXIF
+            self.assertEqual(image.size, (20, 40))
+        self.assertEqual((self.photo.width, self.photo.height), (20, 40))
+
+    def test_generates_jpeg_and_webp_renditions(self):
+        process_event_photos([self.photo.id])
+        self.photo.refresh_from_db()
+
+        self.assertEqual(set(self.photo.renditions), set(settings.IMAGE_RENDITIONS['photo']))
+        for entry in self.photo.renditions.values():
+            self.assertEqual((entry['width'], entry['height']), (20, 40))
+            for fmt in ('jpeg', 'webp'):
+                self.assertTrue(default_storage.exists(entry[fmt]))
+        with default_storage.open(self.photo.renditions['thumb']['webp']) as f:
+            self.assertEqual(Image.open(f).format, 'WEBP')
+
+    def test_replaced_meanwhile_keeps_the_new_photo(self):
+        results = []
+
+        def replace_then_process(name, kind):
+            EventPhoto.objects.filter(id=self.photo.id).update(photo='events/photos/outra.jpg')
+            results.append(process_image(name, kind))
+            return results[-1]
+
+        with patch('events.tasks.process_image', side_effect=replace_then_process):
+            process_event_photos([self.photo.id])
+        self.photo.refresh_from_db()
+
+        self.assertEqual((self.photo.photo.name, self.photo.renditions), ('events/photos/outra.jpg', {}))
+        # Nada do processamento descartado fica órfão no storage
+        result, = results
+        self.assertFalse(default_storage.exists(result['name']))
+        for entry in result['renditions'].values():
+            self.assertFalse(default_storage.exists(entry['jpeg']))
+            self.assertFalse(default_storage.exists(entry['webp']))
+
+    def test_serializer_falls_back_to_the_original(self):
+        data = EventPhotoSerializer(self.photo).data
+        self.assertEqual(data['renditions'], {})
+        self.assertEqual(data['photo'], self.photo.photo.url)
+        self.assertIsNone(image_url(None))
+
+        self.event.cover_image = self.photo.photo.name
+        self.assertEqual(EventListSerializer(self.event).data['cover_image_url'], self.photo.photo.url)
+        self.event.cover_image_renditions = {'medium': {'jpeg': 'events/covers/renditions/capa_medium.jpg'}}
+        self.assertEqual(EventListSerializer(self.event).data['cover_image_url'],
+                         default_storage.url('events/covers/renditions/capa_medium.jpg'))
+
+
+class PhotoUploadTests(EventTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, organizer = cls.create_users(2)
+        cls.event = cls.build_event(organizer, EventCategory.objects.create(name='Parques'))
+        cls.event.save()
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.user)
+        self.content = image_upload().read()
+        response = self.client.post(reverse('event-photo-uploads', args=[self.event.id]), {
+            'filename': 'foto.png', 'total_size': len(self.content), 'caption': 'Antes',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.upload = EventPhotoUpload.objects.get(id=response.json()['id'])
+        self.url = reverse('event-photo-upload-detail', args=[self.event.id, self.upload.id])
+
+        # Montagem síncrona, como se o worker a executasse em seguida
+        for target, task in (('events.views.assemble_photo_upload.delay', assemble_photo_upload),
+                             ('events.tasks.process_event_photos.delay', None)):
+            patcher = patch(target, side_effect=task)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def send(self, offset, data):
+        return self.client.patch(self.url, data, content_type='application/offset+octet-stream',
+                                 HTTP_UPLOAD_OFFSET=str(offset))
+
+    def temp_files(self):
+        return [name for name in os.listdir(settings.PHOTO_UPLOAD_TEMP_DIR) if name.startswith(str(self.upload.id))]
+
+    def test_resumes_and_assembles_the_photo(self):
+        half = len(self.content) // 2
+        self.assertEqual(self.send(0, self.content[:half])['Upload-Offset'], str(half))
+
+        # Conexão caiu: o cliente consulta o offset e continua de onde parou
+        progress = self.client.get(self.url)
+        self.assertEqual(progress['Upload-Offset'], str(half))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.send(half, self.content[half:])
+        self.assertEqual(response.status_code, 202)
+
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.status, 'completed')
+        self.assertEqual(self.upload.photo.caption, 'Antes')
+        with self.upload.photo.photo.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(self.temp_files(), [])
+
+    def test_wrong_offset_conflicts(self):
+        self.send(0, self.content[:10])
+        response = self.send(0, self.content[:20])
+        self.assertEqual((response.status_code, response['Upload-Offset']), (409, '10'))
+        self.assertEqual(self.temp_files(), [f'{self.upload.id}.part'])
+
+    def test_concurrent_chunk_with_the_same_offset_does_not_overwrite(self):
+        winner = self.content[:10]
+        get_object = EventPhotoUploadDetailView.get_object
+
+        def raced_get_object(view):
+            upload = get_object(view)
+            if upload.received_size == 0 and view.request.headers.get('Upload-Offset') == '0':
+                # Um reenvio com o mesmo offset termina enquanto esta parte ainda chega
+                with patch.object(EventPhotoUploadDetailView, 'get_object', get_object):
+                    self.assertEqual(self.send(0, winner).status_code, 200)
+            return upload
+
+        with patch.object(EventPhotoUploadDetailView, 'get_object', raced_get_object):
+            response = self.send(0, b'x' * 10)
+        self.assertEqual((response.status_code, response['Upload-Offset']), (409, '10'))
+
+        with open(self.upload.temp_path, 'rb') as f:
+            self.assertEqual(f.read(), winner)
+        self.assertEqual(self.temp_files(), [f'{self.upload.id}.part'])
+
+    def test_failed_write_keeps_the_offset(self):
+        self.send(0, self.content[:10])
+        with patch('events.views.shutil.copyfileobj', side_effect=OSError('disco cheio')):
+            response = self.send(10, self.content[10:20])
+        self.assertEqual((response.status_code, response['Upload-Offset']), (503, '10'))
+
+        self.upload.refresh_from_db()
+        self.assertEqual((self.upload.received_size, self.upload.status), (10, 'uploading'))
+        self.assertEqual(self.temp_files(), [f'{self.upload.id}.part'])
+
+        # O cliente reenvia a mesma parte e o upload termina íntegro
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.send(10, self.content[10:]).status_code, 202)
+        self.upload.refresh_from_db()
+        with self.upload.photo.photo.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_batch_failure_deletes_saved_files(self):
+        saved = []
+        save = default_storage.save
+
+        def save_then_fail(name, content):
+            if saved:
+                raise OSError('disco cheio')
+            saved.append(save(name, content))
+            return saved[-1]
+
+        data = {'photos': [image_upload('a.png'), image_upload('b.png')]}
+        with patch('events.views.default_storage.save', side_effect=save_then_fail):
+            with self.assertRaises(OSError):
+                self.client.post(reverse('event-photos-batch', args=[self.event.id]), data, format='multipart')
+
+        self.assertEqual(len(saved), 1)
+        self.assertFalse(default_storage.exists(saved[0]))
+        self.assertFalse(EventPhoto.objects.exists())
+
+    def test_cleanup_collects_stale_uploads(self):
+        stuck = EventPhotoUpload.objects.create(
+            event=self.event, user=self.user, filename='presa.png', total_size=10, received_size=10, status='processing'
+        )
+        open(stuck.temp_path, 'wb').close()
+        EventPhotoUpload.objects.filter(id__in=[stuck.id, self.upload.id]).update(
+            updated_at=timezone.now() - timedelta(seconds=settings.PHOTO_UPLOAD_EXPIRATION + 60)
+        )
+        recent = EventPhotoUpload.objects.create(
+            event=self.event, user=self.user, filename='nova.png', total_size=10, status='processing'
+        )
+
+        self.assertEqual(cleanup_stale_photo_uploads(), 2)
+        self.assertEqual(list(EventPhotoUpload.objects.values_list('id', flat=True)), [recent.id])
+        self.assertFalse(os.path.exists(stuck.temp_path))
+
+
+class WaitlistTests(EventTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer, *cls.users = cls.create_users(5)
+        cls.event = cls.build_event(cls.organizer, EventCategory.objects.create(name='Praias'), max_participants=2)
+        cls.event.save()
+
+    def setUp(self):
+        super().setUp()
+        # Sem broker: a promoção agendada roda na hora e o envio dos emails é registrado
+        patch('events.registration.promote_waitlisted_participants.delay',
+              side_effect=promote_waitlisted_participants).start()
+        self.send_emails = patch('events.tasks.send_batch_event_notification_emails.delay').start()
+        self.addCleanup(patch.stopall)
+
+    def join(self, user):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client_for(user).post(reverse('events-join', args=[self.event.id]))
+
+    def statuses(self):
+        return dict(self.event.participants.values_list('user_id', 'status'))
+
+    def fill_event(self):
+        """Duas vagas confirmadas e dois na fila, inscritos nessa ordem"""
+        return [self.join(user).json() for user in self.users]
+
+    def test_full_event_waitlists_in_order(self):
+        first, second, third, fourth = self.fill_event()
+        self.assertEqual((first['status'], second['status']), ('confirmed', 'confirmed'))
+        self.assertEqual((third['status'], third['waitlist_position']), ('waitlisted', 1))
+        self.assertEqual((fourth['status'], fourth['waitlist_position']), ('waitlisted', 2))
+
+    def test_pending_registrations_hold_spots_when_approval_is_required(self):
+        Event.objects.filter(id=self.event.id).update(requires_approval=True)
+        self.event.refresh_from_db()
+        statuses = [participant['status'] for participant in self.fill_event()]
+        self.assertEqual(statuses, ['pending', 'pending', 'waitlisted', 'waitlisted'])
+
+    def test_leaving_promotes_the_first_in_line(self):
+        self.fill_event()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.users[0]).post(reverse('events-leave', args=[self.event.id]))
+        self.assertEqual(response.status_code, 200)
+        statuses = self.statuses()
+        self.assertEqual(statuses[self.users[2].id], 'confirmed')
+        self.assertEqual(statuses[self.users[3].id], 'waitlisted')
+        self.send_emails.assert_called_once_with(
+            event_id=self.event.id, user_ids=[self.users[2].id], notification_type='waitlist_promotion'
+        )
+
+    def test_removing_a_participant_promotes(self):
+        self.fill_event()
+        participant = self.event.participants.get(user=self.users[1])
+        url = reverse('event-participant-detail', args=[self.event.id, participant.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client_for(self.organizer).delete(url).status_code, 204)
+        self.assertEqual(self.statuses()[self.users[2].id], 'confirmed')
+
+    def test_more_spots_promote_the_waitlist(self):
+        self.fill_event()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(self.organizer).patch(
+                reverse('events-detail', args=[self.event.id]), {'max_participants': 4}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(self.statuses().values()), {'confirmed'})
+        self.send_emails.assert_called_once_with(
+            event_id=self.event.id, user_ids=[self.users[2].id, self.users[3].id],
+            notification_type='waitlist_promotion'
+        )
+
+    def test_promotion_emails_share_one_connection(self):
+        user_ids = [user.id for user in self.users[:3]]
+        with patch('django.core.mail.get_connection', wraps=mail.get_connection) as get_connection:
+            sent = send_batch_event_notification_emails(self.event.id, user_ids, 'waitlist_promotion')
+        self.assertEqual(sent, 3)
+        get_connection.assert_called_once()
+        self.assertEqual(mail.outbox[0].subject, f'Vaga confirmada - {self.event.title}')
+
+
+class RegistrationIdempotencyTests(EventTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other_user, organizer = cls.create_users(3)
+        cls.event = cls.build_event(organizer, EventCategory.objects.create(name='Rios'))
+        cls.event.save()
+
+    def setUp(self):
+        super().setUp()
+        self.redis = FakeRedis()
+        patch('mutiroes_backend.idempotency.get_redis_client', return_value=self.redis).start()
+        self.addCleanup(patch.stopall)
+        self.url = reverse('events-join', args=[self.event.id])
+
+    def join(self, user, key='chave-1', url=None):
+        return self.client_for(user).post(url or self.url, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_repeated_key_replays_the_stored_response(self):
+        first = self.join(self.user)
+        second = self.join(self.user)
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(self.event.participants.count(), 1)
+
+    def test_repeat_while_in_flight_conflicts(self):
+        self.redis.set(f'idempotency:{self.user.pk}:POST:{self.url}:chave-1', json.dumps({'state': 'in_progress'}))
+        self.assertEqual(self.join(self.user).status_code, 409)
+        self.assertFalse(self.event.participants.exists())
+
+    def test_server_error_releases_the_key(self):
+        with patch('events.views.register_participant', side_effect=RegistrationBusy):
+            self.assertEqual(self.join(self.user).status_code, 503)
+        self.assertEqual(self.redis.data, {})
+        self.assertEqual(self.join(self.user).status_code, 201)
+
+    def test_keys_are_scoped_per_user_and_path(self):
+        self.assertEqual(self.join(self.user).status_code, 201)
+        self.assertEqual(self.join(self.other_user).status_code, 201)
+        leave = self.join(self.user, url=reverse('events-leave', args=[self.event.id]))
+        self.assertEqual(leave.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', leave)
+        self.assertEqual(self.event.participants.filter(status='confirmed').count(), 1)
+
+    @patch('events.registration.get_redis_client')
+    def test_busy_queue_raises(self, get_redis_client):
+        get_redis_client.return_value.lock.return_value.acquire.return_value = False
+        with self.assertRaises(RegistrationBusy):
+            register_participant(self.event, self.user)
+        response = self.client_for(self.user).post(self.url)
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '1'))
+        self.assertFalse(self.event.participants.exists())
+
+    @patch('events.registration.get_redis_client')
+    def test_falls_back_to_the_row_lock_without_redis(self, get_redis_client):
+        get_redis_client.return_value.lock.return_value.acquire.side_effect = redis.ConnectionError('fora do ar')
+        participant, created = register_participant(self.event, self.user)
+        self.assertTrue(created)
+        self.assertEqual(participant.status, 'confirmed')
+
+    def test_double_tap_creates_one_participant(self):
+        first, created = register_participant(self.event, self.user)
+        second, created_again = register_participant(self.event, self.user)
+        self.assertEqual((first.pk, created, created_again), (second.pk, True, False))
+        client = self.client_for(self.other_user)
+        self.assertEqual(client.post(self.url).status_code, 201)
+        self.assertEqual(client.post(self.url).status_code, 400)
+        self.assertEqual(self.event.participants.count(), 2)
+
+
+class AsyncViewTests(EventTestCase):
+    """As views assíncronas (modo ASGI) devolvem o mesmo que as views DRF"""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = cls.create_users(6)
+        cls.user = users[0]
+        categories = EventCategory.objects.bulk_create([EventCategory(name=f'Categoria {i}') for i in range(3)])
+        # Mais de duas páginas, passados e futuros
+        events = Event.objects.bulk_create([
+            cls.build_event(users[i % 3], categories[i % 3], days=(i - 20) or 1, title=f'Mutirão {i}')
+            for i in range(45)
+        ])
+        cls.event = events[-1]
+        EventParticipant.objects.bulk_create([
+            EventParticipant(event=event, user=user, status='confirmed')
+            for event in events[::4] for user in users[1:]
+        ])
+        comments = EventComment.objects.bulk_create([
+            EventComment(event=cls.event, user=users[i], content='Comentário') for i in range(3)
+        ])
+        EventComment.objects.bulk_create([
+            EventComment(event=cls.event, user=users[4], content='Resposta', parent=parent) for parent in comments
+        ])
+        EventPhoto.objects.bulk_create([
+            EventPhoto(event=cls.event, user=users[1], photo=f'events/photos/{i}.jpg') for i in range(3)
+        ])
+        EventResource.objects.create(event=cls.event, name='Luvas', resource_type='tool', quantity_needed=10)
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.user)
+
+    async def assertSameResponse(self, view, url, data=None, **kwargs):
+        token = RefreshToken.for_user(self.user).access_token
+        request = AsyncRequestFactory().get(url, data, headers={'Authorization': f'Bearer {token}'})
+        response = await view(request, **kwargs)
+        expected = await sync_to_async(self.client.get)(url, data)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(json.loads(response.content), expected.json())
+        return response
+
+    async def test_event_list(self):
+        url = reverse('events-list')
+        await self.assertSameResponse(async_views.event_list, url)
+        await self.assertSameResponse(async_views.event_list, url, {'page': 3, 'ordering': '-participants_count'})
+        await self.assertSameResponse(async_views.event_list, url, {'search': 'Mutirão 1', 'page': 'last'})
+        await self.assertSameResponse(async_views.event_list, url, {'page': 999})
+        await self.assertSameResponse(async_views.event_list, url, {'category': 0})
+
+    async def test_event_detail(self):
+        for event_id in (self.event.id, 0):
+            url = reverse('events-detail', args=[event_id])
+            await self.assertSameResponse(async_views.event_detail, url, pk=event_id)
+
+    async def test_categories(self):
+        await self.assertSameResponse(async_views.event_categories, reverse('event-categories'))
+
+    async def test_invalid_token_gets_the_same_401(self):
+        for view, url, kwargs in (
+            (async_views.event_list, reverse('events-list'), {}),
+            (async_views.event_detail, reverse('events-detail', args=[self.event.id]), {'pk': self.event.id}),
+            (async_views.event_categories, reverse('event-categories'), {}),
+        ):
+            request = AsyncRequestFactory().get(url, headers={'Authorization': 'Bearer invalido'})
+            response = await view(request, **kwargs)
+            expected = await sync_to_async(APIClient().get)(url, HTTP_AUTHORIZATION='Bearer invalido')
+            self.assertEqual(expected.status_code, 401)
+            self.assertEqual(response.status_code, 401)
+            self.assertEqual(response['WWW-Authenticate'], expected['WWW-Authenticate'])
+            self.assertEqual(json.loads(response.content), expected.json())
+
+    async def test_writes_use_sync_views(self):
+        request = AsyncRequestFactory().post(reverse('events-list'), {}, content_type='application/json')
+        response = await async_views.event_list(request)
+        self.assertEqual(response.status_code, 401)
+
+
+class RealtimeUpdatesTests(EventTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        users = cls.create_users(5)
+        cls.user, cls.other_user = users[0], users[1]
+        category = EventCategory.objects.create(name='Praias')
+        cls.small_event, cls.big_event = Event.objects.bulk_create([
+            cls.build_event(users[0], category), cls.build_event(users[0], category),
+        ])
+        EventParticipant.objects.bulk_create([
+            EventParticipant(event=cls.big_event, user=user, status='confirmed') for user in users[2:]
+        ])
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.user)
+
+    def test_writes_publish_after_commit(self):
+        with patch.object(realtime, 'publish') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client_for(self.other_user).post(reverse('events-join', args=[self.small_event.id]))
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('event-comments', args=[self.small_event.id]), {'content': 'Olá'})
+
+        (event_id, kind, counts), = publish.call_args_list[0].args[0]
+        self.assertEqual((event_id, kind), (self.small_event.id, 'participants'))
+        self.assertEqual(counts['participants_count'], 1)
+        (event_id, kind, comment), = publish.call_args_list[1].args[0]
+        self.assertEqual((event_id, kind, comment['content']), (self.small_event.id, 'comment', 'Olá'))
+
+    @override_settings(EVENT_STREAM_KEEPALIVE_SECONDS=0.05)
+    async def test_stream_relays_updates_for_its_event(self):
+        async def no_redis(hub):
+            await asyncio.Event().wait()
+
+        with patch.object(realtime.UpdateHub, 'listen', no_redis):
+            snapshot = await sync_to_async(realtime.event_snapshot)(self.big_event.id)
+            confirmed = await EventParticipant.objects.filter(event=self.big_event, status='confirmed').acount()
+            stream = realtime.event_stream(self.big_event.id, snapshot)
+            self.assertTrue((await anext(stream)).startswith('retry:'))
+            self.assertIn(f'"participants_count": {confirmed}', await anext(stream))
+
+            hub = realtime.get_hub()
+            hub.dispatch(realtime.CHANNEL.format(self.small_event.id), json.dumps({'type': 'status', 'data': {}}))
+            hub.dispatch(realtime.CHANNEL.format(self.big_event.id), json.dumps(
+                {'type': 'status', 'data': {'status': 'cancelled'}}
+            ))
+            self.assertEqual(await anext(stream), 'event: status\ndata: {"status": "cancelled"}\n\n')
+            self.assertEqual(await anext(stream), ': keepalive\n\n')
+            await stream.aclose()
+            self.assertEqual(hub.subscribers, {})
+
+
+class BenchmarkReportTests(SimpleTestCase):
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 31))
+        # 95% de 30 = 28,5: o nearest-rank sobe para a 29ª posição
+        self.assertEqual(percentile(values, 95), 29)
+        self.assertEqual(percentile(values, 50), 15)
+        self.assertEqual(percentile(values, 99), 30)
+        self.assertEqual(percentile(values, 0), 1)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarize(self):
+        summary = summarize([0.4, 0.1, 0.3, 0.2], errors=1, elapsed=2)
+        self.assertEqual(summary, {
+            'requests': 4, 'errors': 1, 'throughput_rps': 2.0, 'mean_ms': 250.0,
+            'p50_ms': 200.0, 'p95_ms': 400.0, 'p99_ms': 400.0, 'max_ms': 400.0,
+        })
+        empty = summarize([], errors=0, elapsed=0)
+        self.assertEqual((empty['requests'], empty['throughput_rps'], empty['p95_ms']), (0, 0, None))
+
+    def test_compare_results(self):
+        def result(total, **scenarios):
+            return {'total': total, 'scenarios': scenarios}
+
+        baseline = result({'throughput_rps': 100, 'p50_ms': 10, 'p95_ms': 40, 'p99_ms': 0},
+                          list={'throughput_rps': 50, 'p50_ms': 20, 'p95_ms': None, 'p99_ms': 80})
+        current = result({'throughput_rps': 120, 'p50_ms': 5, 'p95_ms': 40, 'p99_ms': 10},
+                         list={'throughput_rps': 40, 'p50_ms': 30, 'p95_ms': 60, 'p99_ms': 80},
+                         join={'throughput_rps': 10, 'p50_ms': 1, 'p95_ms': 2, 'p99_ms': 3})
+
+        self.assertEqual(compare_results(baseline, current), [
+            ('total', 'throughput_rps', 100, 120, 20.0),
+            ('total', 'p50_ms', 10, 5, -50.0),
+            ('total', 'p95_ms', 40, 40, 0.0),
+            ('total', 'p99_ms', 0, 10, None),
+            ('list', 'throughput_rps', 50, 40, -20.0),
+            ('list', 'p50_ms', 20, 30, 50.0),
+            ('list', 'p95_ms', None, 60, None),
+            ('list', 'p99_ms', 80, 80, 0.0),
+        ])
+
+
+class SeedDataTests(EventTestCase):
+    options = {
+        'users': 20, 'events': 10, 'participants_per_event': 4, 'comments_per_event': 2,
+        'past_ratio': 0.5, 'report_ratio': 1, 'batch_size': 7, 'seed': 7,
+    }
+
+    def seed(self, **options):
+        out = StringIO()
+        call_command('seed_data', stdout=out, **{**self.options, **options})
+        # Linhas "Etapa: N em Xs (...)" de cada etapa
+        return {
+            line.split(':')[0]: int(line.split(':')[1].split()[0])
+            for line in out.getvalue().splitlines() if ' em ' in line
+        }
+
+    def snapshot(self):
+        users = User.objects.filter(username__startswith=SEED_USERNAME_PREFIX)
+        events = Event.objects.filter(title__startswith=SEED_EVENT_PREFIX)
+        return {
+            'users': list(users.order_by('username').values_list(
+                'username', 'first_name', 'last_name', 'profile__city', 'profile__total_hours_volunteered')),
+            'events': list(events.order_by('title').values_list(
+                'title', 'organizer__username', 'city', 'status', 'max_participants')),
+            'participants': sorted(EventParticipant.objects.filter(event__in=events).values_list(
+                'event__title', 'user__username', 'status', 'checked_in')),
+            'comments': sorted(EventComment.objects.filter(event__in=events).values_list(
+                'event__title', 'user__username', 'content', 'parent__user__username')),
+            'reports': sorted(EventReport.objects.filter(event__in=events).values_list(
+                'event__title', 'total_participants', 'trash_collected_kg', 'trees_planted')),
+        }
+
+    def test_seeds_every_stage(self):
+        stages = self.seed()
+
+        users = User.objects.filter(username__startswith=SEED_USERNAME_PREFIX)
+        events = Event.objects.filter(title__startswith=SEED_EVENT_PREFIX)
+        comments = EventComment.objects.filter(event__in=events)
+        self.assertEqual(stages, {
+            'Usuários': 20,
+            'Perfis': 20,
+            'Interesses': UserProfile.interests.through.objects.filter(userprofile__user__in=users).count(),
+            'Eventos': 10,
+            'Participantes': EventParticipant.objects.filter(event__in=events).count(),
+            'Comentários': comments.filter(parent=None).count(),
+            'Respostas': comments.exclude(parent=None).count(),
+            'Relatórios': events.filter(status='completed').count(),
+        })
+        self.assertEqual(users.count(), 20)
+        self.assertEqual(UserProfile.objects.filter(user__in=users).count(), 20)
+        self.assertTrue(all(stages.values()))
+
+        # Um único hash (e um único make_password) para todos os usuários
+        self.assertEqual(users.values('password').distinct().count(), 1)
+        self.assertTrue(users.first().check_password(SEED_PASSWORD))
+
+        # bulk_create não dispara o signal: o impacto é calculado no fim da carga
+        reports = EventReport.objects.filter(event__in=events)
+        self.assertFalse(reports.filter(impact_computed_at=None).exists())
+
+    def test_same_seed_same_data(self):
+        self.seed()
+        first = self.snapshot()
+        self.seed(clear=True)
+        self.assertEqual(self.snapshot(), first)
+
+        self.seed(clear=True, seed=8)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_refuses_to_seed_twice_without_clear(self):
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.assertEqual(User.objects.filter(username__startswith=SEED_USERNAME_PREFIX).count(), 20)
+
+    def test_clear_removes_seeded_data(self):
+        organizer, = self.create_users(1)
+        kept = self.build_event(organizer, EventCategory.objects.create(name='Parques'))
+        kept.save()
+        profiles = UserProfile.objects.count()
+        self.seed()
+
+        clear_seed_data(log=lambda message: None)
+
+        self.assertEqual(list(User.objects.values_list('id', flat=True)), [organizer.id])
+        self.assertEqual(list(Event.objects.values_list('id', flat=True)), [kept.id])
+        self.assertEqual(UserProfile.objects.count(), profiles)
+        for model in (EventParticipant, EventComment, EventReport):
+            self.assertFalse(model.objects.exists(), model.__name__)
+
+
+class EventArchiveTests(EventTestCase):
+    COMMENTS = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        users = cls.create_users(6)
+        cls.user = users[0]
+        cls.past_event = cls.build_event(users[1], EventCategory.objects.create(name='Praias'), days=-10)
+        cls.past_event.save()
+        EventParticipant.objects.bulk_create([
+            EventParticipant(event=cls.past_event, user=user, status='confirmed') for user in users[:5]
+        ])
+        comments = EventComment.objects.bulk_create([
+            EventComment(event=cls.past_event, user=users[i], content='Comentário') for i in range(cls.COMMENTS)
+        ])
+        EventComment.objects.bulk_create([
+            EventComment(event=cls.past_event, user=users[5], content='Resposta', parent=parent)
+            for parent in comments for _ in range(3)
+        ])
+        EventPhoto.objects.bulk_create([
+            EventPhoto(event=cls.past_event, user=users[2], photo=f'events/photos/{i}.jpg') for i in range(3)
+        ])
+        EventResource.objects.bulk_create([
+            EventResource(event=cls.past_event, name=f'Recurso {i}', resource_type='tool', quantity_needed=10)
+            for i in range(2)
+        ])
+        EventReport.objects.create(
+            event=cls.past_event, created_by=users[1], total_participants=10,
+            total_hours=Decimal('40.00'), trash_collected_kg=Decimal('120.50'), summary='Resumo'
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.user)
+
+    def archive_past_event(self):
+        long_ago = timezone.now() - timedelta(days=400)
+        Event.objects.filter(id=self.past_event.id).update(
+            status='completed', start_date=long_ago, end_date=long_ago + timedelta(hours=4)
+        )
+        self.assertEqual(archive_old_events(batch_size=10), 1)
+        return ArchivedEvent.objects.get(id=self.past_event.id)
+
+    def test_archive_moves_event_and_children(self):
+        participants = EventParticipant.objects.filter(event=self.past_event).count()
+        comments = EventComment.objects.filter(event=self.past_event).count()
+
+        archived = self.archive_past_event()
+
+        self.assertFalse(Event.objects.filter(id=self.past_event.id).exists())
+        self.assertFalse(EventComment.objects.filter(event_id=self.past_event.id).exists())
+        self.assertFalse(EventReport.objects.filter(event_id=self.past_event.id).exists())
+        self.assertEqual(ArchivedEventParticipant.objects.filter(event=archived).count(), participants)
+        self.assertEqual(archived.participants_count, participants)
+        self.assertEqual(len(archived.comments), comments)
+        self.assertEqual(len(archived.photos), 3)
+        self.assertEqual(len(archived.resources), 2)
+        self.assertEqual(archived.report['total_participants'], 10)
+        # Nada mais a arquivar: a próxima execução não faz nada
+        self.assertEqual(archive_old_events(), 0)
+
+    def test_archive_read_path(self):
+        archived = self.archive_past_event()
+
+        response = self.assertMaxQueries(4, 'get', reverse('archived-events'), {'participated': 'true'})
+        self.assertEqual([event['id'] for event in response.data['results']], [archived.id])
+        response = self.assertMaxQueries(3, 'get', reverse('archived-event-detail', args=[archived.id]))
+        self.assertEqual(len(response.data['comments']), self.COMMENTS)
+        self.assertEqual(len(response.data['comments'][0]['replies']), 3)
+        response = self.assertMaxQueries(4, 'get', reverse('event-report', args=[archived.id]))
+        self.assertEqual(response.data['event_title'], archived.title)
+
+
+    def test_archive_keeps_ids_beyond_32_bits(self):
+        # Event.id é BigAutoField: o arquivo precisa aceitar a mesma faixa
+        big_event = self.build_event(self.past_event.organizer, self.past_event.category, days=-400,
+                                     id=2 ** 31 + 7, status='completed')
+        big_event.save()
+        EventParticipant.objects.create(event=big_event, user=self.user, status='confirmed')
+
+        self.assertEqual(archive_old_events(batch_size=10), 1)
+        self.assertEqual(ArchivedEventParticipant.objects.get(event_id=2 ** 31 + 7).user, self.user)
+
+class IterateInBatchesTests(EventTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        users = cls.create_users(10)
+        cls.event = cls.build_event(users[0], EventCategory.objects.create(name='Rios'))
+        cls.event.save()
+        EventParticipant.objects.bulk_create([
+            EventParticipant(event=cls.event, user=user, status='confirmed') for user in users
+        ])
+
+    def test_matches_full_scan_with_bounded_queries(self):
+        queryset = EventParticipant.objects.filter(event=self.event)
+        expected = list(queryset.order_by('pk').values_list('pk', flat=True))
+        with self.assertNumQueries(-(-len(expected) // 3) + (len(expected) % 3 == 0)):
+            rows = list(iterate_in_batches(queryset.values('pk', 'user_id'), batch_size=3))
+        self.assertEqual([row['pk'] for row in rows], expected)
+
+
+class ExpiredEventCleanupTests(EventTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        users = cls.create_users(4)
+        cls.user = users[0]
+        UserProfile.objects.bulk_create([UserProfile(user=user, city='São Paulo', state='SP') for user in users])
+        category = EventCategory.objects.create(name='Parques')
+        events = Event.objects.bulk_create(
+            [cls.build_event(users[3], category, days=-i) for i in range(1, 6)] + [cls.build_event(users[3], category)]
+        )
+        cls.past_event, cls.big_event = events[0], events[-1]
+        EventParticipant.objects.bulk_create([
+            EventParticipant(event=event, user=user, status='confirmed') for event in events for user in users[:2]
+        ])
+        EventReport.objects.create(
+            event=cls.past_event, created_by=users[3], total_participants=2,
+            total_hours=Decimal('8.00'), summary='Resumo'
+        )
+
+    @override_settings(EVENT_CLEANUP_BATCH_SIZE=2)
+    def test_completes_expired_events_in_batches(self):
+        expired = Event.objects.filter(status='published', end_date__lt=timezone.now()).count()
+        EventParticipant.objects.filter(event=self.past_event, user=self.user).update(checked_in=True)
+        duration = self.past_event.end_date - self.past_event.start_date
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(cleanup_expired_events(), expired)
+
+        # Por lote: lembretes de relatório e publicação do novo status
+        self.assertEqual(len(callbacks), 2 * -(-expired // 2))
+        self.assertFalse(Event.objects.filter(status='published', end_date__lt=timezone.now()).exists())
+        self.assertTrue(Event.objects.filter(id=self.big_event.id, status='published').exists())
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.total_events_participated, 1)
+        self.assertEqual(profile.total_hours_volunteered, duration.total_seconds() // 3600)
+        # Uma segunda execução não credita de novo
+        self.assertEqual(cleanup_expired_events(), 0)
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_events_participated, 1)
+
+    def test_organizer_completion_credits_once(self):
+        EventParticipant.objects.filter(event=self.past_event, user=self.user).update(checked_in=True)
+        organizer = self.client_for(self.past_event.organizer)
+        url = reverse('events-detail', args=[self.past_event.id])
+
+        self.assertEqual(organizer.patch(url, {'status': 'completed'}).status_code, 200)
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_events_participated, 1)
+
+        # Reabrir e concluir de novo, ou a limpeza periódica, não creditam outra vez
+        organizer.patch(url, {'status': 'published'})
+        organizer.patch(url, {'status': 'completed'})
+        organizer.patch(url, {'status': 'published'})
+        cleanup_expired_events()
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_events_participated, 1)
+
+    def test_report_reminders_skip_events_with_report(self):
+        without_report = Event.objects.exclude(id=self.past_event.id).filter(end_date__lt=timezone.now()).first()
+        sent = send_report_reminders.apply(args=[[self.past_event.id, without_report.id]]).get()
+        self.assertEqual(sent, 1)
+        self.assertEqual(mail.outbox[0].to, [without_report.organizer.email])
+
+
+class ReportImpactTests(EventTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        users = cls.create_users(2)
+        category = EventCategory.objects.create(name='Florestas')
+        cls.past_event, cls.other_past_event = Event.objects.bulk_create([
+            cls.build_event(users[0], category, days=-3), cls.build_event(users[0], category, days=-2),
+        ])
+        EventReport.objects.create(
+            event=cls.past_event, created_by=users[0], total_participants=10,
+            total_hours=Decimal('40.00'), trash_collected_kg=Decimal('120.50'), summary='Resumo'
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.past_event.organizer)
+        # Redis em memória para a coalescência da task
+        patch('mutiroes_backend.coalescing.get_redis_client', return_value=FakeRedis()).start()
+        self.addCleanup(patch.stopall)
+
+    def test_statistics_are_stored_with_missing_fields(self):
+        # O relatório do evento passado não informa árvores nem material reciclável
+        process_event_report_statistics(self.past_event.id)
+        data = self.client.get(reverse('event-report', args=[self.past_event.id])).json()
+        self.assertEqual((data['carbon_offset_kg'], data['waste_diverted_kg']), ('0.00', '120.50'))
+        self.assertIsNotNone(data['impact_computed_at'])
+
+    @patch('events.tasks.process_event_report_statistics.delay')
+    def test_report_changes_schedule_recalculation(self, delay):
+        url = reverse('event-report', args=[self.past_event.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(url, {'trees_planted': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        delay.assert_called_once_with(self.past_event.id)
+
+    def test_recalculates_all_reports_in_batches(self):
+        other = self.other_past_event
+        EventReport.objects.create(event=other, created_by=other.organizer, total_participants=5,
+                                   total_hours=Decimal('10.00'), trees_planted=2, summary='Resumo')
+        # Por lote: ids e UPDATE; mais a consulta que encontra o fim
+        with self.assertNumQueries(5):
+            self.assertEqual(update_all_report_impact(batch_size=1), 2)
+        self.assertEqual(EventReport.objects.get(event=other).carbon_offset_kg, Decimal('44.00'))
+
+    def test_monthly_report_is_aggregated_in_the_database(self):
+        update_all_report_impact()
+        with self.assertNumQueries(1):
+            totals = generate_monthly_impact_report()
+        self.assertEqual(totals['reports'], 1)
+        self.assertEqual((totals['total_trash'], totals['total_trees']), (Decimal('120.50'), 0))
+        self.assertEqual(totals['total_waste_diverted'], Decimal('120.50'))
+
+
+@override_settings(INSTRUMENTATION_HEADERS=True, INSTRUMENTATION_LOG_REQUESTS=False)
+class InstrumentationTests(EventTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, organizer = cls.create_users(2)
+        category = EventCategory.objects.create(name='Trilhas')
+        Event.objects.bulk_create([cls.build_event(organizer, category, days=days) for days in (5, 10, 15)])
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client = self.client_for(self.user)
+
+    def test_debug_headers(self):
+        response = self.client.get(reverse('events-list'))
+        self.assertGreater(int(response['X-DB-Query-Count']), 0)
+        self.assertGreaterEqual(float(response['X-DB-Time-Ms']), 0)
+        self.assertEqual(response['X-DB-Duplicate-Queries'], '0')
+        self.assertGreater(float(response['X-Serializer-Time-Ms']), 0)
+        self.assertGreater(float(response['X-Request-Time-Ms']), float(response['X-Serializer-Time-Ms']))
+        self.assertIn('X-Cache-Misses', response)
+        self.assertNotIn('X-Query-Budget-Exceeded', response)
+
+    @override_settings(INSTRUMENTATION_HEADERS=False)
+    def test_no_headers_outside_debug(self):
+        self.assertNotIn('X-DB-Query-Count', self.client.get(reverse('events-list')))
+
+    def test_query_budget_exceeded_is_logged(self):
+        with override_settings(QUERY_BUDGETS={'events-list': 1}), \
+                self.assertLogs('mutiroes_backend.instrumentation', 'WARNING') as logs:
+            response = self.client.get(reverse('events-list'))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['event'], record['view'], record['query_budget']),
+                         ('query_budget_exceeded', 'events-list', 1))
+        self.assertEqual(record['queries'], int(response['X-DB-Query-Count']))
+        self.assertEqual(response['X-Query-Budget-Exceeded'], f"{record['queries']}/1")
+
+    def test_within_budget_is_not_logged(self):
+        with self.assertNoLogs('mutiroes_backend.instrumentation', 'WARNING'):
+            self.client.get(reverse('events-list'))
+
+    def test_fingerprint_normalizes_literals(self):
+        self.assertEqual(
+            fingerprint("SELECT  *  FROM t WHERE id = 12 AND name = 'D''Ávila' AND score > 1.5"),
+            'SELECT * FROM t WHERE id = ? AND name = ? AND score > ?'
+        )
+        self.assertEqual(fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'), 'SELECT * FROM t WHERE id IN (...)')
+        self.assertEqual(fingerprint('SELECT * FROM t WHERE id IN (1, 2)'), 'SELECT * FROM t WHERE id IN (...)')
+
+    def test_repeated_query_shapes_count_as_duplicates(self):
+        stats = RequestStats()
+        with record_queries(stats):
+            for event in Event.objects.all():
+                # N+1: a mesma consulta com outro id a cada evento
+                EventCategory.objects.get(id=event.category_id)
+
+        self.assertEqual(stats.query_count, 4)
+        (sql, count), = stats.duplicate_queries().items()
+        self.assertEqual(count, 3)
+        self.assertIn('events_eventcategory', sql)
+        self.assertEqual(stats.as_dict()['duplicate_queries'], 2)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReadReplicaRouterTests(SimpleTestCase):
+    router = PrimaryReplicaRouter()
+
+    def test_reads_stay_on_primary_without_read_intent(self):
+        self.assertIsNone(self.router.db_for_read(Event))
+        self.assertEqual(self.router.db_for_write(Event), 'default')
+
+    @patch('mutiroes_backend.db_router.is_pinned', return_value=False)
+    def test_read_intent_uses_one_replica(self, is_pinned):
+        with read_intent(User(pk=1)) as alias:
+            self.assertIn(alias, settings.DATABASE_REPLICAS)
+            self.assertEqual(self.router.db_for_read(Event), alias)
+            self.assertEqual(self.router.db_for_read(EventParticipant), alias)
+            self.assertEqual(self.router.db_for_write(Event), 'default')
+        self.assertIsNone(self.router.db_for_read(Event))
+
+    @patch('mutiroes_backend.db_router.is_pinned', return_value=True)
+    def test_pinned_user_reads_from_primary(self, is_pinned):
+        with read_intent(User(pk=1)):
+            self.assertIsNone(self.router.db_for_read(Event))
+        # Anônimos nunca são fixados
+        with read_intent(AnonymousUser()) as alias:
+            self.assertIsNotNone(alias)
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'events'))
+        self.assertIsNone(self.router.allow_migrate('default', 'events'))
+
+    @patch('mutiroes_backend.db_router.pin_to_primary')
+    def test_successful_writes_pin_the_user(self, pin_to_primary):
+        factory = RequestFactory()
+        for method, status_code, pinned in [('post', 201, True), ('post', 400, False), ('get', 200, False)]:
+            pin_to_primary.reset_mock()
+            request = getattr(factory, method)('/api/events/1/join/')
+            request.user = User(pk=7)
+            ReplicaPinMiddleware(lambda request: HttpResponse(status=status_code))(request)
+            self.assertEqual(pin_to_primary.called, pinned, (method, status_code))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReadReplicaTransactionTests(TestCase):
+
+    @patch('mutiroes_backend.db_router.is_pinned', return_value=False)
+    def test_reads_inside_a_transaction_use_the_primary(self, is_pinned):
+        # TestCase envolve cada teste em uma transação no primário
+        with read_intent():
+            self.assertIsNone(PrimaryReplicaRouter().db_for_read(Event))
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'defina DATABASE_REPLICA_URLS para testar com réplicas reais')
+@patch('mutiroes_backend.db_router.is_pinned', return_value=False)
+class ReadReplicaRoutingTests(TransactionTestCase):
+    """
+    Roteamento de ponta a ponta com aliases reais (ex.:
+    DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3); no teste as réplicas
+    espelham o banco 'default'.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        now = timezone.now()
+        self.user = User.objects.create_user('leitor', 'leitor@example.com', 'senha-de-teste-123')
+        UserProfile.objects.create(user=self.user)
+        self.event = Event.objects.create(
+            title='Mutirão', description='Limpeza', category=EventCategory.objects.create(name='Praias'),
+            organizer=self.user, address='Rua A, 1', latitude=Decimal('-23.5'), longitude=Decimal('-46.6'),
+            city='São Paulo', state='SP', start_date=now + timedelta(days=5), end_date=now + timedelta(days=5, hours=4),
+            registration_deadline=now + timedelta(days=4), max_participants=10, status='published',
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def replica_queries(self, method, url):
+        with ExitStack() as stack:
+            captured = [stack.enter_context(CaptureQueriesContext(connections[alias]))
+                        for alias in settings.DATABASE_REPLICAS]
+            response = getattr(self.client, method)(url)
+        return response, sum(len(queries) for queries in captured)
+
+    def test_read_endpoints_use_replicas(self, is_pinned):
+        for url in [reverse('events-list'), reverse('events-detail', args=[self.event.id]), reverse('user-stats')]:
+            response, queries = self.replica_queries('get', url)
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(queries, 0, url)
+
+    @patch('mutiroes_backend.db_router.pin_to_primary')
+    def test_writes_stay_on_primary_and_pin(self, pin_to_primary, is_pinned):
+        response, queries = self.replica_queries('post', reverse('events-join', args=[self.event.id]))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(queries, 0)
+        pin_to_primary.assert_called_once_with(self.user.pk)
+
+
+
+class MetricsEndpointTests(SimpleTestCase):
+
+    def samples(self, response):
+        return {
+            (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+            for family in text_string_to_metric_families(response.content.decode())
+            for sample in family.samples
+        }
+
+    def test_serves_prometheus_exposition_format(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], CONTENT_TYPE_LATEST)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', response.content.decode())
+        self.assertIn(('circuit_breaker_state', (('breaker', 'redis_breaker'),)), self.samples(response))
+
+    def test_aggregates_every_process_in_multiprocess_mode(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory}
+        script = (
+            'import django; django.setup(); '
+            'from mutiroes_backend.metrics import observe_cache; '
+            'observe_cache(hit=True)'
+        )
+        # Dois workers (processos distintos) gravando no mesmo diretório
+        for _ in range(2):
+            subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env, check=True)
+
+        with patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory}):
+            response = self.client.get(reverse('metrics'))
+
+        key = ('cache_requests_total', (('result', 'hit'),))
+        self.assertEqual(self.samples(response)[key], 2)
+
+
+@override_settings(HEALTH_CHECK_TIMEOUT=0.2, HEALTH_CHECK_CACHE_SECONDS=60)
+class HealthCheckTests(SimpleTestCase):
+
+    def setUp(self):
+        health._cached_result = None
+        self.addCleanup(setattr, health, '_cached_result', None)
+        for name in ('check_database', 'check_cache', 'check_redis', 'check_celery'):
+            check = patch(f'mutiroes_backend.health.{name}', return_value={'status': 'ok', 'message': 'ok'}).start()
+            setattr(self, name, check)
+        self.addCleanup(patch.stopall)
+
+    async def get(self):
+        response = await health.health_check(AsyncRequestFactory().get('/health/'))
+        return response, json.loads(response.content)
+
+    async def test_result_is_cached_per_worker(self):
+        first = await self.get()
+        second = await self.get()
+        self.assertEqual(first[0].status_code, 200)
+        self.assertEqual(first[1], second[1])
+        self.assertEqual(self.check_redis.call_count, 1)
+
+    async def test_slow_check_times_out(self):
+        self.check_redis.side_effect = lambda: time.sleep(1)
+        started = time.monotonic()
+        response, body = await self.get()
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(body['status'], 'unhealthy')
+        self.assertEqual(body['checks']['redis']['status'], 'error')
+
+    async def test_celery_failure_only_degrades(self):
+        self.check_celery.return_value = {'status': 'error', 'message': 'Nenhum worker'}
+        response, body = await self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body['status'], 'degraded')
+
+
+class FakeRedis:
+    """Redis em memória com os comandos usados pelo SharedBreakerStorage"""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value).encode()
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def lock(self, name, timeout=None):
+        return FakeLock(self, name)
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+    def llen(self, key):
+        return len(self.data.get(key, []))
+
+
+class FakeLock:
+    def __init__(self, client, name):
+        self.client, self.name = client, name
+
+    def acquire(self, blocking=True):
+        return bool(self.client.set(self.name, 'lock', nx=True))
+
+    def release(self):
+        self.client.delete(self.name)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, command):
+        return lambda *args: self.commands.append((command, args))
+
+    def execute(self):
+        return [getattr(self.client, command)(*args) for command, args in self.commands]
+
+
+@override_settings(CIRCUIT_BREAKER_SYNC_SECONDS=0)
+class SharedCircuitBreakerTests(SimpleTestCase):
+
+    def breaker(self, name='test_breaker'):
+        return pybreaker.CircuitBreaker(fail_max=2, reset_timeout=60, state_storage=SharedBreakerStorage(name))
+
+    def fail(self, breaker):
+        with self.assertRaises((ValueError, pybreaker.CircuitBreakerError)):
+            breaker.call(int, 'x')
+
+    @patch('mutiroes_backend.resilience.get_redis_client')
+    def test_breaker_opened_by_one_process_is_open_for_all(self, get_redis_client):
+        get_redis_client.return_value = FakeRedis()
+        worker1, worker2 = self.breaker(), self.breaker()
+        self.fail(worker1)
+        self.fail(worker2)
+        self.assertEqual(worker1.current_state, 'open')
+        with self.assertRaisesMessage(pybreaker.CircuitBreakerError, 'still open'):
+            worker2.call(lambda: 'ok')
+        with patch.dict(BREAKERS, {'test_breaker': worker1}, clear=True):
+            status = get_circuit_breaker_status()['test_breaker']
+        self.assertEqual((status['state'], status['fail_count'], status['scope']), ('open', 2, 'cluster'))
+
+    @patch('mutiroes_backend.resilience.get_redis_client')
+    def test_falls_back_to_local_state_without_redis(self, get_redis_client):
+        get_redis_client.return_value.pipeline.side_effect = redis.ConnectionError('Redis fora do ar')
+        get_redis_client.return_value.mget.side_effect = redis.ConnectionError('Redis fora do ar')
+        breaker = self.breaker('local_breaker')
+        self.fail(breaker)
+        self.fail(breaker)
+        self.assertEqual(breaker.current_state, 'open')
+        self.assertEqual(breaker._state_storage.local.counter, 2)
+        # Em backoff, o Redis não é consultado de novo a cada chamada
+        calls = get_redis_client.return_value.mget.call_count
+        breaker.current_state
+        self.assertEqual(get_redis_client.return_value.mget.call_count, calls)
+
+
+    @patch('mutiroes_backend.resilience.metrics.observe_breaker_call')
+    @patch('mutiroes_backend.resilience.get_redis_client')
+    def test_rejections_are_told_apart_from_trips(self, get_redis_client, observe_breaker_call):
+        get_redis_client.return_value = FakeRedis()
+        breaker = self.breaker()
+        self.fail(breaker)
+        with self.assertRaises(pybreaker.CircuitBreakerError) as trip:
+            call_with_breaker(breaker, int, 'x')
+        self.assertFalse(is_rejection(trip.exception))
+
+        # Recusa dentro de um except: a exceção em tratamento não a confunde com um disparo
+        try:
+            raise KeyError('cache')
+        except KeyError:
+            with self.assertRaises(pybreaker.CircuitBreakerError) as rejected:
+                call_with_breaker(breaker, int, '1')
+        self.assertTrue(is_rejection(rejected.exception))
+        observe_breaker_call.assert_called_once_with(breaker.name, 'rejected')
+
+
+class RetryTests(SimpleTestCase):
+
+    def test_retries_stop_at_the_request_deadline(self):
+        calls = []
+
+        @with_retry(max_attempts=5, wait_min=1, exceptions=(ValueError,))
+        def flaky():
+            calls.append(time.monotonic())
+            raise ValueError('falhou')
+
+        started = time.monotonic()
+        with deadline(0.5), self.assertRaises(ValueError):
+            flaky()
+        # A espera mínima (1s) não cabe no orçamento: nenhuma nova tentativa
+        self.assertEqual(len(calls), 1)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    async def test_async_functions_are_retried(self):
+        calls = []
+
+        @with_retry(max_attempts=3, wait_min=0.01, wait_max=0.02, exceptions=(ValueError,))
+        async def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise ValueError('falhou')
+            return 'ok'
+
+        self.assertEqual(await flaky(), 'ok')
+        self.assertEqual(len(calls), 3)
+
+    def test_cache_path_fails_fast_and_skips_redis_while_open(self):
+        breaker = pybreaker.CircuitBreaker(fail_max=2, reset_timeout=60, name='redis_breaker')
+        with patch('mutiroes_backend.resilience.redis_breaker', breaker), \
+                patch('mutiroes_backend.resilience.cache') as cache:
+            cache.get.side_effect = redis.ConnectionError('Redis fora do ar')
+            started = time.monotonic()
+            for _ in range(4):
+                self.assertEqual(get_from_cache('chave', 'padrão'), 'padrão')
+            self.assertFalse(set_to_cache('chave', 'valor'))
+            self.assertLess(time.monotonic() - started, 0.5)
+            self.assertEqual(cache.get.call_count, 2)
+            cache.set.assert_not_called()
+
+
+class StaleWhileRevalidateTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def expire(self, key):
+        entry = cache.get(f'swr:{key}')
+        cache.set(f'swr:{key}', {**entry, 'fresh_until': 0}, 60)
+
+    def test_fresh_entries_are_served_from_cache(self):
+        self.assertEqual(cached_call('chave', self.compute), 1)
+        self.assertEqual(cached_call('chave', self.compute), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_entry_is_served_while_another_worker_recomputes(self):
+        cached_call('chave', self.compute)
+        self.expire('chave')
+        cache.add('swr:lock:chave', 1)
+        self.assertEqual(cached_call('chave', self.compute), 1)
+        self.assertEqual(self.calls, 1)
+        cache.delete('swr:lock:chave')
+        self.assertEqual(cached_call('chave', self.compute), 2)
+
+    def test_stale_entry_is_served_while_the_database_breaker_is_open(self):
+        breaker = pybreaker.CircuitBreaker(fail_max=1, reset_timeout=60)
+        cached_call('chave', self.compute)
+        self.expire('chave')
+        breaker.open()
+        with patch('mutiroes_backend.resilience.database_breaker', breaker):
+            self.assertEqual(cached_call('chave', self.compute), 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_tags_invalidate_entries(self):
+        cached_call('chave', self.compute, tags=['categorias'])
+        invalidate_tags('outra-tag')
+        self.assertEqual(cached_call('chave', self.compute, tags=['categorias']), 1)
+        invalidate_tags('categorias')
+        self.assertEqual(cached_call('chave', self.compute, tags=['categorias']), 2)
+
+    def test_category_list_is_refreshed_after_changes(self):
+        url = reverse('event-categories')
+        self.assertEqual(self.client.get(url).json()['count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            EventCategory.objects.create(name='Praias')
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).json()['count'], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json()['count'], 1)
+
+
+class ReferenceDataTests(TestCase):
+
+    def test_lookups_use_memory_and_reload_on_miss(self):
+        praias = EventCategory.objects.create(name='Praias')
+        reference_data.categories.load()
+        with self.assertNumQueries(0):
+            self.assertEqual(reference_data.categories.get(praias.pk).name, 'Praias')
+        rios = EventCategory.objects.create(name='Rios')
+        with self.assertNumQueries(1):
+            self.assertEqual(reference_data.categories.get(rios.pk), rios)
+        self.assertEqual(reference_data.categories.pks_where('name', ['Rios', 'Parques']), [rios.pk])
+
+    @patch('mutiroes_backend.reference_data.get_redis_client')
+    def test_committed_changes_are_broadcast(self, get_redis_client):
+        category = EventCategory.objects.create(name='Praias')
+        reference_data.categories.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            category.name = 'Praias e mangues'
+            category.save()
+        get_redis_client.return_value.publish.assert_called_with(reference_data.CHANNEL, 'events.EventCategory')
+        self.assertEqual(reference_data.categories.get(category.pk).name, 'Praias e mangues')
+
+
+class CeleryRoutingTests(SimpleTestCase):
+
+    def route(self, name):
+        options = celery_app.amqp.router.route({}, name)
+        return options['queue'].name, options.get('priority')
+
+    def test_tasks_are_routed_by_kind(self):
+        self.assertEqual(self.route('users.tasks.send_welcome_email'), ('transactional', None))
+        self.assertEqual(self.route('events.tasks.send_event_notification_email'), ('bulk', 6))
+        self.assertEqual(self.route('events.tasks.generate_monthly_impact_report'), ('analytics', 9))
+        self.assertEqual(self.route('events.tasks.archive_completed_events'), ('maintenance', 9))
+        self.assertEqual(self.route('events.tasks.process_event_photos'), ('celery', None))
+
+    def test_queue_options_annotate_tasks(self):
+        reminder = celery_app.tasks['events.tasks.send_event_notification_email']
+        report = celery_app.tasks['events.tasks.generate_monthly_impact_report']
+        welcome = celery_app.tasks['users.tasks.send_welcome_email']
+        self.assertEqual(reminder.rate_limit, settings.CELERY_QUEUE_RATE_LIMITS['bulk'])
+        self.assertFalse(reminder.acks_late)
+        self.assertTrue(report.acks_late)
+        self.assertIsNone(welcome.rate_limit)
+
+    def test_queue_length_sums_priority_lists(self):
+        client = FakeRedis()
+        client.data.update({'bulk': [b'1'], 'bulk:6': [b'2', b'3'], 'analytics:9': [b'4']})
+        lengths = celery_queue_lengths(client)
+        self.assertEqual((lengths['bulk'], lengths['analytics'], lengths['transactional']), (3, 1, 0))
+
+
+@celery_app.task(base=CoalescingTask, name='events.tests.recompute', coalesce_window=2)
+def recompute(event_id):
+    return event_id
+
+
+@patch('celery.app.task.Task.apply_async')
+class CoalescingTaskTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        patch('mutiroes_backend.coalescing.get_redis_client', return_value=self.redis).start()
+        self.addCleanup(patch.stopall)
+
+    def test_duplicates_return_the_pending_run(self, apply_async):
+        first = recompute.delay(7)
+        second = recompute.delay(7)
+        recompute.delay(8)
+        self.assertEqual(apply_async.call_count, 2)
+        self.assertEqual(apply_async.call_args_list[0].kwargs['countdown'], 2)
+        self.assertEqual(second.id, apply_async.call_args_list[0].kwargs['task_id'])
+        self.assertIsNot(first, second)
+
+    def test_calls_after_the_run_starts_enqueue_again(self, apply_async):
+        recompute.delay(7)
+        self.assertEqual(recompute(7), 7)
+        recompute.delay(7)
+        self.assertEqual(apply_async.call_count, 2)
+
+    def test_run_is_deferred_while_the_same_key_runs(self, apply_async):
+        self.redis.set(RUNNING_KEY.format(recompute.name, '7'), 'lock')
+        self.assertIsNone(recompute(7))
+        apply_async.assert_called_once()
+
+    def test_runs_without_redis(self, apply_async):
+        with patch.object(self.redis, 'set', side_effect=redis.ConnectionError('fora do ar')):
+            recompute.delay(7)
+            recompute.delay(7)
+        self.assertEqual(apply_async.call_count, 2)
@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'', views.EventViewSet, basename='events')
@@ -9,15 +10,31 @@ urlpatterns = [
     # Categories must come before router to avoid conflict
     path('categories/', views.EventCategoryListView.as_view(), name='event-categories'),
     
+    # Archived events (read-only history)
+    path('archive/', views.ArchivedEventListView.as_view(), name='archived-events'),
+    path('archive/<int:pk>/', views.ArchivedEventDetailView.as_view(), name='archived-event-detail'),
+    
     # Event-specific endpoints (must come before router)
     path('<int:event_id>/participants/', views.EventParticipantListView.as_view(), name='event-participants'),
     path('<int:event_id>/participants/<int:pk>/', views.EventParticipantDetailView.as_view(), name='event-participant-detail'),
     path('<int:event_id>/photos/', views.EventPhotoListView.as_view(), name='event-photos'),
+    path('<int:event_id>/photos/batch/', views.EventPhotoBatchCreateView.as_view(), name='event-photos-batch'),
+    path('<int:event_id>/photos/uploads/', views.EventPhotoUploadListView.as_view(), name='event-photo-uploads'),
+    path('<int:event_id>/photos/uploads/<uuid:pk>/', views.EventPhotoUploadDetailView.as_view(), name='event-photo-upload-detail'),
     path('<int:event_id>/comments/', views.EventCommentListView.as_view(), name='event-comments'),
     path('<int:event_id>/resources/', views.EventResourceListView.as_view(), name='event-resources'),
     path('<int:event_id>/resources/<int:pk>/', views.EventResourceDetailView.as_view(), name='event-resource-detail'),
     path('<int:event_id>/report/', views.EventReportView.as_view(), name='event-report'),
+    path('<int:pk>/stream/', async_views.event_stream, name='event-stream'),
     
     # Router must come last to not override specific paths
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_VIEWS:
+    # Modo ASGI: leituras mais acessadas em views assíncronas (demais métodos seguem para as views DRF)
+    urlpatterns = [
+        path('categories/', async_views.event_categories, name='event-categories'),
+        path('', async_views.event_list, name='events-list'),
+        path('<int:pk>/', async_views.event_detail, name='events-detail'),
+    ] + urlpatterns
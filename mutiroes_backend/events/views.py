@@ -1,38 +1,92 @@
+import os
+import shutil
+import uuid
+
 from rest_framework import generics, status, filters, viewsets
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.exceptions import Throttled
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q, Count
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q, Count, F, Prefetch, Exists, OuterRef
 from django.utils import timezone
 from datetime import datetime, timedelta
 
 from .models import (
     EventCategory, Event, EventParticipant, EventResource, 
-    EventPhoto, EventComment, EventReport
+    EventPhoto, EventPhotoUpload, EventComment, EventReport, ArchivedEvent, ArchivedEventParticipant
 )
 from .serializers import (
     EventCategorySerializer, EventListSerializer, EventDetailSerializer,
     EventCreateUpdateSerializer, EventParticipantSerializer, EventParticipantCreateSerializer,
     EventParticipantUpdateSerializer, EventPhotoSerializer, EventPhotoCreateSerializer,
     EventCommentSerializer, EventCommentCreateSerializer, EventResourceSerializer,
-    EventResourceCreateUpdateSerializer, EventReportSerializer, EventReportCreateUpdateSerializer
+    EventResourceCreateUpdateSerializer, EventReportSerializer, EventReportCreateUpdateSerializer,
+    EventPhotoUploadSerializer, EventPhotoUploadCreateSerializer, EventPhotoBatchCreateSerializer,
+    ArchivedEventListSerializer, ArchivedEventSerializer, attach_comment_replies, archived_report_data
+)
+from .realtime import EVENT_CACHE_TAG, notify_comment, notify_participants_changed, notify_status_changed
+from .registration import RegistrationBusy, register_participant, schedule_waitlist_promotion
+from .tasks import (
+    assemble_photo_upload, finalize_participation_counters, process_event_cover_image, process_event_photos
 )
+from mutiroes_backend.db_router import ReadReplicaMixin
+from mutiroes_backend.idempotency import idempotent
+from mutiroes_backend.resilience import CachedListMixin, invalidate_tags_on_commit, swr_cache
 
 
-class EventCategoryListView(generics.ListAPIView):
+class EventCategoryListView(CachedListMixin, generics.ListAPIView):
     """Lista todas as categorias de eventos"""
     queryset = EventCategory.objects.all()
     serializer_class = EventCategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    cache_tags = ('event-categories',)
+
+
+class EventOrderingFilter(filters.OrderingFilter):
+    """Ordenação por participants_count usa a contagem anotada na queryset"""
+    
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering:
+            return ordering
+        return [term.replace('participants_count', 'confirmed_participants_count') for term in ordering]
 
 
-class EventViewSet(viewsets.ModelViewSet):
+@swr_cache(key=lambda event: f'event-stats:{event.pk}', tags=lambda event: [EVENT_CACHE_TAG.format(event.pk)],
+           fresh_for=30)
+def event_stats(event):
+    """
+    Estatísticas de um evento, em cache: invalidadas quando participantes,
+    comentários, fotos, recursos ou o status mudam
+    """
+    return {
+        'total_participants': event.participants_count,
+        'confirmed_participants': event.participants.filter(status='confirmed').count(),
+        'pending_participants': event.participants.filter(status='pending').count(),
+        'waitlisted_participants': event.participants.filter(status='waitlisted').count(),
+        'checked_in_participants': event.participants.filter(checked_in=True).count(),
+        'available_spots': event.available_spots,
+        'photos_count': event.photos.count(),
+        'comments_count': event.comments.count(),
+        'resources_count': event.resources.count(),
+        'fully_provided_resources': event.resources.filter(
+            quantity_provided__gte=F('quantity_needed')
+        ).count(),
+    }
+
+
+class EventViewSet(ReadReplicaMixin, viewsets.ModelViewSet):
     """ViewSet para eventos"""
-    queryset = Event.objects.select_related('category', 'organizer').prefetch_related('participants')
+    read_replica_actions = {'list', 'retrieve', 'nearby'}
+    queryset = Event.objects.select_related('organizer')
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, EventOrderingFilter]
     filterset_fields = ['category', 'status', 'city', 'state', 'is_public']
     search_fields = ['title', 'description', 'address', 'city']
     ordering_fields = ['start_date', 'created_at', 'participants_count']
@@ -46,11 +100,45 @@ class EventViewSet(viewsets.ModelViewSet):
         return EventListSerializer
     
     def perform_create(self, serializer):
-        serializer.save(organizer=self.request.user)
+        event = serializer.save(organizer=self.request.user)
+        if event.cover_image:
+            transaction.on_commit(lambda: process_event_cover_image.delay(event.id))
+    
+    def perform_update(self, serializer):
+        previous_status = serializer.instance.status
+        previous_capacity = serializer.instance.max_participants
+        if serializer.validated_data.get('cover_image'):
+            # Nova capa: descartar versões da anterior até o reprocessamento
+            event = serializer.save(cover_image_width=None, cover_image_height=None, cover_image_renditions={})
+            transaction.on_commit(lambda: process_event_cover_image.delay(event.id))
+        else:
+            event = serializer.save()
+        
+        if event.status != previous_status:
+            if event.status == 'completed':
+                # Concluído pelo organizador antes da limpeza periódica
+                with transaction.atomic():
+                    finalize_participation_counters([event.id])
+            notify_status_changed([event.id], event.status)
+        if event.max_participants != previous_capacity:
+            notify_participants_changed(event.id)
+        if event.max_participants > previous_capacity:
+            # Novas vagas: promover a lista de espera
+            schedule_waitlist_promotion(event.id)
     
     def get_queryset(self):
         queryset = super().get_queryset()
         
+        if self.action in ['list', 'retrieve', 'stats']:
+            queryset = queryset.with_participants_count()
+        if self.action == 'retrieve':
+            queryset = queryset.select_related('organizer__profile').prefetch_related(
+                'resources',
+                Prefetch('photos', queryset=EventPhoto.objects.select_related('user')),
+                Prefetch('comments', queryset=EventComment.objects.select_related('user__profile')),
+                Prefetch('participants', queryset=EventParticipant.objects.select_related('user__profile')),
+            )
+        
         # Filtrar por status ativo por padrão
         status_filter = self.request.query_params.get('status')
         if not status_filter:
@@ -77,32 +165,40 @@ class EventViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def retrieve(self, request, *args, **kwargs):
+        event = self.get_object()
+        comments = event.comments.all()
+        attach_comment_replies(comments, comments)
+        return Response(self.get_serializer(event).data)
+    
     @action(detail=True, methods=['post'])
+    @idempotent()
     def join(self, request, pk=None):
         """Inscrever-se em um evento"""
         event = self.get_object()
         
-        # Verificar se o usuário já está inscrito
-        if EventParticipant.objects.filter(event=event, user=request.user).exists():
-            return Response({'error': 'Você já está inscrito neste evento'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Verificar se há vagas disponíveis
-        if event.participants_count >= event.max_participants:
-            return Response({'error': 'Não há vagas disponíveis'}, status=status.HTTP_400_BAD_REQUEST)
-        
         # Verificar se as inscrições ainda estão abertas
         if not event.is_registration_open:
             return Response({'error': 'As inscrições estão encerradas'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Criar participação
-        participant = EventParticipant.objects.create(
-            event=event,
-            user=request.user,
-            status='confirmed' if not event.requires_approval else 'pending'
-        )
+        try:
+            participant, created = register_participant(event, request.user)
+        except RegistrationBusy:
+            return Response(
+                {'error': 'Muitas inscrições simultâneas, tente novamente em instantes'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '1'}
+            )
+        
+        # Verificar se o usuário já está inscrito
+        if not created:
+            return Response({'error': 'Você já está inscrito neste evento'}, status=status.HTTP_400_BAD_REQUEST)
         
         serializer = EventParticipantSerializer(participant)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        data = serializer.data
+        if participant.status == 'waitlisted':
+            data['waitlist_position'] = participant.waitlist_position
+        return Response(data, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['post'])
     def leave(self, request, pk=None):
@@ -114,8 +210,14 @@ class EventViewSet(viewsets.ModelViewSet):
         except EventParticipant.DoesNotExist:
             return Response({'error': 'Você não está inscrito neste evento'}, status=status.HTTP_404_NOT_FOUND)
         
+        freed_spot = participant.status in event.occupying_statuses
         participant.status = 'cancelled'
         participant.save()
+        notify_participants_changed(event.id)
+        
+        # Vaga liberada: promover o próximo da fila de espera
+        if freed_spot:
+            schedule_waitlist_promotion(event.id)
         
         return Response({'message': 'Inscrição cancelada com sucesso'}, status=status.HTTP_200_OK)
     
@@ -138,29 +240,14 @@ class EventViewSet(viewsets.ModelViewSet):
         participant.checked_in = True
         participant.check_in_time = timezone.now()
         participant.save()
+        notify_participants_changed(event.id)
         
         return Response({'message': 'Check-in realizado com sucesso'}, status=status.HTTP_200_OK)
     
     @action(detail=True, methods=['get'])
     def stats(self, request, pk=None):
         """Estatísticas de um evento"""
-        event = self.get_object()
-        
-        stats = {
-            'total_participants': event.participants_count,
-            'confirmed_participants': event.participants.filter(status='confirmed').count(),
-            'pending_participants': event.participants.filter(status='pending').count(),
-            'checked_in_participants': event.participants.filter(checked_in=True).count(),
-            'available_spots': event.available_spots,
-            'photos_count': event.photos.count(),
-            'comments_count': event.comments.count(),
-            'resources_count': event.resources.count(),
-            'fully_provided_resources': event.resources.filter(
-                quantity_provided__gte=models.F('quantity_needed')
-            ).count(),
-        }
-        
-        return Response(stats)
+        return Response(event_stats(self.get_object()))
     
     @action(detail=False, methods=['get'])
     def my_events(self, request):
@@ -168,13 +255,16 @@ class EventViewSet(viewsets.ModelViewSet):
         user = request.user
         
         # Eventos organizados
-        organized_events = Event.objects.filter(organizer=user).select_related('category')
+        organized_events = Event.objects.filter(organizer=user).select_related(
+            'organizer'
+        ).with_participants_count()
         
         # Eventos participando
         participating_events = Event.objects.filter(
-            participants__user=user,
-            participants__status__in=['confirmed', 'pending']
-        ).select_related('category')
+            id__in=EventParticipant.objects.filter(
+                user=user, status__in=['confirmed', 'pending']
+            ).values('event_id')
+        ).select_related('organizer').with_participants_count()
         
         organized_serializer = EventListSerializer(organized_events, many=True)
         participating_serializer = EventListSerializer(participating_events, many=True)
@@ -199,7 +289,7 @@ class EventViewSet(viewsets.ModelViewSet):
         events = Event.objects.filter(
             status='published',
             start_date__gte=timezone.now()
-        ).select_related('category', 'organizer')
+        ).select_related('organizer').with_participants_count()
         
         serializer = EventListSerializer(events, many=True)
         return Response(serializer.data)
@@ -214,20 +304,28 @@ class EventParticipantListView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         event_id = self.kwargs['event_id']
-        return EventParticipant.objects.filter(event_id=event_id).select_related('user')
+        return EventParticipant.objects.filter(event_id=event_id).select_related('user__profile')
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return EventParticipantCreateSerializer
         return EventParticipantSerializer
     
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method == 'POST':
+            context['event'] = generics.get_object_or_404(Event, id=self.kwargs['event_id'])
+            context['user'] = self.request.user
+        return context
+    
     def perform_create(self, serializer):
-        event = Event.objects.get(id=self.kwargs['event_id'])
-        serializer.save(
-            event=event,
-            user=self.request.user,
-            context={'event': event, 'user': self.request.user}
-        )
+        try:
+            participant, created = register_participant(
+                serializer.context['event'], self.request.user, **serializer.validated_data
+            )
+        except RegistrationBusy:
+            raise Throttled(wait=1, detail='Muitas inscrições simultâneas, tente novamente em instantes')
+        serializer.instance = participant
 
 
 class EventParticipantDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -243,6 +341,18 @@ class EventParticipantDetailView(generics.RetrieveUpdateDestroyAPIView):
         event_id = self.kwargs['event_id']
         participant_id = self.kwargs['pk']
         return EventParticipant.objects.get(event_id=event_id, id=participant_id)
+    
+    def perform_update(self, serializer):
+        participant = serializer.save()
+        notify_participants_changed(participant.event_id)
+        if participant.status in ('cancelled', 'rejected'):
+            schedule_waitlist_promotion(participant.event_id)
+    
+    def perform_destroy(self, instance):
+        event_id = instance.event_id
+        instance.delete()
+        notify_participants_changed(event_id)
+        schedule_waitlist_promotion(event_id)
 
 
 class EventPhotoListView(generics.ListCreateAPIView):
@@ -261,7 +371,180 @@ class EventPhotoListView(generics.ListCreateAPIView):
     
     def perform_create(self, serializer):
         event = Event.objects.get(id=self.kwargs['event_id'])
-        serializer.save(event=event, user=self.request.user)
+        photo = serializer.save(event=event, user=self.request.user)
+        transaction.on_commit(lambda: process_event_photos.delay([photo.id]))
+
+
+class EventPhotoBatchCreateView(generics.CreateAPIView):
+    """Envio de várias fotos de um evento em uma única requisição"""
+    serializer_class = EventPhotoBatchCreateSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def create(self, request, *args, **kwargs):
+        event = generics.get_object_or_404(Event, id=self.kwargs['event_id'])
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        # Gravar os arquivos no storage (arquivos temporários grandes são movidos, não copiados)
+        photo_field = EventPhoto._meta.get_field('photo')
+        captions = data['captions']
+        photos = []
+        try:
+            for index, upload in enumerate(data['photos']):
+                name = default_storage.save(photo_field.generate_filename(None, upload.name), upload)
+                photos.append(EventPhoto(
+                    event=event,
+                    user=request.user,
+                    photo=name,
+                    caption=captions[index] if index < len(captions) else '',
+                    is_before=data['is_before'],
+                    is_after=data['is_after'],
+                ))
+            
+            with transaction.atomic():
+                photos = EventPhoto.objects.bulk_create(photos)
+                photo_ids = [photo.id for photo in photos]
+                transaction.on_commit(lambda: process_event_photos.delay(photo_ids))
+        except Exception:
+            # Não deixar órfãos os arquivos já gravados
+            for photo in photos:
+                default_storage.delete(photo.photo.name)
+            raise
+        
+        return Response(EventPhotoSerializer(photos, many=True).data, status=status.HTTP_201_CREATED)
+
+
+class EventPhotoUploadListView(generics.CreateAPIView):
+    """Inicia um upload de foto em partes (retomável)"""
+    serializer_class = EventPhotoUploadCreateSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def create(self, request, *args, **kwargs):
+        event = generics.get_object_or_404(Event, id=self.kwargs['event_id'])
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.save(event=event, user=request.user)
+        
+        # Arquivo vazio que receberá as partes diretamente em disco
+        os.makedirs(settings.PHOTO_UPLOAD_TEMP_DIR, exist_ok=True)
+        open(upload.temp_path, 'wb').close()
+        
+        response = Response(EventPhotoUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+        response['Upload-Offset'] = str(upload.received_size)
+        return response
+
+
+class EventPhotoUploadDetailView(APIView):
+    """
+    Status, envio de partes e cancelamento de um upload de foto.
+    
+    Cada PATCH envia o corpo bruto de uma parte com o cabeçalho Upload-Offset
+    igual ao número de bytes já recebidos (consultado via GET para retomar).
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get_object(self):
+        return generics.get_object_or_404(
+            EventPhotoUpload,
+            id=self.kwargs['pk'],
+            event_id=self.kwargs['event_id'],
+            user=self.request.user,
+        )
+    
+    def _response(self, upload, status_code=status.HTTP_200_OK):
+        response = Response(EventPhotoUploadSerializer(upload).data, status=status_code)
+        response['Upload-Offset'] = str(upload.received_size)
+        return response
+    
+    def get(self, request, event_id, pk):
+        """Consultar progresso do upload"""
+        return self._response(self.get_object())
+    
+    def patch(self, request, event_id, pk):
+        """Enviar a próxima parte do arquivo"""
+        upload = self.get_object()
+        
+        if upload.status != 'uploading':
+            return Response({'error': 'Este upload não aceita mais partes'}, status=status.HTTP_409_CONFLICT)
+        
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({'error': 'Cabeçalho Upload-Offset obrigatório'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if offset != upload.received_size:
+            # Parte fora de ordem (ex.: reenvio após queda): cliente deve retomar do offset atual
+            return self._response(upload, status.HTTP_409_CONFLICT)
+        
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if length <= 0 or length > settings.PHOTO_UPLOAD_CHUNK_SIZE:
+            return Response(
+                {'error': f'Cada parte deve ter entre 1 e {settings.PHOTO_UPLOAD_CHUNK_SIZE} bytes'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if offset + length > upload.total_size:
+            return Response({'error': 'A parte excede o tamanho total declarado'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Receber a parte num arquivo só desta requisição, direto em disco e
+        # sem carregá-la inteira em memória: duas requisições com o mesmo
+        # offset (reenvio após queda) não escrevem uma sobre a outra
+        chunk_path = f'{upload.temp_path}.{uuid.uuid4().hex}'
+        try:
+            written = 0
+            with open(chunk_path, 'wb') as f:
+                while written < length:
+                    chunk = request.stream.read(min(64 * 1024, length - written))
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    written += len(chunk)
+            
+            # Travar o upload durante a escrita: uma parte concorrente com o mesmo
+            # offset espera e, ao encontrar o offset já avançado, recebe 409
+            with transaction.atomic():
+                upload = EventPhotoUpload.objects.select_for_update().get(id=upload.id)
+                if upload.status != 'uploading' or upload.received_size != offset:
+                    return self._response(upload, status.HTTP_409_CONFLICT)
+                
+                # Gravar a parte antes de avançar o offset: se a cópia falhar, o
+                # offset não se move e o cliente reenvia a mesma parte
+                try:
+                    with open(chunk_path, 'rb') as src, open(upload.temp_path, 'r+b') as dst:
+                        dst.seek(offset)
+                        shutil.copyfileobj(src, dst)
+                except OSError:
+                    os.truncate(upload.temp_path, offset)
+                    response = Response(
+                        {'error': 'Falha ao gravar a parte, reenvie a partir do offset atual'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE
+                    )
+                    response['Upload-Offset'] = str(offset)
+                    return response
+                
+                upload.received_size = offset + written
+                if upload.received_size >= upload.total_size:
+                    upload.status = 'processing'
+                    transaction.on_commit(lambda: assemble_photo_upload.delay(str(upload.id)))
+                upload.save(update_fields=['received_size', 'status', 'updated_at'])
+        finally:
+            os.remove(chunk_path)
+        
+        if upload.status == 'processing':
+            return self._response(upload, status.HTTP_202_ACCEPTED)
+        
+        return self._response(upload)
+    
+    def delete(self, request, event_id, pk):
+        """Cancelar o upload e descartar as partes recebidas"""
+        upload = self.get_object()
+        if upload.status == 'processing':
+            return Response({'error': 'O upload já está sendo processado'}, status=status.HTTP_409_CONFLICT)
+        
+        if os.path.exists(upload.temp_path):
+            os.remove(upload.temp_path)
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class EventCommentListView(generics.ListCreateAPIView):
@@ -271,7 +554,17 @@ class EventCommentListView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         event_id = self.kwargs['event_id']
-        return EventComment.objects.filter(event_id=event_id, parent=None).select_related('user')
+        return EventComment.objects.filter(event_id=event_id, parent=None).select_related('user__profile')
+    
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            # Todas as respostas do evento em uma query, montadas em árvore em memória
+            replies = EventComment.objects.filter(
+                event_id=self.kwargs['event_id'], parent__isnull=False
+            ).select_related('user__profile')
+            attach_comment_replies(page, list(replies))
+        return page
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -280,7 +573,8 @@ class EventCommentListView(generics.ListCreateAPIView):
     
     def perform_create(self, serializer):
         event = Event.objects.get(id=self.kwargs['event_id'])
-        serializer.save(event=event, user=self.request.user)
+        comment = serializer.save(event=event, user=self.request.user)
+        notify_comment(comment)
 
 
 class EventResourceListView(generics.ListCreateAPIView):
@@ -300,6 +594,7 @@ class EventResourceListView(generics.ListCreateAPIView):
     def perform_create(self, serializer):
         event = Event.objects.get(id=self.kwargs['event_id'])
         serializer.save(event=event)
+        invalidate_tags_on_commit(EVENT_CACHE_TAG.format(event.id))
 
 
 class EventResourceDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -310,20 +605,37 @@ class EventResourceDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         event_id = self.kwargs['event_id']
         return EventResource.objects.filter(event_id=event_id)
+    
+    def perform_update(self, serializer):
+        serializer.save()
+        invalidate_tags_on_commit(EVENT_CACHE_TAG.format(self.kwargs['event_id']))
+    
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_tags_on_commit(EVENT_CACHE_TAG.format(self.kwargs['event_id']))
 
 
-class EventReportView(APIView):
+class EventReportView(ReadReplicaMixin, APIView):
     """Criar, visualizar e atualizar relatório pós-evento"""
     permission_classes = [IsAuthenticated]
     
     def get(self, request, event_id):
         """Obter relatório de um evento"""
         try:
-            report = EventReport.objects.get(event_id=event_id)
+            report = EventReport.objects.select_related('event', 'created_by').get(event_id=event_id)
             serializer = EventReportSerializer(report)
             return Response(serializer.data)
         except EventReport.DoesNotExist:
+            pass
+        
+        # Eventos antigos já foram movidos para o arquivo (events/archive.py)
+        archived = ArchivedEvent.objects.filter(id=event_id).exclude(report=None).defer(
+            'photos', 'comments', 'resources'
+        ).first()
+        if archived is None:
             return Response({'error': 'Relatório não encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        created_by = User.objects.filter(id=archived.report['created_by_id']).first()
+        return Response(archived_report_data(archived, created_by.get_full_name() if created_by else None))
     
     def post(self, request, event_id):
         """Criar relatório de um evento"""
@@ -363,3 +675,54 @@ class EventReportView(APIView):
             return Response(EventReportSerializer(serializer.instance).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+def archived_events_visible_to(user):
+    """Eventos arquivados públicos ou em que o usuário participou/organizou"""
+    if not user.is_authenticated:
+        return ArchivedEvent.objects.filter(is_public=True)
+    participated = ArchivedEventParticipant.objects.filter(event=OuterRef('pk'), user=user)
+    return ArchivedEvent.objects.filter(Q(is_public=True) | Q(organizer=user) | Exists(participated))
+
+
+class ArchivedEventListView(ReadReplicaMixin, generics.ListAPIView):
+    """
+    Histórico de eventos arquivados (somente leitura).
+    ?participated=true e ?organized=true restringem aos eventos do usuário.
+    """
+    serializer_class = ArchivedEventListSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['category', 'city', 'state']
+    search_fields = ['title', 'description', 'city']
+    ordering_fields = ['start_date', 'participants_count']
+    ordering = ['-start_date']
+    
+    def get_queryset(self):
+        user = self.request.user
+        queryset = archived_events_visible_to(user).select_related('organizer')
+        if user.is_authenticated:
+            if self.request.query_params.get('participated') == 'true':
+                queryset = queryset.filter(
+                    Exists(ArchivedEventParticipant.objects.filter(event=OuterRef('pk'), user=user))
+                )
+            if self.request.query_params.get('organized') == 'true':
+                queryset = queryset.filter(organizer=user)
+        # Fotos, comentários e recursos congelados só interessam ao detalhe
+        return queryset.defer('photos', 'comments', 'resources')
+
+
+class ArchivedEventDetailView(ReadReplicaMixin, generics.RetrieveAPIView):
+    """Evento arquivado completo (somente leitura)"""
+    serializer_class = ArchivedEventSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    
+    def get_queryset(self):
+        return archived_events_visible_to(self.request.user).select_related('organizer')
+    
+    def retrieve(self, request, *args, **kwargs):
+        archived = self.get_object()
+        # Nomes de todos os autores de fotos e comentários em uma única query
+        user_ids = {item['user_id'] for item in [*archived.photos, *archived.comments]}
+        user_names = {user.id: user.get_full_name() for user in User.objects.filter(id__in=user_ids)}
+        serializer = self.get_serializer(archived, context={**self.get_serializer_context(), 'user_names': user_names})
+        return Response(serializer.data)
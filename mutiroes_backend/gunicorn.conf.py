@@ -0,0 +1,29 @@
+"""
+Gunicorn settings and hooks (picked up automatically from the working directory)
+
+SERVER_MODE=asgi swaps the sync workers for uvicorn workers serving the ASGI
+application, so a slow client, SMTP or Redis call no longer holds a whole
+worker (see ASYNC_VIEWS in settings.py).
+"""
+import os
+
+if os.environ.get('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'mutiroes_backend.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'mutiroes_backend.wsgi:application'
+
+
+def on_starting(server):
+    from mutiroes_backend.metrics import clear_multiprocess_dir
+    clear_multiprocess_dir()
+
+
+def post_worker_init(worker):
+    from mutiroes_backend.reference_data import warm_up
+    warm_up()
+
+
+def child_exit(server, worker):
+    from mutiroes_backend.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
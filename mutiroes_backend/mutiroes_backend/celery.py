@@ -1,6 +1,7 @@
 import os
 from celery import Celery
 from django.conf import settings
+from kombu import Queue
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mutiroes_backend.settings')
@@ -11,11 +12,81 @@ app = Celery('mutiroes_backend')
 # the configuration object to child processes.
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
+# Queues. Workers subscribe with -Q (see docker-compose.yml) so a burst of
+# reminders or a long report never sits in front of a welcome or waitlist email.
+TRANSACTIONAL_QUEUE = 'transactional'  # one user is waiting for it (welcome, waitlist promotion)
+BULK_QUEUE = 'bulk'                    # reminders, one email per participant
+ANALYTICS_QUEUE = 'analytics'          # statistics and reports
+MAINTENANCE_QUEUE = 'maintenance'      # periodic cleanup and archival
+DEFAULT_QUEUE = 'celery'               # everything else (image processing)
+
+# Redis priorities: 0 is served first. Messages without a priority count as 0.
+PRIORITY_STEPS = [0, 3, 6, 9]
+LOW_PRIORITY = 6
+LOWEST_PRIORITY = 9
+
+TASK_ROUTES = {
+    'events.tasks.send_batch_event_notification_emails': {'queue': TRANSACTIONAL_QUEUE},
+    'events.tasks.promote_waitlisted_participants': {'queue': TRANSACTIONAL_QUEUE},
+    'users.tasks.send_welcome_email': {'queue': TRANSACTIONAL_QUEUE},
+    # One email per participant, fanned out by send_bulk_event_reminders
+    'events.tasks.send_event_notification_email': {'queue': BULK_QUEUE, 'priority': LOW_PRIORITY},
+    'events.tasks.send_bulk_event_reminders': {'queue': BULK_QUEUE, 'priority': LOW_PRIORITY},
+    'events.tasks.send_report_reminders': {'queue': BULK_QUEUE, 'priority': LOW_PRIORITY},
+    'events.tasks.process_event_report_statistics': {'queue': ANALYTICS_QUEUE, 'priority': LOW_PRIORITY},
+    'events.tasks.recompute_all_report_statistics': {'queue': ANALYTICS_QUEUE, 'priority': LOWEST_PRIORITY},
+    'events.tasks.generate_monthly_impact_report': {'queue': ANALYTICS_QUEUE, 'priority': LOWEST_PRIORITY},
+    'events.tasks.cleanup_expired_events': {'queue': MAINTENANCE_QUEUE, 'priority': LOW_PRIORITY},
+    'events.tasks.cleanup_stale_photo_uploads': {'queue': MAINTENANCE_QUEUE, 'priority': LOWEST_PRIORITY},
+    'events.tasks.archive_completed_events': {'queue': MAINTENANCE_QUEUE, 'priority': LOWEST_PRIORITY},
+}
+
+
+class QueueAnnotations:
+    """
+    Per-queue options for each task routed to the queue (task_annotations),
+    resolved when tasks are bound, once settings are loaded. Celery rate
+    limits are per task type and per worker, so a queue's limit bounds each
+    of its tasks on each worker consuming it.
+    """
+
+    def annotate(self, task):
+        queue = TASK_ROUTES.get(task.name, {}).get('queue')
+        options = {}
+        rate_limit = settings.CELERY_QUEUE_RATE_LIMITS.get(queue)
+        if rate_limit:
+            options['rate_limit'] = rate_limit
+        if queue in (ANALYTICS_QUEUE, MAINTENANCE_QUEUE):
+            # Long, idempotent tasks: acknowledge when done, so with a prefetch
+            # of 1 the worker does not reserve the next one behind them
+            options['acks_late'] = True
+        return options or None
+
+    def annotate_any(self):
+        return None
+
+
+app.conf.update(
+    task_queues=[Queue(name) for name in (
+        TRANSACTIONAL_QUEUE, BULK_QUEUE, ANALYTICS_QUEUE, MAINTENANCE_QUEUE, DEFAULT_QUEUE,
+    )],
+    task_default_queue=DEFAULT_QUEUE,
+    task_routes=TASK_ROUTES,
+    task_annotations=[QueueAnnotations()],
+    broker_transport_options={
+        'priority_steps': PRIORITY_STEPS,
+        'sep': ':',
+        # A worker consuming several queues takes priority 0 from all of them first
+        'queue_order_strategy': 'priority',
+    },
+)
+
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+# Task runtime metrics and the worker /metrics server (Celery signal handlers)
+from . import metrics  # noqa: E402,F401
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
-
-
@@ -0,0 +1,91 @@
+"""
+Coalescing of duplicate Celery task invocations
+
+Expensive recomputations (report statistics for one event, for instance) may
+be requested many times within seconds by signals and user actions. A task
+declared with base=CoalescingTask runs once per burst:
+
+- enqueueing is debounced: the message waits `coalesce_window` seconds, and
+  calls with the same key while it waits return the pending task instead of
+  enqueueing another one (Redis SET NX on the pending key);
+- the pending key is dropped when the task starts, so a change made while it
+  runs enqueues a new run that sees it;
+- a run lock per key keeps two workers from running the same key at once;
+  the second is deferred by one window.
+
+Without Redis every call is enqueued and run, as with a plain task.
+"""
+import logging
+import math
+
+import redis
+from celery import Task
+from celery.utils import uuid
+from django.conf import settings
+
+from .metrics import observe_task_coalescing
+from .redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = 'task:{}:{}:pending'
+RUNNING_KEY = 'task:{}:{}:running'
+
+
+class CoalescingTask(Task):
+    """Task base class that collapses duplicate invocations by key"""
+
+    # Debounce: seconds a message waits, absorbing duplicates, before it runs
+    coalesce_window = 5.0
+    # Seconds a queued message may keep absorbing duplicates (lost messages, backlog)
+    coalesce_max_wait = 300
+
+    def coalesce_key(self, args, kwargs):
+        """Invocations with the same key are duplicates (default: all arguments)"""
+        return ':'.join([str(arg) for arg in args] + [f'{name}={kwargs[name]}' for name in sorted(kwargs)])
+
+    def apply_async(self, args=None, kwargs=None, task_id=None, **options):
+        key = PENDING_KEY.format(self.name, self.coalesce_key(args or (), kwargs or {}))
+        task_id = task_id or uuid()
+        options.setdefault('countdown', self.coalesce_window)
+        try:
+            client = get_redis_client()
+            ttl = math.ceil(options['countdown'] + self.coalesce_max_wait)
+            if not client.set(key, task_id, nx=True, ex=ttl):
+                pending = client.get(key)
+                if pending is not None:
+                    observe_task_coalescing(self.name, 'coalesced')
+                    return self.AsyncResult(pending.decode())
+        except redis.RedisError as e:
+            logger.warning(f"Task coalescing unavailable for {self.name}, enqueueing: {str(e)}")
+            observe_task_coalescing(self.name, 'unavailable')
+        else:
+            observe_task_coalescing(self.name, 'enqueued')
+        return super().apply_async(args, kwargs, task_id=task_id, **options)
+
+    def __call__(self, *args, **kwargs):
+        key = self.coalesce_key(args, kwargs)
+        try:
+            client = get_redis_client()
+            # From here on a new call must enqueue a new run
+            client.delete(PENDING_KEY.format(self.name, key))
+            lock = client.lock(RUNNING_KEY.format(self.name, key),
+                               timeout=self.time_limit or settings.CELERY_TASK_TIME_LIMIT)
+            if not lock.acquire(blocking=False):
+                # Same key running on another worker: run again after it
+                observe_task_coalescing(self.name, 'deferred')
+                self.apply_async(args, kwargs)
+                return None
+        except redis.RedisError as e:
+            logger.warning(f"Task coalescing unavailable for {self.name}, running: {str(e)}")
+            lock = None
+
+        try:
+            return super().__call__(*args, **kwargs)
+        finally:
+            if lock is not None:
+                try:
+                    lock.release()
+                except redis.RedisError:
+                    # The lock expired with the time limit
+                    pass
@@ -0,0 +1,28 @@
+"""
+Helpers that keep database access compatible with transaction-level pooling
+(see DATABASE_TRANSACTION_POOLING in settings)
+"""
+
+
+def iterate_in_batches(queryset, batch_size=2000):
+    """
+    Yield the rows of a queryset in primary-key order, one bounded query per
+    batch (keyset pagination).
+
+    Use instead of QuerySet.iterator(): with server-side cursors disabled
+    iterator() pulls the whole result set into client memory, and a cursor
+    kept open across queries cannot work behind a transaction pooler anyway.
+    values() querysets must include 'pk'.
+    """
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(batch[:batch_size])
+        if not rows:
+            return
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        last = rows[-1]
+        last_pk = last['pk'] if isinstance(last, dict) else last.pk
@@ -0,0 +1,179 @@
+"""
+Read-replica routing
+
+Queries go to the primary ('default') unless the code runs inside an explicit
+read intent: the read_replica decorator (function views) or ReadReplicaMixin
+(class-based views). Inside it, reads use one replica chosen for the whole
+request, except while a transaction is open on the primary.
+
+Read-your-writes: ReplicaPinMiddleware pins a user to the primary for
+REPLICA_PIN_SECONDS after any successful unsafe request they make (join,
+comment, profile update...), so their next reads do not hit a lagging
+replica. Pins live in Redis to be shared by every backend; if Redis is
+unavailable reads fall back to the primary.
+"""
+from functools import wraps
+import contextvars
+import logging
+import random
+
+import redis
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+from .redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+PIN_KEY = 'db:pin:user:{}'
+
+# Replica alias used by the current read intent, or None for the primary
+_replica_alias = contextvars.ContextVar('replica_alias', default=None)
+
+
+def replica_aliases():
+    return settings.DATABASE_REPLICAS
+
+
+def pin_to_primary(user_id):
+    """Send this user's reads to the primary while replicas catch up"""
+    try:
+        get_redis_client().set(PIN_KEY.format(user_id), 1, ex=settings.REPLICA_PIN_SECONDS)
+    except redis.RedisError as e:
+        logger.warning(f"Could not pin user {user_id} to the primary: {str(e)}")
+
+
+def is_pinned(user_id):
+    try:
+        return bool(get_redis_client().exists(PIN_KEY.format(user_id)))
+    except redis.RedisError as e:
+        logger.warning(f"Replica pin store unavailable, reading from the primary: {str(e)}")
+        return True
+
+
+def choose_replica(user=None):
+    """Replica alias for a read intent, or None when reads must stay on the primary"""
+    replicas = replica_aliases()
+    if not replicas:
+        return None
+    if user is not None and user.is_authenticated and is_pinned(user.pk):
+        return None
+    return random.choice(replicas)
+
+
+class read_intent:
+    """
+    Context manager routing the reads in its block to a replica (unless the
+    user is pinned to the primary). Async views use it with `async with`,
+    which checks the pin off the event loop.
+    """
+
+    def __init__(self, user=None):
+        self.user = user
+
+    def __enter__(self):
+        self.token = _replica_alias.set(choose_replica(self.user))
+        return _replica_alias.get()
+
+    def __exit__(self, *exc_info):
+        _replica_alias.reset(self.token)
+
+    async def __aenter__(self):
+        alias = await sync_to_async(choose_replica, thread_sensitive=False)(self.user)
+        self.token = _replica_alias.set(alias)
+        return alias
+
+    async def __aexit__(self, *exc_info):
+        _replica_alias.reset(self.token)
+
+
+def read_replica(view_func):
+    """Decorator for function views (below @api_view): reads go to a replica"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with read_intent(request.user):
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class ReadReplicaMixin:
+    """
+    DRF views: safe requests read from a replica. On viewsets, only the
+    actions listed in read_replica_actions do (None means every safe request).
+    """
+    read_replica_actions = None
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication runs in super().initial(), so the pin check sees the real user
+        super().initial(request, *args, **kwargs)
+        actions = self.read_replica_actions
+        if request.method in SAFE_METHODS and (actions is None or getattr(self, 'action', None) in actions):
+            self._read_intent = read_intent(request.user)
+            self._read_intent.__enter__()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        intent = self.__dict__.pop('_read_intent', None)
+        if intent is not None:
+            intent.__exit__(None, None, None)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class PrimaryReplicaRouter:
+    """Writes always go to the primary; reads only leave it inside a read intent"""
+
+    def db_for_read(self, model, **hints):
+        alias = _replica_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Explicit: otherwise Django would write back to the alias an instance was read from
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaPinMiddleware:
+    """
+    Pin the user to the primary after a successful write request. DRF sets
+    request.user on the underlying request once JWT authentication runs.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.should_pin(request, response):
+            self.pin_user(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.should_pin(request, response):
+            await sync_to_async(self.pin_user)(request)
+        return response
+
+    def should_pin(self, request, response):
+        return bool(replica_aliases()) and request.method not in SAFE_METHODS and response.status_code < 400
+
+    def pin_user(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            pin_to_primary(user.pk)
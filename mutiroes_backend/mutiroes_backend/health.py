@@ -1,36 +1,85 @@
 """
 Health check views for monitoring and service discovery
 """
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.http import JsonResponse
 from django.db import connection
 from django.core.cache import cache
-import redis
+from django.utils import timezone
 import logging
+from .celery import app as celery_app
+from .metrics import celery_queue_lengths
+from .redis_client import get_broker_client, get_redis_client
 from .resilience import get_circuit_breaker_status
 
 logger = logging.getLogger(__name__)
 
 
-def health_check(request):
+# Checks whose failure takes the backend out of rotation; the others only
+# report "degraded" (a stopped Celery worker should not stop the API)
+CRITICAL_CHECKS = ('database', 'cache', 'redis')
+
+# Last composite result of this worker: (expires_at, body, status_code)
+_cached_result = None
+
+
+async def health_check(request):
     """
     Comprehensive health check endpoint
+
+    The checks run concurrently, each bounded by HEALTH_CHECK_TIMEOUT: the
+    database one on the request's thread (Django connections are per thread),
+    the others on the shared executor. The composite result is reused for
+    HEALTH_CHECK_CACHE_SECONDS, so frequent polling costs one dict lookup.
     """
-    health_status = {
-        "status": "healthy",
-        "checks": {
-            "database": check_database(),
-            "cache": check_cache(),
-            "redis": check_redis(),
-        },
-        "circuit_breakers": get_circuit_breaker_status()
+    global _cached_result
+    now = time.monotonic()
+    if _cached_result is not None and _cached_result[0] > now:
+        _, body, status_code = _cached_result
+        return JsonResponse(body, status=status_code)
+
+    checks = {
+        'database': sync_to_async(check_database),
+        'cache': sync_to_async(check_cache, thread_sensitive=False),
+        'redis': sync_to_async(check_redis, thread_sensitive=False),
+        'celery': sync_to_async(check_celery, thread_sensitive=False),
     }
-    
-    # Overall status
-    all_healthy = all(check["status"] == "ok" for check in health_status["checks"].values())
-    health_status["status"] = "healthy" if all_healthy else "unhealthy"
-    
-    status_code = 200 if all_healthy else 503
-    return JsonResponse(health_status, status=status_code)
+    results = await asyncio.gather(*(run_check(name, check) for name, check in checks.items()))
+    results = dict(zip(checks, results))
+
+    if any(results[name]["status"] != "ok" for name in CRITICAL_CHECKS):
+        overall = "unhealthy"
+    elif any(result["status"] != "ok" for result in results.values()):
+        overall = "degraded"
+    else:
+        overall = "healthy"
+
+    body = {
+        "status": overall,
+        "checks": results,
+        "circuit_breakers": get_circuit_breaker_status(),
+        "checked_at": timezone.now().isoformat(),
+    }
+    status_code = 503 if overall == "unhealthy" else 200
+    _cached_result = (time.monotonic() + settings.HEALTH_CHECK_CACHE_SECONDS, body, status_code)
+    return JsonResponse(body, status=status_code)
+
+
+async def run_check(name, check):
+    """Run one check, turning a timeout or an unexpected error into an error result"""
+    timeout = settings.HEALTH_CHECK_TIMEOUT
+    try:
+        return await asyncio.wait_for(check(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"Health check '{name}' timed out after {timeout}s")
+        return {"status": "error", "message": f"Timed out after {timeout}s"}
+    except Exception as e:
+        logger.error(f"Health check '{name}' failed: {str(e)}")
+        return {"status": "error", "message": str(e)}
 
 
 def readiness_check(request):
@@ -87,12 +136,33 @@ def check_cache():
 
 
 def check_redis():
-    """Check Redis connection"""
+    """Check Redis connection (pooled client shared with locks and idempotency keys)"""
     try:
-        from django.conf import settings
-        r = redis.from_url(settings.CELERY_BROKER_URL)
-        r.ping()
+        get_redis_client().ping()
         return {"status": "ok", "message": "Redis connection successful"}
     except Exception as e:
         logger.error(f"Redis check failed: {str(e)}")
         return {"status": "error", "message": str(e)}
+
+
+def check_celery():
+    """
+    Check the Celery broker, its queue depths and that a worker answers.
+    Queues above HEALTH_CHECK_QUEUE_WARNING are reported as a warning.
+    """
+    try:
+        depths = celery_queue_lengths(get_broker_client())
+    except Exception as e:
+        logger.error(f"Celery broker check failed: {str(e)}")
+        return {"status": "error", "message": f"Broker unavailable: {str(e)}"}
+
+    # Only ping workers once the broker is known to answer; the first reply is enough
+    replies = celery_app.control.ping(timeout=settings.HEALTH_CHECK_TIMEOUT / 2, limit=1)
+    result = {"status": "ok", "message": "Broker and workers responding", "queues": depths, "workers": len(replies)}
+    backlog = [queue for queue, depth in depths.items() if depth > settings.HEALTH_CHECK_QUEUE_WARNING]
+    if not replies:
+        result.update(status="error", message="No Celery worker answered the ping")
+    elif backlog:
+        result.update(status="warning", message=f"Queue backlog above {settings.HEALTH_CHECK_QUEUE_WARNING}: "
+                                                f"{', '.join(backlog)}")
+    return result
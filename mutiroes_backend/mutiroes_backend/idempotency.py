@@ -0,0 +1,99 @@
+"""
+Idempotency-Key support for unsafe API actions
+"""
+from functools import wraps
+import json
+import logging
+
+import redis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework import status
+from rest_framework.response import Response
+
+from .redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IN_PROGRESS_TTL = 60  # seconds a request may hold its key before it is released
+
+
+def idempotent(ttl=None):
+    """
+    Decorator for DRF view methods that replays the stored response when the
+    client repeats a request with the same Idempotency-Key header.
+
+    Keys are scoped per user, method and path and kept in Redis. Requests
+    without the header, or issued while Redis is unavailable, run normally.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return func(self, request, *args, **kwargs)
+            
+            if len(key) > 255:
+                return Response(
+                    {'error': f'{IDEMPOTENCY_HEADER} deve ter no máximo 255 caracteres'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            redis_key = f'idempotency:{request.user.pk}:{request.method}:{request.path}:{key}'
+            
+            try:
+                client = get_redis_client()
+                stored = client.get(redis_key)
+                if stored is None and not client.set(
+                    redis_key, json.dumps({'state': 'in_progress'}), nx=True, ex=IN_PROGRESS_TTL
+                ):
+                    stored = client.get(redis_key)
+            except redis.RedisError as e:
+                logger.warning(f"Idempotency store unavailable, processing without it: {str(e)}")
+                return func(self, request, *args, **kwargs)
+            
+            if stored is not None:
+                payload = json.loads(stored)
+                if payload['state'] == 'in_progress':
+                    return Response(
+                        {'error': 'Uma requisição com esta chave ainda está em processamento'},
+                        status=status.HTTP_409_CONFLICT
+                    )
+                response = Response(payload['data'], status=payload['status'])
+                response['Idempotent-Replayed'] = 'true'
+                return response
+            
+            try:
+                response = func(self, request, *args, **kwargs)
+            except Exception:
+                _release(client, redis_key)
+                raise
+            
+            if response.status_code >= 500:
+                # Server errors are not final; let the client retry with the same key
+                _release(client, redis_key)
+                return response
+            
+            try:
+                client.set(
+                    redis_key,
+                    json.dumps(
+                        {'state': 'done', 'status': response.status_code, 'data': response.data},
+                        cls=DjangoJSONEncoder
+                    ),
+                    ex=ttl or settings.IDEMPOTENCY_KEY_TTL
+                )
+            except redis.RedisError as e:
+                logger.warning(f"Could not store idempotent response: {str(e)}")
+            
+            return response
+        return wrapper
+    return decorator
+
+
+def _release(client, redis_key):
+    try:
+        client.delete(redis_key)
+    except redis.RedisError as e:
+        logger.warning(f"Could not release idempotency key {redis_key}: {str(e)}")
@@ -0,0 +1,129 @@
+"""
+Image processing: EXIF stripping, resized renditions and WebP variants
+"""
+from io import BytesIO
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+RENDITION_FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp'),
+}
+
+
+def process_image(name, kind):
+    """
+    Normalize a stored image and generate its renditions.
+
+    A copy of the original without EXIF (after applying the EXIF
+    orientation) is saved under a new name, and every size configured in
+    IMAGE_RENDITIONS[kind] is saved as JPEG and WebP next to it. The original
+    file is left in place: the caller points the model field at the new name
+    and then calls finish_processing. Returns a dict with the new original
+    name, its dimensions and the rendition paths.
+    """
+    with default_storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        original_format = image.format or 'JPEG'
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    name = _save_without_exif(name, image, original_format)
+
+    base, _ = os.path.splitext(name)
+    directory, filename = os.path.split(base)
+    renditions = {}
+
+    for size_name, max_size in settings.IMAGE_RENDITIONS[kind].items():
+        resized = image.copy()
+        resized.thumbnail((max_size, max_size), Image.LANCZOS)
+
+        entry = {'width': resized.width, 'height': resized.height}
+        for fmt, (pil_format, extension) in RENDITION_FORMATS.items():
+            path = os.path.join(directory, 'renditions', f'{filename}_{size_name}{extension}')
+            entry[fmt] = _save_image(path, resized, pil_format)
+        renditions[size_name] = entry
+
+    return {
+        'name': name,
+        'width': image.width,
+        'height': image.height,
+        'renditions': renditions,
+    }
+
+
+def finish_processing(original_name, result, stored):
+    """
+    Delete the files that are no longer referenced once process_image's
+    result was (or was not) stored on the model: the original with EXIF when
+    it was, the new copy and renditions when the image was replaced meanwhile.
+    """
+    if stored:
+        names = [original_name] if result['name'] != original_name else []
+    else:
+        names = [result['name']] + [
+            path
+            for entry in result['renditions'].values()
+            for fmt, path in entry.items() if fmt in RENDITION_FORMATS
+        ]
+    for name in names:
+        default_storage.delete(name)
+
+
+def _save_without_exif(name, image, original_format):
+    # Pillow only writes EXIF when asked to, so re-encoding drops it. The
+    # original still exists, so the storage picks a new name for the copy and
+    # the model never points at a missing file.
+    return _save_image(name, image, original_format, replace=False)
+
+
+def _save_image(path, image, pil_format, replace=True):
+    if pil_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background.paste(image, mask=image.split()[-1])
+        else:
+            background.paste(image.convert('RGB'))
+        image = background
+
+    buffer = BytesIO()
+    save_kwargs = {'optimize': True}
+    if pil_format in ('JPEG', 'WEBP'):
+        save_kwargs['quality'] = settings.IMAGE_RENDITION_QUALITY
+    image.save(buffer, format=pil_format, **save_kwargs)
+
+    if replace and default_storage.exists(path):
+        default_storage.delete(path)
+    return default_storage.save(path, ContentFile(buffer.getvalue()))
+
+
+def rendition_urls(renditions):
+    """URLs of every rendition, as {size: {'jpeg': url, 'webp': url, 'width': w, 'height': h}}"""
+    return {
+        size_name: {
+            key: default_storage.url(value) if key in RENDITION_FORMATS else value
+            for key, value in entry.items()
+        }
+        for size_name, entry in (renditions or {}).items()
+    }
+
+
+def image_url(field_file, renditions=None, size=None, fmt='jpeg'):
+    """
+    URL of the requested rendition, falling back to the original upload while
+    the renditions are not ready. Returns None when there is no image.
+    """
+    entry = (renditions or {}).get(size) if size else None
+    if entry and entry.get(fmt):
+        return default_storage.url(entry[fmt])
+    if field_file and hasattr(field_file, 'url'):
+        return field_file.url
+    return None
@@ -0,0 +1,234 @@
+"""
+Per-request instrumentation: SQL query count, DB time, duplicate queries,
+cache hits/misses and serializer time
+"""
+from collections import Counter
+from contextlib import ExitStack
+import contextvars
+import json
+import logging
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from rest_framework import serializers
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_current_stats = contextvars.ContextVar('request_stats', default=None)
+
+_STRING_LITERALS = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERALS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LISTS = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+
+
+class RequestStats:
+    """Counters collected while a single request is being handled"""
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.fingerprints = Counter()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.total_time = 0.0
+
+    def duplicate_queries(self):
+        """Query shapes executed more than once (typical N+1 signature)"""
+        return {sql: count for sql, count in self.fingerprints.most_common() if count > 1}
+
+    def as_dict(self):
+        duplicates = self.duplicate_queries()
+        return {
+            'queries': self.query_count,
+            'db_time_ms': round(self.db_time * 1000, 2),
+            'duplicate_queries': sum(count - 1 for count in duplicates.values()),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'serializer_time_ms': round(self.serializer_time * 1000, 2),
+            'total_time_ms': round(self.total_time * 1000, 2),
+        }
+
+
+def current_stats():
+    """Stats of the request being handled, or None outside a request"""
+    return _current_stats.get()
+
+
+def record_cache_hit():
+    metrics.observe_cache(hit=True)
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.cache_hits += 1
+
+
+def record_cache_miss():
+    metrics.observe_cache(hit=False)
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.cache_misses += 1
+
+
+def fingerprint(sql):
+    """Normalize SQL so that the same query shape with other values compares equal"""
+    sql = _STRING_LITERALS.sub('?', sql)
+    sql = _NUMBER_LITERALS.sub('?', sql)
+    sql = _IN_LISTS.sub('(...)', sql)
+    return ' '.join(sql.split())
+
+
+class QueryRecorder:
+    """Database execute wrapper feeding a RequestStats"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.stats.db_time += time.perf_counter() - start
+            self.stats.query_count += 1
+            self.stats.fingerprints[fingerprint(sql)] += 1
+
+
+def record_queries(stats):
+    """
+    Install a QueryRecorder on the current thread's connections; closing the
+    returned ExitStack removes it
+    """
+    stack = ExitStack()
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(QueryRecorder(stats)))
+    return stack
+
+
+class TimedSerializerMixin:
+    """
+    Time serializer output (where N+1 queries usually happen) for the
+    request's stats. Only the outermost to_representation is timed: nested
+    serializers and the items of a many=True list are part of it.
+    """
+
+    def to_representation(self, instance):
+        stats = _current_stats.get()
+        if stats is None or stats.serializer_depth:
+            return super().to_representation(instance)
+        stats.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            stats.serializer_time += time.perf_counter() - start
+            stats.serializer_depth -= 1
+
+
+class InstrumentedSerializer(TimedSerializerMixin, serializers.Serializer):
+    pass
+
+
+class InstrumentedModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    pass
+
+
+def query_budget_for(view_name):
+    return settings.QUERY_BUDGETS.get(view_name, settings.QUERY_BUDGET_DEFAULT)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Record per-request DB/cache/serializer metrics (serializer time covers the
+    serializers built on InstrumentedSerializer/InstrumentedModelSerializer).
+
+    Latency and query counts are also exported to Prometheus (see metrics.py).
+
+    With INSTRUMENTATION_HEADERS the numbers are returned as X-* response
+    headers; with INSTRUMENTATION_LOG_REQUESTS each request is logged as a
+    JSON line. Requests above their query budget (QUERY_BUDGETS by URL name,
+    QUERY_BUDGET_DEFAULT otherwise) are always logged as warnings.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            with record_queries(stats):
+                response = self.get_response(request)
+        finally:
+            stats.total_time = time.perf_counter() - start
+            _current_stats.reset(token)
+
+        self.report(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        # Under ASGI the ORM runs in the request's thread-sensitive executor thread
+        # (connections are per thread), so the recorder is installed over there
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            recorder = await sync_to_async(record_queries)(stats)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(recorder.close)()
+        finally:
+            stats.total_time = time.perf_counter() - start
+            _current_stats.reset(token)
+
+        self.report(request, response, stats)
+        return response
+
+    def report(self, request, response, stats):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        budget = query_budget_for(view_name)
+        over_budget = stats.query_count > budget
+        data = stats.as_dict()
+        metrics.observe_request(view_name, request.method, response.status_code, stats)
+
+        if settings.INSTRUMENTATION_HEADERS:
+            response['X-DB-Query-Count'] = str(data['queries'])
+            response['X-DB-Time-Ms'] = str(data['db_time_ms'])
+            response['X-DB-Duplicate-Queries'] = str(data['duplicate_queries'])
+            response['X-Cache-Hits'] = str(data['cache_hits'])
+            response['X-Cache-Misses'] = str(data['cache_misses'])
+            response['X-Serializer-Time-Ms'] = str(data['serializer_time_ms'])
+            response['X-Request-Time-Ms'] = str(data['total_time_ms'])
+            if over_budget:
+                response['X-Query-Budget-Exceeded'] = f'{stats.query_count}/{budget}'
+
+        if over_budget or settings.INSTRUMENTATION_LOG_REQUESTS:
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'view': view_name,
+                'status': response.status_code,
+                'query_budget': budget,
+                **data,
+            }
+            if over_budget:
+                record['top_duplicates'] = dict(list(stats.duplicate_queries().items())[:5])
+                logger.warning(json.dumps({'event': 'query_budget_exceeded', **record}))
+            else:
+                logger.info(json.dumps({'event': 'request', **record}))
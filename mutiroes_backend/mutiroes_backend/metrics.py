@@ -0,0 +1,280 @@
+"""
+Prometheus metrics for backends and Celery workers
+
+When PROMETHEUS_MULTIPROC_DIR is set (gunicorn workers, Celery prefork
+children) every process writes its samples there and the scrape aggregates
+all of them, so one /metrics/ call reports the whole container.
+"""
+import logging
+import os
+import shutil
+import time
+
+from celery.signals import task_postrun, task_prerun, worker_init, worker_process_shutdown, worker_ready
+from django.core.signals import request_finished
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Request latency per DRF view/action',
+    ['view', 'method', 'status'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries',
+    'SQL queries executed per request',
+    ['view'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250),
+)
+REQUEST_DB_TIME = Histogram(
+    'http_request_db_duration_seconds',
+    'Time spent in the database per request',
+    ['view'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Cache lookups by result (hit ratio = hit / (hit + miss))',
+    ['result'],
+)
+CELERY_TASK_DURATION = Histogram(
+    'celery_task_duration_seconds',
+    'Celery task runtime',
+    ['task', 'state'],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 1800),
+)
+DB_CONNECTIONS_OPENED = Counter(
+    'db_connections_opened_total',
+    'Database connections opened (high rate = connections not being reused)',
+    ['alias'],
+)
+DB_CONNECTIONS_OPEN = Gauge(
+    'db_connections_open',
+    'Database connections held open, summed over live processes',
+    ['alias'],
+    multiprocess_mode='livesum',
+)
+
+BREAKER_CALLS = Counter(
+    'circuit_breaker_calls_total',
+    'Calls through each circuit breaker (rejected = refused while open)',
+    ['breaker', 'result'],
+)
+BREAKER_TRANSITIONS = Counter(
+    'circuit_breaker_transitions_total',
+    'State changes made or noticed by this process',
+    ['breaker', 'state'],
+)
+TASK_COALESCING = Counter(
+    'celery_task_coalescing_total',
+    'Coalescing decisions per task (coalesced = duplicate absorbed by a pending run)',
+    ['task', 'result'],
+)
+
+BREAKER_STATES = {'closed': 0, 'half-open': 1, 'open': 2}
+
+
+def is_multiprocess():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def observe_request(view, method, status_code, stats):
+    """Record a finished request (called by QueryInstrumentationMiddleware)"""
+    view = view or 'unmatched'
+    REQUEST_LATENCY.labels(view, method, str(status_code)).observe(stats.total_time)
+    REQUEST_DB_QUERIES.labels(view).observe(stats.query_count)
+    REQUEST_DB_TIME.labels(view).observe(stats.db_time)
+
+
+def observe_cache(hit):
+    CACHE_REQUESTS.labels('hit' if hit else 'miss').inc()
+
+
+def observe_breaker_call(breaker, result):
+    BREAKER_CALLS.labels(breaker, result).inc()
+
+
+def observe_breaker_transition(breaker, state):
+    BREAKER_TRANSITIONS.labels(breaker, state).inc()
+
+
+def observe_task_coalescing(task, result):
+    TASK_COALESCING.labels(task, result).inc()
+
+
+def celery_queue_names():
+    from .celery import app
+    queues = app.conf.task_queues
+    if queues:
+        return [queue.name for queue in queues]
+    return [app.conf.task_default_queue]
+
+
+def celery_queue_lengths(client):
+    """
+    Messages waiting per queue. On Redis each priority level of a queue is a
+    separate list ("<queue><sep><priority>", the plain name for priority 0).
+    """
+    from .celery import app
+    options = app.conf.broker_transport_options
+    steps = options.get('priority_steps', [0])
+    sep = options.get('sep', '\x06\x16')
+    keys = {
+        queue: [f'{queue}{sep}{step}' if step else queue for step in steps]
+        for queue in celery_queue_names()
+    }
+    pipeline = client.pipeline(transaction=False)
+    for queue_keys in keys.values():
+        for key in queue_keys:
+            pipeline.llen(key)
+    lengths = iter(pipeline.execute())
+    return {queue: sum(next(lengths) for _ in queue_keys) for queue, queue_keys in keys.items()}
+
+
+class CircuitBreakerCollector:
+    """Circuit breaker state, read at scrape time"""
+
+    def collect(self):
+        from .resilience import get_circuit_breaker_status
+
+        state = GaugeMetricFamily(
+            'circuit_breaker_state',
+            'Circuit breaker state (0=closed, 1=half-open, 2=open)',
+            labels=['breaker'],
+        )
+        failures = GaugeMetricFamily(
+            'circuit_breaker_fail_count',
+            'Consecutive failures counted by the breaker (shared by all replicas)',
+            labels=['breaker'],
+        )
+        for name, info in get_circuit_breaker_status().items():
+            state.add_metric([name], BREAKER_STATES.get(info['state'], -1))
+            failures.add_metric([name], info['fail_count'])
+        yield state
+        yield failures
+
+
+class CeleryQueueCollector:
+    """Messages waiting in each Celery queue on the Redis broker"""
+
+    def collect(self):
+        from .redis_client import get_broker_client
+
+        depth = GaugeMetricFamily(
+            'celery_queue_length',
+            'Messages waiting in the Celery queue',
+            labels=['queue'],
+        )
+        try:
+            for queue, length in celery_queue_lengths(get_broker_client()).items():
+                depth.add_metric([queue], length)
+        except Exception as e:
+            logger.warning(f"Could not read Celery queue lengths: {str(e)}")
+        yield depth
+
+
+class _DefaultCollector:
+    """Expose the process-local default registry inside a custom registry"""
+
+    def collect(self):
+        return REGISTRY.collect()
+
+
+def build_registry():
+    registry = CollectorRegistry()
+    if is_multiprocess():
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry.register(_DefaultCollector())
+    registry.register(CircuitBreakerCollector())
+    registry.register(CeleryQueueCollector())
+    return registry
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint"""
+    return HttpResponse(generate_latest(build_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+def clear_multiprocess_dir():
+    """Wipe stale samples from a previous run (call once before forking)"""
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def mark_process_dead(pid):
+    if is_multiprocess():
+        multiprocess.mark_process_dead(pid)
+
+
+def update_connection_gauges():
+    """Record which database connections this process is holding right now"""
+    for connection in connections.all(initialized_only=True):
+        DB_CONNECTIONS_OPEN.labels(connection.alias).set(int(connection.connection is not None))
+
+
+@receiver(connection_created)
+def _on_connection_created(connection=None, **kwargs):
+    DB_CONNECTIONS_OPENED.labels(connection.alias).inc()
+    DB_CONNECTIONS_OPEN.labels(connection.alias).set(1)
+
+
+@receiver(request_finished)
+def _on_request_finished(**kwargs):
+    # Connected after Django's close_old_connections, so this sees the post-request state
+    update_connection_gauges()
+
+
+# Celery task runtimes
+_task_started = {}
+
+
+@task_prerun.connect
+def _on_task_prerun(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _on_task_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        CELERY_TASK_DURATION.labels(task.name, state or 'UNKNOWN').observe(time.perf_counter() - started)
+    update_connection_gauges()
+
+
+@worker_init.connect
+def _on_worker_init(**kwargs):
+    clear_multiprocess_dir()
+
+
+@worker_ready.connect
+def _on_worker_ready(**kwargs):
+    from django.conf import settings
+    port = getattr(settings, 'CELERY_METRICS_PORT', None)
+    if port:
+        start_http_server(port, registry=build_registry())
+        logger.info(f"Celery metrics available on port {port}")
+
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(pid=None, **kwargs):
+    mark_process_dead(pid or os.getpid())
@@ -0,0 +1,58 @@
+"""
+Shared Redis client with one connection pool per process
+"""
+import asyncio
+import weakref
+
+import redis
+import redis.asyncio
+from django.conf import settings
+
+_client = None
+_broker_client = None
+_async_pubsub_clients = weakref.WeakKeyDictionary()
+
+
+def get_redis_client():
+    """
+    Return the process-wide Redis client, creating its pool on first use
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            health_check_interval=30,
+        )
+    return _client
+
+
+def get_broker_client():
+    """
+    Return the process-wide client for the Celery broker (queue inspection)
+    """
+    global _broker_client
+    if _broker_client is None:
+        _broker_client = redis.Redis.from_url(
+            settings.CELERY_BROKER_URL,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            health_check_interval=30,
+        )
+    return _broker_client
+
+
+def get_async_pubsub_client():
+    """
+    Return the asyncio client for pub/sub listeners on the running event loop.
+    No socket timeout: a subscriber may legitimately wait a long time for a message.
+    """
+    loop = asyncio.get_running_loop()
+    if loop not in _async_pubsub_clients:
+        _async_pubsub_clients[loop] = redis.asyncio.Redis.from_url(
+            settings.REDIS_URL,
+            socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            health_check_interval=30,
+        )
+    return _async_pubsub_clients[loop]
@@ -0,0 +1,154 @@
+"""
+Process-local cache of reference data (event categories, badges, skills)
+
+These tables are tiny and change only through the admin or seed scripts,
+yet they were joined or queried on almost every list render. Each process
+keeps them in memory as {pk: instance}. The tables are loaded on first use,
+and gunicorn warms them up after forking a worker. Each table is dropped and
+reloaded when:
+
+- a change is committed anywhere: the models' signal receivers call
+  invalidate_on_commit(), which publishes on a Redis channel every process
+  listens to;
+- a lookup misses (a row created since the last load);
+- REFERENCE_DATA_MAX_AGE passes, the safety net while Redis is unavailable.
+"""
+import logging
+import os
+import threading
+import time
+
+import redis
+from django.apps import apps
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from .redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'reference-data:invalidate'
+
+
+class ReferenceTable:
+    """All rows of a small model, in memory"""
+
+    def __init__(self, label):
+        self.label = label
+        self._rows = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        return apps.get_model(self.label)
+
+    def load(self):
+        with self._lock:
+            self._rows = {row.pk: row for row in self.model.objects.all()}
+            self._loaded_at = time.monotonic()
+            return self._rows
+
+    def rows(self):
+        start_listener()
+        rows = self._rows
+        if rows is None or time.monotonic() - self._loaded_at > settings.REFERENCE_DATA_MAX_AGE:
+            rows = self.load()
+        return rows
+
+    def ensure(self, pks=()):
+        """Rows, reloaded first if any of `pks` is missing (async views call this before serializing)"""
+        rows = self.rows()
+        if any(pk is not None and pk not in rows for pk in pks):
+            rows = self.load()
+        return rows
+
+    def get(self, pk):
+        if pk is None:
+            return None
+        return self.ensure([pk]).get(pk)
+
+    def all(self):
+        """Rows in the model's default ordering"""
+        return list(self.rows().values())
+
+    def pks_where(self, field, values):
+        """Primary keys of the rows whose `field` is one of `values`"""
+        values = set(values)
+        return [row.pk for row in self.rows().values() if getattr(row, field) in values]
+
+    def clear(self):
+        self._rows = None
+
+    def invalidate_on_commit(self):
+        """Drop this table in every process once the current transaction commits"""
+        transaction.on_commit(lambda: invalidate(self.label))
+
+
+categories = ReferenceTable('events.EventCategory')
+badges = ReferenceTable('users.UserBadge')
+skills = ReferenceTable('users.UserSkill')
+
+TABLES = {table.label: table for table in (categories, badges, skills)}
+
+
+def invalidate(label):
+    TABLES[label].clear()
+    try:
+        get_redis_client().publish(CHANNEL, label)
+    except redis.RedisError as e:
+        logger.warning(f"Could not broadcast reference data change ({label}): {str(e)}")
+
+
+def warm_up():
+    """Load every table (gunicorn post_worker_init)"""
+    try:
+        for table in TABLES.values():
+            table.load()
+    except DatabaseError as e:
+        logger.warning(f"Could not preload reference data: {str(e)}")
+    start_listener()
+
+
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def start_listener():
+    """Start this process's invalidation listener thread (again after a fork)"""
+    global _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid != os.getpid():
+            _listener_pid = os.getpid()
+            threading.Thread(target=_listen, name='reference-data-listener', daemon=True).start()
+
+
+def _listen():
+    connected = True
+    while True:
+        pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(CHANNEL)
+            # Changes published while disconnected were missed
+            for table in TABLES.values():
+                table.clear()
+            connected = True
+            while True:
+                # get_message's own timeout, not the client's short socket timeout
+                message = pubsub.get_message(timeout=30)
+                if message and message['type'] == 'message':
+                    table = TABLES.get(message['data'].decode())
+                    if table is not None:
+                        table.clear()
+        except redis.RedisError as e:
+            if connected:
+                logger.warning(f"Reference data invalidation listener disconnected, retrying: {str(e)}")
+            connected = False
+            time.sleep(5)
+        finally:
+            try:
+                pubsub.close()
+            except redis.RedisError:
+                pass
@@ -1,39 +1,233 @@
 """
 Resilience patterns: Circuit Breaker, Retry, and Fault Tolerance
 """
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
 from functools import wraps
+import contextvars
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from tenacity import (
     retry,
     stop_after_attempt,
-    wait_exponential,
+    wait_random_exponential,
     retry_if_exception_type,
     before_sleep_log
 )
-from pybreaker import CircuitBreaker
+from tenacity.stop import stop_base
+from tenacity.wait import wait_base
+from pybreaker import (
+    STATE_CLOSED,
+    STATE_OPEN,
+    CircuitBreaker,
+    CircuitBreakerError,
+    CircuitBreakerListener,
+    CircuitBreakerStorage,
+    CircuitMemoryStorage,
+)
 import logging
+import redis
 import requests
+from django.conf import settings
 from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from rest_framework.response import Response
+from . import metrics
+from .instrumentation import record_cache_hit, record_cache_miss
+from .redis_client import get_redis_client
 
 logger = logging.getLogger(__name__)
 
+_MISSING = object()
+
+
+class SharedBreakerStorage(CircuitBreakerStorage):
+    """
+    Circuit breaker state kept in Redis, so every worker of every replica
+    sees the same state and failure count: one process detecting an outage
+    opens the breaker for all of them.
+
+    Reads use a local copy refreshed at most every CIRCUIT_BREAKER_SYNC_SECONDS
+    (no Redis round-trip per guarded call). When Redis is unreachable the local
+    copy keeps working on its own and Redis is retried after
+    CIRCUIT_BREAKER_REDIS_BACKOFF seconds.
+    """
+
+    KEY = 'circuit_breaker:{}:{}'
+
+    def __init__(self, breaker_name, state=STATE_CLOSED):
+        super().__init__('redis')
+        self.breaker_name = breaker_name
+        self.local = CircuitMemoryStorage(state)
+        # First sync on first use, not while the module is imported
+        self._synced_at = time.monotonic()
+        self._redis_retry_at = 0
+
+    def key(self, field):
+        return self.KEY.format(self.breaker_name, field)
+
+    def _client(self):
+        if not settings.CIRCUIT_BREAKER_SHARED or time.monotonic() < self._redis_retry_at:
+            return None
+        return get_redis_client()
+
+    def _redis_failed(self, e):
+        logger.warning(f"Circuit breaker {self.breaker_name}: Redis unavailable, using local state: {str(e)}")
+        self._redis_retry_at = time.monotonic() + settings.CIRCUIT_BREAKER_REDIS_BACKOFF
+
+    def _write(self, *commands):
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            pipeline = client.pipeline(transaction=False)
+            for command, *args in commands:
+                getattr(pipeline, command)(*args)
+            return pipeline.execute()
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return None
+
+    def read_shared(self):
+        """Current (state, fail_count, opened_at timestamp) in Redis, or None"""
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            state, counter, opened_at = client.mget(self.key('state'), self.key('fail_counter'), self.key('opened_at'))
+        except redis.RedisError as e:
+            self._redis_failed(e)
+            return None
+        return (
+            state.decode() if state else STATE_CLOSED,
+            int(counter or 0),
+            float(opened_at) if opened_at else None,
+        )
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self._synced_at < settings.CIRCUIT_BREAKER_SYNC_SECONDS:
+            return
+        self._synced_at = now
+        shared = self.read_shared()
+        if shared is None:
+            return
+        state, counter, opened_at = shared
+        self.local.state = state
+        self.local._fail_counter = counter
+        if opened_at is not None:
+            # pybreaker compares opened_at with datetime.utcnow() (naive UTC)
+            self.local.opened_at = datetime.fromtimestamp(opened_at, dt_timezone.utc).replace(tzinfo=None)
+
+    @property
+    def state(self):
+        self._sync()
+        return self.local.state
+
+    @state.setter
+    def state(self, state):
+        self.local.state = state
+        self._write(('set', self.key('state'), state))
+
+    def increment_counter(self):
+        result = self._write(('incr', self.key('fail_counter')))
+        if result is None:
+            self.local.increment_counter()
+        else:
+            self.local._fail_counter = result[0]
+
+    def reset_counter(self):
+        # Called after every successful call: skip the write when nothing failed
+        if self.local.counter == 0:
+            return
+        self.local.reset_counter()
+        self._write(('set', self.key('fail_counter'), 0))
+
+    @property
+    def counter(self):
+        self._sync()
+        return self.local.counter
+
+    @property
+    def opened_at(self):
+        self._sync()
+        return self.local.opened_at
+
+    @opened_at.setter
+    def opened_at(self, value):
+        self.local.opened_at = value
+        self._write(('set', self.key('opened_at'), value.replace(tzinfo=dt_timezone.utc).timestamp()))
+
+
+class BreakerMetricsListener(CircuitBreakerListener):
+    """Export calls and state changes of each breaker to Prometheus"""
+
+    def success(self, cb):
+        metrics.observe_breaker_call(cb.name, 'success')
+
+    def failure(self, cb, exc):
+        metrics.observe_breaker_call(cb.name, 'failure')
+
+    def state_change(self, cb, old_state, new_state):
+        metrics.observe_breaker_transition(cb.name, new_state.name)
+        if new_state.name == STATE_OPEN:
+            logger.warning(f"Circuit breaker {cb.name} opened")
+        elif old_state is not None:
+            logger.info(f"Circuit breaker {cb.name}: {old_state.name} -> {new_state.name}")
+
+
+# Every breaker of the process, by name (status, metrics)
+BREAKERS = {}
+
+
+def register_breaker(name, fail_max, reset_timeout, exclude=None):
+    """Create a breaker with shared state and metrics and add it to the registry"""
+    breaker = CircuitBreaker(
+        fail_max=fail_max,
+        reset_timeout=reset_timeout,
+        exclude=exclude,
+        state_storage=SharedBreakerStorage(name),
+        listeners=[BreakerMetricsListener()],
+        name=name,
+    )
+    BREAKERS[name] = breaker
+    return breaker
+
+
 # Circuit Breakers for external services
-external_api_breaker = CircuitBreaker(
-    fail_max=5,
-    reset_timeout=60,
-    name='external_api_breaker'
+external_api_breaker = register_breaker('external_api_breaker', fail_max=5, reset_timeout=60)
+# Only database errors count: validation/404 raised by guarded code are not outages
+database_breaker = register_breaker(
+    'database_breaker', fail_max=3, reset_timeout=30, exclude=[lambda e: not isinstance(e, DatabaseError)]
 )
+redis_breaker = register_breaker('redis_breaker', fail_max=3, reset_timeout=30)
 
-database_breaker = CircuitBreaker(
-    fail_max=3,
-    reset_timeout=30,
-    name='database_breaker'
-)
 
-redis_breaker = CircuitBreaker(
-    fail_max=3,
-    reset_timeout=30,
-    name='redis_breaker'
-)
+def is_rejection(exc):
+    """
+    Whether the breaker refused the call (open) rather than the call failing
+    and tripping it. Set by call_with_breaker.
+    """
+    return isinstance(exc, CircuitBreakerError) and getattr(exc, 'rejected', False)
+
+
+def call_with_breaker(breaker, func, *args, **kwargs):
+    # A rejection is a CircuitBreakerError raised without running func; the
+    # exception chain cannot tell, as the caller may itself be in an except block
+    called = False
+
+    def invoke(*args, **kwargs):
+        nonlocal called
+        called = True
+        return func(*args, **kwargs)
+
+    try:
+        return breaker.call(invoke, *args, **kwargs)
+    except CircuitBreakerError as e:
+        e.rejected = not called
+        if e.rejected:
+            metrics.observe_breaker_call(breaker.name, 'rejected')
+        raise
 
 
 def with_circuit_breaker(breaker):
@@ -44,7 +238,7 @@ def with_circuit_breaker(breaker):
         @wraps(func)
         def wrapper(*args, **kwargs):
             try:
-                return breaker.call(func, *args, **kwargs)
+                return call_with_breaker(breaker, func, *args, **kwargs)
             except Exception as e:
                 logger.error(f"Circuit breaker {breaker.name} failed: {str(e)}")
                 raise
@@ -52,6 +246,87 @@ def with_circuit_breaker(breaker):
     return decorator
 
 
+# Monotonic deadline of the request being served (None outside requests, e.g. in Celery tasks)
+_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+# Share of the remaining request time that retry backoff may sleep; the
+# retried call and the response need the rest
+RETRY_BUDGET_FRACTION = 0.5
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Bound retries inside the block to `seconds` from now. A nested deadline
+    can only shorten the current one.
+    """
+    value = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        value = min(value, current)
+    token = _deadline.set(value)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time():
+    """Seconds left before the current deadline, or None without one"""
+    value = _deadline.get()
+    return None if value is None else max(0.0, value - time.monotonic())
+
+
+class RequestDeadlineMiddleware:
+    """
+    Give each request a deadline of REQUEST_DEADLINE_SECONDS (below the
+    gunicorn worker timeout), so retries give up instead of outliving it
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with deadline(settings.REQUEST_DEADLINE_SECONDS):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with deadline(settings.REQUEST_DEADLINE_SECONDS):
+            return await self.get_response(request)
+
+
+class stop_at_deadline(stop_base):
+    """Stop retrying once even the shortest backoff no longer fits the retry budget"""
+
+    def __init__(self, wait_min):
+        self.wait_min = wait_min
+
+    def __call__(self, retry_state):
+        remaining = remaining_time()
+        return remaining is not None and remaining * RETRY_BUDGET_FRACTION < self.wait_min
+
+
+class wait_within_deadline(wait_base):
+    """Cap another wait strategy at the retry budget left in the current deadline"""
+
+    def __init__(self, wait):
+        self.wait = wait
+
+    def __call__(self, retry_state):
+        seconds = self.wait(retry_state)
+        remaining = remaining_time()
+        if remaining is not None:
+            seconds = min(seconds, remaining * RETRY_BUDGET_FRACTION)
+        return seconds
+
+
 def with_retry(
     max_attempts=3,
     wait_min=1,
@@ -60,12 +335,18 @@ def with_retry(
 ):
     """
     Decorator to add retry logic with exponential backoff
+
+    Backoff uses full jitter (so workers failing together do not retry in
+    lockstep) and stays within the current deadline: inside a request retries
+    stop when the remaining time runs out. Works on coroutine functions too,
+    sleeping with asyncio.sleep instead of blocking the event loop.
     """
     return retry(
-        stop=stop_after_attempt(max_attempts),
-        wait=wait_exponential(multiplier=1, min=wait_min, max=wait_max),
+        stop=stop_after_attempt(max_attempts) | stop_at_deadline(wait_min),
+        wait=wait_within_deadline(wait_random_exponential(multiplier=wait_min, max=wait_max)),
         retry=retry_if_exception_type(exceptions),
-        before_sleep=before_sleep_log(logger, logging.WARNING)
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+        reraise=True,
     )
 
 
@@ -84,33 +365,162 @@ def call_external_api(url, method='GET', **kwargs):
         raise
 
 
-@with_circuit_breaker(redis_breaker)
-@with_retry(max_attempts=2)
+# Cache operations are on the hot path: a single attempt, never retried or
+# slept on. Failures count towards redis_breaker and, while it is open, the
+# cache is skipped without touching Redis.
+
 def get_from_cache(key, default=None):
     """
     Resilient cache get operation
     """
     try:
-        return cache.get(key, default)
+        value = call_with_breaker(redis_breaker, cache.get, key, _MISSING)
     except Exception as e:
-        logger.error(f"Cache get failed for key {key}: {str(e)}")
+        if not is_rejection(e):
+            logger.warning(f"Cache get failed for key {key}: {str(e.__context__ or e)}")
+        value = _MISSING
+    if value is _MISSING:
+        record_cache_miss()
         return default
+    record_cache_hit()
+    return value
 
 
-@with_circuit_breaker(redis_breaker)
-@with_retry(max_attempts=2)
 def set_to_cache(key, value, timeout=300):
     """
     Resilient cache set operation
     """
     try:
-        cache.set(key, value, timeout)
+        call_with_breaker(redis_breaker, cache.set, key, value, timeout)
         return True
     except Exception as e:
-        logger.error(f"Cache set failed for key {key}: {str(e)}")
+        if not is_rejection(e):
+            logger.warning(f"Cache set failed for key {key}: {str(e.__context__ or e)}")
         return False
 
 
+# Stale-while-revalidate cache
+#
+# Entries are envelopes {'value', 'fresh_until', 'tags'} kept for
+# fresh_for + stale_for seconds. A fresh entry is served as is. Once stale
+# (or invalidated through one of its tags) a single worker, holding a lock
+# taken with cache.add (SET NX on Redis), recomputes it while the others
+# keep serving the old value. The old value is also served when the
+# recomputation fails or database_breaker is open.
+
+SWR_KEY = 'swr:{}'
+SWR_LOCK_KEY = 'swr:lock:{}'
+SWR_TAG_KEY = 'swr:tag:{}'
+
+
+def _cache_call(method, *args):
+    """Cache operation through redis_breaker; None when the cache is unavailable"""
+    try:
+        return call_with_breaker(redis_breaker, method, *args)
+    except Exception as e:
+        if not is_rejection(e):
+            logger.warning(f"Cache {method.__name__} failed: {str(e.__context__ or e)}")
+        return None
+
+
+def cached_call(key, func, tags=(), fresh_for=60, stale_for=3600, lock_timeout=30):
+    """
+    Return func() through the stale-while-revalidate entry `key`
+    """
+    tags = list(tags)
+    entry_key = SWR_KEY.format(key)
+    tag_keys = [SWR_TAG_KEY.format(tag) for tag in tags]
+    found = _cache_call(cache.get_many, [entry_key, *tag_keys])
+    if found is None:
+        # Cache unavailable: straight to the database
+        record_cache_miss()
+        return func()
+
+    versions = {tag: found.get(tag_key) for tag, tag_key in zip(tags, tag_keys)}
+    entry = found.get(entry_key)
+    lock_key = SWR_LOCK_KEY.format(key)
+    locked = False
+    if entry is not None:
+        if entry['tags'] == versions and time.time() < entry['fresh_until']:
+            record_cache_hit()
+            return entry['value']
+        locked = bool(_cache_call(cache.add, lock_key, 1, lock_timeout))
+        if not locked:
+            # Another worker is recomputing it
+            record_cache_hit()
+            return entry['value']
+    record_cache_miss()
+
+    try:
+        value = call_with_breaker(database_breaker, func)
+    except (CircuitBreakerError, DatabaseError) as e:
+        if entry is None:
+            raise
+        logger.warning(f"Serving stale cache entry {key}: {str(e.__context__ or e)}")
+        return entry['value']
+    finally:
+        if locked:
+            _cache_call(cache.delete, lock_key)
+
+    envelope = {'value': value, 'fresh_until': time.time() + fresh_for, 'tags': versions}
+    _cache_call(cache.set, entry_key, envelope, fresh_for + stale_for)
+    return value
+
+
+def swr_cache(key, tags=(), fresh_for=60, stale_for=3600):
+    """
+    Decorator form of cached_call; `key` and `tags` may be callables
+    receiving the decorated function's arguments
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return cached_call(
+                key(*args, **kwargs) if callable(key) else key,
+                lambda: func(*args, **kwargs),
+                tags=tags(*args, **kwargs) if callable(tags) else tags,
+                fresh_for=fresh_for,
+                stale_for=stale_for,
+            )
+        return wrapper
+    return decorator
+
+
+def invalidate_tags(*tags):
+    """Make every entry cached with one of `tags` stale (recomputed on the next read)"""
+    if not tags:
+        return
+    version = time.time_ns()
+    if _cache_call(cache.set_many, {SWR_TAG_KEY.format(tag): version for tag in tags}, None) is None:
+        logger.warning(f"Could not invalidate cache tags {tags}; entries refresh when they expire")
+
+
+def invalidate_tags_on_commit(*tags):
+    transaction.on_commit(lambda: invalidate_tags(*tags))
+
+
+class CachedListMixin:
+    """
+    List view served through the stale-while-revalidate cache, one entry per
+    URL (page, filters). For data that is the same for every user.
+    """
+    cache_tags = ()
+    cache_fresh_for = 5 * 60
+    cache_stale_for = 24 * 60 * 60
+
+    def list(self, request, *args, **kwargs):
+        return Response(self.cached_list_data(request, *args, **kwargs))
+
+    def cached_list_data(self, request, *args, **kwargs):
+        return cached_call(
+            f'{type(self).__name__}:{request.build_absolute_uri()}',
+            lambda: super(CachedListMixin, self).list(request, *args, **kwargs).data,
+            tags=self.cache_tags,
+            fresh_for=self.cache_fresh_for,
+            stale_for=self.cache_stale_for,
+        )
+
+
 class ResilientDatabaseQuery:
     """
     Context manager for resilient database queries
@@ -154,14 +564,23 @@ def with_fallback(fallback_value=None):
 # Health check with circuit breaker status
 def get_circuit_breaker_status():
     """
-    Get status of all circuit breakers
+    Get status of all circuit breakers, as seen by the whole cluster (read
+    from Redis) or by this process when Redis is unavailable
     """
-    breakers = [external_api_breaker, database_breaker, redis_breaker]
-    return {
-        breaker.name: {
-            'state': breaker.current_state,
-            'fail_count': breaker.fail_counter,
-            'last_failure': str(breaker.last_failure_time) if breaker.last_failure_time else None
+    status = {}
+    for name, breaker in BREAKERS.items():
+        storage = breaker._state_storage
+        shared = storage.read_shared()
+        if shared is not None:
+            state, fail_count, opened_at = shared
+            opened_at = datetime.fromtimestamp(opened_at, dt_timezone.utc) if opened_at else None
+        else:
+            state, fail_count, opened_at = storage.local.state, storage.local.counter, storage.local.opened_at
+        status[name] = {
+            'state': state,
+            'fail_count': fail_count,
+            # pybreaker only tracks when the breaker last opened
+            'opened_at': str(opened_at) if opened_at else None,
+            'scope': 'cluster' if shared is not None else 'local',
         }
-        for breaker in breakers
-    }
+    return status
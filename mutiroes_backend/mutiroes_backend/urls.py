@@ -24,6 +24,7 @@ from rest_framework_simplejwt.views import (
 )
 from users.serializers import CustomTokenObtainPairSerializer
 from .health import health_check, readiness_check, liveness_check
+from .metrics import metrics_view
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
@@ -35,6 +36,7 @@ urlpatterns = [
     path('health/', health_check, name='health_check'),
     path('readiness/', readiness_check, name='readiness_check'),
     path('liveness/', liveness_check, name='liveness_check'),
+    path('metrics/', metrics_view, name='metrics'),
     
     # API URLs
     path('api/auth/', include('rest_framework.urls')),
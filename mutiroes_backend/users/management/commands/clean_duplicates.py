@@ -1,49 +1,171 @@
-from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User
 from collections import defaultdict
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Count, UniqueConstraint, Value, When
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def user_relations():
+    """
+    (modelo, campo) de toda FK/OneToOne que aponta para User, incluindo as
+    tabelas intermediárias dos M2M (grupos, permissões) e os apps de terceiros
+    """
+    return [
+        (rel.related_model, rel.field)
+        for rel in User._meta.get_fields(include_hidden=True)
+        if rel.auto_created and not rel.concrete and (rel.one_to_many or rel.one_to_one or rel.many_to_one)
+    ]
+
+
+def unique_groups(model, field):
+    """
+    Demais colunas de cada restrição de unicidade que inclui o campo do
+    usuário: () para OneToOne/unique (um registro por usuário)
+    """
+    groups = [()] if field.unique else []
+    sets = list(model._meta.unique_together) + [
+        constraint.fields for constraint in model._meta.constraints
+        if isinstance(constraint, UniqueConstraint) and constraint.fields and constraint.condition is None
+    ]
+    for names in sets:
+        if field.name in names:
+            groups.append(tuple(model._meta.get_field(name).attname for name in names if name != field.name))
+    return groups
+
+
+def find_conflicts(model, field, duplicates_to_kept):
+    """
+    pks dos registros que violariam uma restrição de unicidade ao passar para
+    o usuário mantido: fica o do mantido, ou o do duplicado mais antigo
+    """
+    column = field.attname
+    user_ids = list(duplicates_to_kept) + list(set(duplicates_to_kept.values()))
+    conflicting = set()
+    for others in unique_groups(model, field):
+        rows = model._base_manager.filter(**{f'{column}__in': user_ids}).values_list('pk', column, *others)
+        # Registros do usuário mantido primeiro; depois por id do duplicado
+        rows = sorted(rows, key=lambda row: (row[1] in duplicates_to_kept, row[1], row[0]))
+        seen = set()
+        for pk, user_id, *values in rows:
+            key = (duplicates_to_kept.get(user_id, user_id), *values)
+            if key in seen:
+                conflicting.add(pk)
+            else:
+                seen.add(key)
+    return conflicting
 
 
 class Command(BaseCommand):
     help = 'Remove usuários duplicados com o mesmo email, mantendo o mais antigo'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Apenas mostrar o que seria transferido e removido')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Emails duplicados processados por transação')
+
     def handle(self, *args, **options):
-        self.stdout.write(self.style.SUCCESS('=== Limpando usuários duplicados ===\n'))
-        
-        # Agrupar usuários por email
-        email_groups = defaultdict(list)
-        for user in User.objects.all():
-            if user.email:
-                email_groups[user.email].append(user)
-        
-        # Processar duplicatas
-        total_removed = 0
-        
-        for email, users in email_groups.items():
-            if len(users) > 1:
-                self.stdout.write(f"\nEmail: {email}")
-                self.stdout.write(f"  Encontrados {len(users)} usuários:")
-                
-                # Ordenar por data de criação (manter o mais antigo)
-                users_sorted = sorted(users, key=lambda u: u.date_joined)
-                keep = users_sorted[0]
-                duplicates = users_sorted[1:]
-                
-                self.stdout.write(self.style.SUCCESS(
-                    f"  ✓ Mantendo: {keep.username} (ID: {keep.id}, criado em {keep.date_joined})"
-                ))
-                
-                for dup in duplicates:
-                    self.stdout.write(self.style.WARNING(
-                        f"  ✗ Removendo: {dup.username} (ID: {dup.id}, criado em {dup.date_joined})"
-                    ))
-                    dup.delete()
-                    total_removed += 1
-        
+        dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
+        self.stdout.write(self.style.SUCCESS(
+            '=== Limpando usuários duplicados' + (' (simulação) ===' if dry_run else ' ===')
+        ))
+
+        # Um único GROUP BY ... HAVING: só os emails repetidos chegam ao Python
+        emails = list(
+            User.objects.exclude(email='')
+            .values('email')
+            .annotate(total=Count('id'))
+            .filter(total__gt=1)
+            .order_by('email')
+            .values_list('email', flat=True)
+        )
+        if not emails:
+            self.stdout.write('Nenhum email duplicado encontrado.')
+            return
+
+        relations = user_relations()
+        totals = defaultdict(int)
+        removed = 0
+        for number, batch in enumerate(batched(emails, options['batch_size']), start=1):
+            with transaction.atomic():
+                duplicates_to_kept = self.map_duplicates(batch)
+                if dry_run:
+                    self.count_related(relations, duplicates_to_kept, totals)
+                else:
+                    self.move_related(relations, duplicates_to_kept, totals)
+                    User.objects.filter(id__in=list(duplicates_to_kept)).delete()
+            removed += len(duplicates_to_kept)
+            self.stdout.write(f'Lote {number}: {len(batch)} emails, {len(duplicates_to_kept)} usuários duplicados')
+
+        for label, count in sorted(totals.items()):
+            self.stdout.write(f'  {label}: {count}')
+
+        verb = 'seriam removidos' if dry_run else 'removidos'
         self.stdout.write(self.style.SUCCESS(
-            f"\n\n=== Total de usuários removidos: {total_removed} ==="
+            f'\n=== {len(emails)} emails duplicados, {removed} usuários {verb} ==='
         ))
-        
-        # Mostrar estatísticas finais
-        self.stdout.write(self.style.SUCCESS('\n=== Usuários restantes ==='))
-        for user in User.objects.all().order_by('email'):
-            self.stdout.write(f"  {user.username} - {user.email} - {user.first_name} {user.last_name}")
+
+    def map_duplicates(self, emails):
+        """Mapa {id duplicado: id mantido}; mantém o cadastro mais antigo de cada email"""
+        duplicates_to_kept = {}
+        keep = {}
+        users = (
+            User.objects.filter(email__in=emails)
+            .order_by('email', 'date_joined', 'id')
+            .values_list('id', 'email', 'username')
+        )
+        for user_id, email, username in users:
+            if email not in keep:
+                keep[email] = user_id
+                if self.verbosity >= 2:
+                    self.stdout.write(self.style.SUCCESS(f'  ✓ {email}: mantendo {username} (ID: {user_id})'))
+                continue
+            duplicates_to_kept[user_id] = keep[email]
+            if self.verbosity >= 2:
+                self.stdout.write(self.style.WARNING(f'  ✗ {email}: removendo {username} (ID: {user_id})'))
+        return duplicates_to_kept
+
+    def count_related(self, relations, duplicates_to_kept, totals):
+        """Mesma contagem de move_related, sem alterar nada"""
+        duplicates = list(duplicates_to_kept)
+        for model, field in relations:
+            conflicting = find_conflicts(model, field, duplicates_to_kept)
+            if conflicting:
+                totals[f'{model._meta.label}.{field.name} a descartar (conflito)'] += len(conflicting)
+            count = model._base_manager.filter(
+                **{f'{field.attname}__in': duplicates}
+            ).exclude(pk__in=conflicting).count()
+            if count:
+                totals[f'{model._meta.label}.{field.name} a transferir'] += count
+
+    def move_related(self, relations, duplicates_to_kept, totals):
+        """
+        Transfere em massa os registros dos duplicados para o usuário mantido.
+        Onde há unicidade (inscrição no mesmo evento, mesmo badge, perfil...)
+        fica o registro do mantido, ou o do duplicado mais antigo, e os demais
+        são apagados antes do UPDATE.
+        """
+        duplicates = list(duplicates_to_kept)
+        for model, field in relations:
+            manager = model._base_manager
+            column = field.attname
+
+            conflicting = find_conflicts(model, field, duplicates_to_kept)
+            if conflicting:
+                manager.filter(pk__in=conflicting).delete()
+                totals[f'{model._meta.label}.{field.name} descartados (conflito)'] += len(conflicting)
+
+            moved = manager.filter(**{f'{column}__in': duplicates}).update(**{column: Case(
+                *[When(**{column: duplicate}, then=Value(kept)) for duplicate, kept in duplicates_to_kept.items()]
+            )})
+            if moved:
+                totals[f'{model._meta.label}.{field.name} transferidos'] += moved
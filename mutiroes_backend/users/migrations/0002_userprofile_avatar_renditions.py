@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_renditions',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Versões do Avatar'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_userprofile_avatar_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_height',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Altura do Avatar'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_width',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Largura do Avatar'),
+        ),
+    ]
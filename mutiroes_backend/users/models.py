@@ -17,6 +17,9 @@ class UserProfile(models.Model):
     birth_date = models.DateField(null=True, blank=True, verbose_name="Data de Nascimento")
     bio = models.TextField(max_length=500, blank=True, verbose_name="Biografia")
     avatar = models.ImageField(upload_to='users/avatars/', null=True, blank=True, verbose_name="Avatar")
+    avatar_width = models.PositiveIntegerField(null=True, blank=True, verbose_name="Largura do Avatar")
+    avatar_height = models.PositiveIntegerField(null=True, blank=True, verbose_name="Altura do Avatar")
+    avatar_renditions = models.JSONField(default=dict, blank=True, verbose_name="Versões do Avatar")
     
     # Localização
     city = models.CharField(max_length=100, blank=True, verbose_name="Cidade")
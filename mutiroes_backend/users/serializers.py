@@ -2,13 +2,16 @@ from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from mutiroes_backend import reference_data
+from mutiroes_backend.images import image_url, rendition_urls
+from mutiroes_backend.instrumentation import InstrumentedModelSerializer, InstrumentedSerializer
 from .models import (
     UserProfile, UserBadge, UserBadgeEarned, UserSkill, 
     UserSkillLevel, UserAvailability, UserNotificationSettings
 )
 
 
-class UserRegistrationSerializer(serializers.ModelSerializer):
+class UserRegistrationSerializer(InstrumentedModelSerializer):
     password = serializers.CharField(write_only=True, validators=[validate_password])
     password_confirm = serializers.CharField(write_only=True)
     
@@ -27,28 +30,30 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(InstrumentedModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'date_joined']
         read_only_fields = ['id', 'date_joined']
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(InstrumentedModelSerializer):
     user = UserSerializer(read_only=True)
     interests = serializers.StringRelatedField(many=True, read_only=True)
     avatar_url = serializers.SerializerMethodField()
+    avatar_renditions = serializers.SerializerMethodField()
     age = serializers.IntegerField(read_only=True)
     
     def get_avatar_url(self, obj):
-        """Retorna URL do avatar ou None se não existir"""
-        if obj.avatar and hasattr(obj.avatar, 'url'):
-            return obj.avatar.url
-        return None
+        """Retorna URL do avatar (versão redimensionada quando disponível) ou None"""
+        return image_url(obj.avatar, obj.avatar_renditions, 'medium')
+    
+    def get_avatar_renditions(self, obj):
+        return rendition_urls(obj.avatar_renditions)
     
     class Meta:
         model = UserProfile
-        fields = ['id', 'user', 'phone', 'birth_date', 'bio', 'avatar_url', 'age',
+        fields = ['id', 'user', 'phone', 'birth_date', 'bio', 'avatar_url', 'avatar_renditions', 'age',
                  'city', 'state', 'zip_code', 'interests', 'notification_preferences',
                  'is_public_profile', 'show_participation_history',
                  'total_events_participated', 'total_hours_volunteered',
@@ -57,7 +62,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
                            'created_at', 'updated_at']
 
 
-class UserProfileUpdateSerializer(serializers.ModelSerializer):
+class UserProfileUpdateSerializer(InstrumentedModelSerializer):
     class Meta:
         model = UserProfile
         fields = ['phone', 'birth_date', 'bio', 'avatar', 'city', 'state', 'zip_code',
@@ -65,43 +70,53 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
                  'show_participation_history']
 
 
-class UserBadgeSerializer(serializers.ModelSerializer):
+class UserBadgeSerializer(InstrumentedModelSerializer):
     class Meta:
         model = UserBadge
         fields = ['id', 'name', 'description', 'icon', 'color', 'badge_type',
                  'min_events', 'min_hours', 'special_condition']
 
 
-class UserBadgeEarnedSerializer(serializers.ModelSerializer):
-    badge = UserBadgeSerializer(read_only=True)
+class UserBadgeEarnedSerializer(InstrumentedModelSerializer):
+    badge = serializers.SerializerMethodField()
+    
+    def get_badge(self, obj):
+        """Badge do cache em memória, sem join com UserBadge"""
+        badge = reference_data.badges.get(obj.badge_id)
+        return UserBadgeSerializer(badge).data if badge is not None else None
     
     class Meta:
         model = UserBadgeEarned
         fields = ['id', 'badge', 'earned_at']
 
 
-class UserSkillSerializer(serializers.ModelSerializer):
+class UserSkillSerializer(InstrumentedModelSerializer):
     class Meta:
         model = UserSkill
         fields = ['id', 'name', 'category', 'description']
 
 
-class UserSkillLevelSerializer(serializers.ModelSerializer):
-    skill = UserSkillSerializer(read_only=True)
+class UserSkillLevelSerializer(InstrumentedModelSerializer):
+    skill = serializers.SerializerMethodField()
     level_display = serializers.CharField(source='get_level_display', read_only=True)
     
+    def get_skill(self, obj):
+        """Habilidade do cache em memória, sem join com UserSkill"""
+        skill = reference_data.skills.get(obj.skill_id)
+        return UserSkillSerializer(skill).data if skill is not None else None
+    
     class Meta:
         model = UserSkillLevel
         fields = ['id', 'skill', 'level', 'level_display', 'years_experience']
 
 
-class UserSkillLevelCreateUpdateSerializer(serializers.ModelSerializer):
+class UserSkillLevelCreateUpdateSerializer(InstrumentedModelSerializer):
     class Meta:
         model = UserSkillLevel
         fields = ['skill', 'level', 'years_experience']
 
 
-class UserAvailabilitySerializer(serializers.ModelSerializer):
+class UserAvailabilitySerializer(InstrumentedModelSerializer):
     day_display = serializers.CharField(source='get_day_of_week_display', read_only=True)
     
     class Meta:
@@ -109,13 +124,13 @@ class UserAvailabilitySerializer(serializers.ModelSerializer):
         fields = ['id', 'day_of_week', 'day_display', 'start_time', 'end_time', 'is_available']
 
 
-class UserAvailabilityCreateUpdateSerializer(serializers.ModelSerializer):
+class UserAvailabilityCreateUpdateSerializer(InstrumentedModelSerializer):
     class Meta:
         model = UserAvailability
         fields = ['day_of_week', 'start_time', 'end_time', 'is_available']
 
 
-class UserNotificationSettingsSerializer(serializers.ModelSerializer):
+class UserNotificationSettingsSerializer(InstrumentedModelSerializer):
     class Meta:
         model = UserNotificationSettings
         fields = ['email_new_events', 'email_event_reminders', 'email_event_updates',
@@ -123,7 +138,7 @@ class UserNotificationSettingsSerializer(serializers.ModelSerializer):
                  'push_event_updates', 'push_badge_earned', 'reminder_frequency']
 
 
-class UserStatsSerializer(serializers.Serializer):
+class UserStatsSerializer(InstrumentedSerializer):
     total_events_participated = serializers.IntegerField()
     total_hours_volunteered = serializers.IntegerField()
     badges_earned = serializers.IntegerField()
@@ -133,14 +148,17 @@ class UserStatsSerializer(serializers.Serializer):
     favorite_categories = serializers.ListField(child=serializers.CharField())
 
 
-class UserPublicProfileSerializer(serializers.ModelSerializer):
+class UserPublicProfileSerializer(InstrumentedModelSerializer):
     user = UserSerializer(read_only=True)
     interests = serializers.StringRelatedField(many=True, read_only=True)
-    avatar_url = serializers.CharField(source='avatar.url', read_only=True)
+    avatar_url = serializers.SerializerMethodField()
     age = serializers.IntegerField(read_only=True)
     badges = UserBadgeEarnedSerializer(source='user.earned_badges', many=True, read_only=True)
     skills = UserSkillLevelSerializer(source='user.skills', many=True, read_only=True)
     
+    def get_avatar_url(self, obj):
+        return image_url(obj.avatar, obj.avatar_renditions, 'medium')
+    
     class Meta:
         model = UserProfile
         fields = ['id', 'user', 'bio', 'avatar_url', 'age', 'city', 'state',
@@ -150,7 +168,7 @@ class UserPublicProfileSerializer(serializers.ModelSerializer):
                            'created_at']
 
 
-class PasswordChangeSerializer(serializers.Serializer):
+class PasswordChangeSerializer(InstrumentedSerializer):
     old_password = serializers.CharField(required=True)
     new_password = serializers.CharField(required=True, validators=[validate_password])
     new_password_confirm = serializers.CharField(required=True)
@@ -167,7 +185,7 @@ class PasswordChangeSerializer(serializers.Serializer):
         return value
 
 
-class UserSearchSerializer(serializers.Serializer):
+class UserSearchSerializer(InstrumentedSerializer):
     query = serializers.CharField(max_length=100)
     city = serializers.CharField(max_length=100, required=False)
     state = serializers.CharField(max_length=2, required=False)
@@ -0,0 +1,22 @@
+"""
+Invalidação do cache de badges e habilidades (resilience.swr_cache e
+mutiroes_backend.reference_data)
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from mutiroes_backend import reference_data
+from mutiroes_backend.resilience import invalidate_tags_on_commit
+from .models import UserBadge, UserSkill
+
+
+@receiver([post_save, post_delete], sender=UserBadge)
+def invalidate_badges(sender, **kwargs):
+    invalidate_tags_on_commit('user-badges')
+    reference_data.badges.invalidate_on_commit()
+
+
+@receiver([post_save, post_delete], sender=UserSkill)
+def invalidate_skills(sender, **kwargs):
+    invalidate_tags_on_commit('user-skills')
+    reference_data.skills.invalidate_on_commit()
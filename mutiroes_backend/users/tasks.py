@@ -3,6 +3,8 @@ Celery tasks for user operations
 """
 from celery import shared_task
 from django.contrib.auth import get_user_model
+from mutiroes_backend.images import finish_processing, process_image
+from .models import UserProfile
 import logging
 
 logger = logging.getLogger(__name__)
@@ -25,3 +27,27 @@ def send_welcome_email(user_id):
     except User.DoesNotExist:
         logger.error(f"User {user_id} not found")
         return None
+
+
+@shared_task
+def process_user_avatar(profile_id):
+    """
+    Strip EXIF, record dimensions and generate renditions for a user avatar
+    """
+    profile = UserProfile.objects.filter(id=profile_id).only('id', 'avatar').first()
+    if not profile or not profile.avatar:
+        return None
+    
+    name = profile.avatar.name
+    result = process_image(name, 'avatar')
+    
+    # Only store the result if the avatar was not replaced meanwhile
+    updated = UserProfile.objects.filter(id=profile_id, avatar=name).update(
+        avatar=result['name'],
+        avatar_width=result['width'],
+        avatar_height=result['height'],
+        avatar_renditions=result['renditions'],
+    )
+    finish_processing(name, result, updated)
+    logger.info(f"Processed avatar for profile {profile_id}")
+    return bool(updated)
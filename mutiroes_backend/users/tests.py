@@ -1,3 +1,151 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.urls import reverse
+
+from events.models import Event, EventCategory, EventComment, EventParticipant
+from events.tests import EventTestCase, QueryBudgetTestCase, exif_jpeg
+from users.models import UserBadgeEarned, UserProfile, UserSkillLevel
+from users.tasks import process_user_avatar
+
+
+class UserQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_register(self):
+        data = {
+            'username': 'nova', 'email': 'nova@example.com', 'first_name': 'Nova', 'last_name': 'Voluntária',
+            'password': 'S3nha-Forte-2024', 'password_confirm': 'S3nha-Forte-2024',
+        }
+        self.client.credentials()
+        self.assertMaxQueries(4, 'post', reverse('user-register'), data, expected_status=201, format='json')
+
+    def test_profile(self):
+        self.assertMaxQueries(4, 'get', reverse('user-profile'))
+
+    def test_profile_update(self):
+        self.assertMaxQueries(6, 'patch', reverse('user-profile-update'), {'bio': 'Voluntária'}, format='json')
+
+    def test_public_profile(self):
+        self.assertMaxQueries(6, 'get', reverse('user-public-profile', args=[self.other_user.username]))
+
+    def test_badges_and_skills(self):
+        self.assertMaxQueries(3, 'get', reverse('badges'))
+        self.assertMaxQueries(3, 'get', reverse('skills'))
+
+    def test_user_skills(self):
+        self.assertMaxQueries(3, 'get', reverse('user-skills'))
+        skill_level = UserSkillLevel.objects.filter(user=self.user).first()
+        self.assertMaxQueries(2, 'get', reverse('user-skill-detail', args=[skill_level.id]))
+
+    def test_availability(self):
+        response = self.assertMaxQueries(3, 'get', reverse('user-availability'))
+        availability_id = response.data['results'][0]['id']
+        self.assertMaxQueries(2, 'get', reverse('user-availability-detail', args=[availability_id]))
+
+    def test_badges_earned(self):
+        self.assertMaxQueries(3, 'get', reverse('user-badges-earned'))
+
+    def test_earn_badge(self):
+        badge = next(b for b in self.badges if not UserBadgeEarned.objects.filter(user=self.user, badge=b).exists())
+        self.assertMaxQueries(5, 'post', reverse('earn-badge', args=[badge.id]), expected_status=201)
+
+    def test_notification_settings(self):
+        self.assertMaxQueries(5, 'get', reverse('user-notification-settings'))
+
+    def test_stats(self):
+        self.assertMaxQueries(8, 'get', reverse('user-stats'))
+
+    def test_search(self):
+        response = self.assertMaxQueries(6, 'get', reverse('search-users'), {'query': 'voluntario', 'city': 'Paulo'})
+        self.assertEqual(len(response.data), self.USERS)
+
+    def test_timeline(self):
+        self.assertMaxQueries(5, 'get', reverse('user-timeline'))
+
+    def test_recommendations(self):
+        response = self.assertMaxQueries(6, 'get', reverse('user-recommendations'))
+        self.assertTrue(response.data)
+        self.assertIn('title', response.data[0])
+
+
+class AvatarProcessingTests(EventTestCase):
+
+    def test_stores_dimensions_and_renditions(self):
+        user, = self.create_users(1)
+        profile = UserProfile.objects.create(user=user, avatar=exif_jpeg('avatar.jpg', size=(300, 200)))
+        original_name = profile.avatar.name
+
+        self.assertTrue(process_user_avatar(profile.id))
+        profile.refresh_from_db()
+
+        self.assertNotEqual(profile.avatar.name, original_name)
+        self.assertFalse(default_storage.exists(original_name))
+        self.assertEqual((profile.avatar_width, profile.avatar_height), (200, 300))
+        self.assertEqual(profile.avatar_renditions['thumb']['height'], 96)
+        self.assertTrue(default_storage.exists(profile.avatar_renditions['medium']['webp']))
+
+
+class CleanDuplicatesTests(EventTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kept, cls.duplicate, cls.other = cls.create_users(3)
+        # Mesmo email; o cadastro mais antigo é o mantido
+        User.objects.filter(id=cls.duplicate.id).update(
+            email=cls.kept.email, date_joined=cls.kept.date_joined + timedelta(days=1)
+        )
+        category = EventCategory.objects.create(name='Praças')
+        shared, only_duplicate = Event.objects.bulk_create([
+            cls.build_event(cls.other, category), cls.build_event(cls.other, category, days=20),
+        ])
+        UserProfile.objects.bulk_create([
+            UserProfile(user=cls.kept, city='Recife'), UserProfile(user=cls.duplicate, city='Olinda'),
+        ])
+        # Inscrição no mesmo evento: violaria unique_together (event, user) ao transferir
+        EventParticipant.objects.bulk_create([
+            EventParticipant(event=shared, user=cls.kept, status='confirmed'),
+            EventParticipant(event=shared, user=cls.duplicate, status='confirmed'),
+            EventParticipant(event=only_duplicate, user=cls.duplicate, status='confirmed'),
+        ])
+        EventComment.objects.create(event=shared, user=cls.duplicate, content='Levo luvas')
+        cls.shared, cls.only_duplicate = shared, only_duplicate
+
+    def clean(self, *args):
+        out = StringIO()
+        call_command('clean_duplicates', *args, stdout=out)
+        return out.getvalue()
+
+    def test_moves_related_rows_and_discards_conflicts(self):
+        output = self.clean()
+
+        self.assertFalse(User.objects.filter(id=self.duplicate.id).exists())
+        self.assertEqual(UserProfile.objects.get(user=self.kept).city, 'Recife')
+        self.assertEqual(
+            set(EventParticipant.objects.values_list('event_id', 'user_id')),
+            {(self.shared.id, self.kept.id), (self.only_duplicate.id, self.kept.id)}
+        )
+        self.assertEqual(EventComment.objects.get().user, self.kept)
+        self.assertIn('events.EventParticipant.user descartados (conflito): 1', output)
+        self.assertIn('events.EventParticipant.user transferidos: 1', output)
+        self.assertIn('users.UserProfile.user descartados (conflito): 1', output)
+        self.assertIn('1 usuários removidos', output)
+
+    def test_dry_run_reports_what_the_real_run_does(self):
+        dry_run = self.clean('--dry-run')
+
+        self.assertTrue(User.objects.filter(id=self.duplicate.id).exists())
+        self.assertEqual(EventParticipant.objects.filter(user=self.duplicate).count(), 2)
+        self.assertIn('events.EventParticipant.user a descartar (conflito): 1', dry_run)
+        self.assertIn('events.EventParticipant.user a transferir: 1', dry_run)
+        self.assertIn('events.EventComment.user a transferir: 1', dry_run)
+        self.assertIn('users.UserProfile.user a descartar (conflito): 1', dry_run)
+        self.assertNotIn('users.UserProfile.user a transferir', dry_run)
+
+        # Cada linha da simulação aparece, com os mesmos números, na execução real
+        expected = dry_run.replace('a descartar (conflito)', 'descartados (conflito)').replace('a transferir', 'transferidos')
+        real = self.clean()
+        totals = [line for line in expected.splitlines() if line.startswith('  ')]
+        self.assertEqual(totals, [line for line in real.splitlines() if line.startswith('  ')])
@@ -5,6 +5,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.db.models import Q, Count
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
@@ -23,6 +24,20 @@ from .serializers import (
     UserNotificationSettingsSerializer, UserStatsSerializer, UserPublicProfileSerializer,
     PasswordChangeSerializer, UserSearchSerializer
 )
+from .tasks import process_user_avatar
+from mutiroes_backend.db_router import read_replica
+from mutiroes_backend import reference_data
+from mutiroes_backend.resilience import CachedListMixin
+
+
+def public_profiles():
+    """Perfis públicos com tudo o que UserPublicProfileSerializer lê, em queries fixas"""
+    return UserProfile.objects.filter(is_public_profile=True).select_related('user').prefetch_related(
+        'interests',
+        # Badges e habilidades vêm do cache em memória (reference_data)
+        'user__earned_badges',
+        'user__skills',
+    )
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -50,6 +65,14 @@ class UserProfileUpdateView(generics.UpdateAPIView):
     def get_object(self):
         profile, created = UserProfile.objects.get_or_create(user=self.request.user)
         return profile
+    
+    def perform_update(self, serializer):
+        if serializer.validated_data.get('avatar'):
+            # Novo avatar: descartar versões do anterior até o reprocessamento
+            profile = serializer.save(avatar_width=None, avatar_height=None, avatar_renditions={})
+            transaction.on_commit(lambda: process_user_avatar.delay(profile.id))
+        else:
+            serializer.save()
 
 
 class UserPublicProfileView(generics.RetrieveAPIView):
@@ -57,16 +80,18 @@ class UserPublicProfileView(generics.RetrieveAPIView):
     serializer_class = UserPublicProfileSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'user__username'
+    lookup_url_kwarg = 'username'
     
     def get_queryset(self):
-        return UserProfile.objects.filter(is_public_profile=True)
+        return public_profiles()
 
 
-class UserBadgeListView(generics.ListAPIView):
+class UserBadgeListView(CachedListMixin, generics.ListAPIView):
     """Lista todos os badges disponíveis"""
     queryset = UserBadge.objects.all()
     serializer_class = UserBadgeSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    cache_tags = ('user-badges',)
 
 
 class UserBadgeEarnedListView(generics.ListAPIView):
@@ -78,7 +103,7 @@ class UserBadgeEarnedListView(generics.ListAPIView):
         return UserBadgeEarned.objects.filter(user=self.request.user)
 
 
-class UserSkillListView(generics.ListAPIView):
+class UserSkillListView(CachedListMixin, generics.ListAPIView):
     """Lista todas as habilidades disponíveis"""
     queryset = UserSkill.objects.all()
     serializer_class = UserSkillSerializer
@@ -86,6 +111,7 @@ class UserSkillListView(generics.ListAPIView):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['category']
     search_fields = ['name']
+    cache_tags = ('user-skills',)
 
 
 class UserSkillLevelListView(generics.ListCreateAPIView):
@@ -167,6 +193,7 @@ def change_password(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def user_stats(request):
     """Estatísticas do usuário"""
     user = request.user
@@ -184,8 +211,8 @@ def user_stats(request):
     # Habilidades
     skills_count = UserSkillLevel.objects.filter(user=user).count()
     
-    # Eventos organizados
-    events_organized = user.organized_events.count()
+    # Eventos organizados (inclusive os já arquivados)
+    events_organized = user.organized_events.count() + user.archived_organized_events.count()
     
     # Eventos do mês atual
     current_month = timezone.now().replace(day=1)
@@ -212,6 +239,7 @@ def user_stats(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def search_users(request):
     """Buscar usuários"""
     serializer = UserSearchSerializer(data=request.query_params)
@@ -226,29 +254,31 @@ def search_users(request):
     skills = data.get('skills', [])
     interests = data.get('interests', [])
     
-    # Buscar usuários
-    users = User.objects.filter(
-        Q(first_name__icontains=query) | 
-        Q(last_name__icontains=query) |
-        Q(username__icontains=query)
-    ).filter(profile__is_public_profile=True)
+    # Buscar usuários (o serializer é de perfil, então a busca parte dos perfis públicos)
+    profiles = public_profiles().filter(
+        Q(user__first_name__icontains=query) | 
+        Q(user__last_name__icontains=query) |
+        Q(user__username__icontains=query)
+    )
     
     # Filtrar por localização
     if city:
-        users = users.filter(profile__city__icontains=city)
+        profiles = profiles.filter(city__icontains=city)
     if state:
-        users = users.filter(profile__state__iexact=state)
+        profiles = profiles.filter(state__iexact=state)
     
-    # Filtrar por habilidades
+    # Filtrar por habilidades (nomes resolvidos no cache em memória, sem join)
     if skills:
-        users = users.filter(skills__skill__name__in=skills).distinct()
+        skill_ids = reference_data.skills.pks_where('name', skills)
+        profiles = profiles.filter(user__skills__skill_id__in=skill_ids).distinct()
     
     # Filtrar por interesses
     if interests:
-        users = users.filter(profile__interests__name__in=interests).distinct()
+        category_ids = reference_data.categories.pks_where('name', interests)
+        profiles = profiles.filter(interests__in=category_ids).distinct()
     
     # Serializar resultados
-    serializer = UserPublicProfileSerializer(users, many=True)
+    serializer = UserPublicProfileSerializer(profiles, many=True)
     return Response(serializer.data)
 
 
@@ -256,9 +286,8 @@ def search_users(request):
 @permission_classes([IsAuthenticated])
 def earn_badge(request, badge_id):
     """Conceder badge ao usuário"""
-    try:
-        badge = UserBadge.objects.get(id=badge_id)
-    except UserBadge.DoesNotExist:
+    badge = reference_data.badges.get(badge_id)
+    if badge is None:
         return Response({'error': 'Badge não encontrado'}, status=status.HTTP_404_NOT_FOUND)
     
     # Verificar se o usuário já tem o badge
@@ -282,6 +311,7 @@ def earn_badge(request, badge_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_replica
 def user_timeline(request):
     """Timeline do usuário"""
     user = request.user
@@ -291,6 +321,13 @@ def user_timeline(request):
         event__start_date__lte=timezone.now()
     ).select_related('event').order_by('-event__start_date')[:10]
     
+    # Completar com o histórico arquivado (events/archive.py) quando faltarem eventos recentes
+    archived_events = []
+    if len(recent_events) < 10:
+        archived_events = user.archived_participations.select_related('event').defer(
+            'event__photos', 'event__comments', 'event__resources', 'event__report'
+        ).order_by('-event__start_date')[:10 - len(recent_events)]
+    
     # Badges recentes
     recent_badges = UserBadgeEarned.objects.filter(user=user).order_by('-earned_at')[:5]
     
@@ -314,14 +351,27 @@ def user_timeline(request):
             }
         })
     
+    for participation in archived_events:
+        timeline.append({
+            'type': 'event_participation',
+            'date': participation.event.start_date,
+            'data': {
+                'event_title': participation.event.title,
+                'status': participation.status,
+                'checked_in': participation.checked_in,
+                'archived': True,
+            }
+        })
+    
     # Adicionar badges
     for badge_earned in recent_badges:
+        badge = reference_data.badges.get(badge_earned.badge_id)
         timeline.append({
             'type': 'badge_earned',
             'date': badge_earned.earned_at,
             'data': {
-                'badge_name': badge_earned.badge.name,
-                'badge_icon': badge_earned.badge.icon
+                'badge_name': badge.name,
+                'badge_icon': badge.icon
             }
         })
     
@@ -350,35 +400,31 @@ def user_recommendations(request):
     user = request.user
     profile = user.profile
     
+    from events.models import Event
+    from events.serializers import EventListSerializer
+    
+    upcoming_events = Event.objects.filter(
+        status='published',
+        start_date__gte=timezone.now()
+    ).exclude(
+        participants__user=user
+    ).select_related('organizer').with_participants_count()
+    
     # Eventos baseados nos interesses
-    interested_categories = profile.interests.all()
+    interested_categories = list(profile.interests.values_list('id', flat=True))
     recommended_events = []
     
-    if interested_categories.exists():
-        from events.models import Event
-        recommended_events = Event.objects.filter(
-            category__in=interested_categories,
-            status='published',
-            start_date__gte=timezone.now()
-        ).exclude(
-            participants__user=user
-        ).select_related('category', 'organizer')[:10]
+    if interested_categories:
+        recommended_events = upcoming_events.filter(category__in=interested_categories)[:10]
     
     # Eventos próximos
     nearby_events = []
     if hasattr(profile, 'city') and profile.city:
-        from events.models import Event
-        nearby_events = Event.objects.filter(
-            city__icontains=profile.city,
-            status='published',
-            start_date__gte=timezone.now()
-        ).exclude(
-            participants__user=user
-        ).select_related('category', 'organizer')[:5]
+        nearby_events = upcoming_events.filter(city__icontains=profile.city)[:5]
     
     # Combinar e remover duplicatas
     all_events = list(recommended_events) + list(nearby_events)
     unique_events = list({event.id: event for event in all_events}.values())
     
-    serializer = UserPublicProfileSerializer(unique_events, many=True)
+    serializer = EventListSerializer(unique_events, many=True)
     return Response(serializer.data)
\ No newline at end of file